@@ -1,11 +1,16 @@
 # app_console.py
 
 from backend.rag.search_vdb_for_llm import rag_query
+from backend.rag.rollup import ROLLUP_ENABLED, start_rollup_updater
 from utils.search_and_load_videos import get_video_object_list
 
 if __name__ == '__main__':
     video_objects = get_video_object_list()
 
+    # 启动时段汇总线程，汇总已入库但尚未汇总的时段
+    if ROLLUP_ENABLED:
+        start_rollup_updater()
+
     print(f'请注意：app_console 仅提供对数据库的查询功能。\n')
 
     while True:
@@ -1,7 +1,9 @@
 import os
 import streamlit as st
-from backend.data.dataloader import VideoDataLoader
+from backend.ingest.ingest import ingest_videos
+from backend.vdb.vector_database import vdb_backfill_time_fields
 from backend.rag.search_vdb_for_llm import rag_query
+from backend.rag.rollup import ROLLUP_ENABLED, start_rollup_updater
 from logger import logger
 from config import GlobalConfig
 
@@ -30,9 +32,16 @@ def load_video_files():
 
 # Video processing (if needed)
 def process_video_files(video_files):
-    for video_file in video_files:
-        video_obj = VideoDataLoader(video_file, auto_process=True, reprocess=False)
-        video_obj.add_event_to_database()
+    ingest_videos(video_files)
+    vdb_backfill_time_fields()
+
+# 时段汇总线程在所有会话间共享，页面重新运行时不重复启动
+@st.cache_resource
+def get_rollup_updater():
+    return start_rollup_updater()
+
+if ROLLUP_ENABLED:
+    get_rollup_updater()
 
 # Show the video files loading message (optional)
 try:
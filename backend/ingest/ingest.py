@@ -0,0 +1,131 @@
+# backend/ingest/ingest.py
+
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from tqdm import tqdm
+
+from backend.data.dataloader import VideoDataLoader
+from backend.video.detect_extract import detect_and_extract_frames
+from config import IngestConfig, VideoConfig
+from logger import logger
+
+INGEST_CPU_WORKERS = IngestConfig.cpu_workers
+INGEST_DESCRIBE_WORKERS = IngestConfig.describe_workers
+MOTION_THRESHOLD = VideoConfig.motion_threshold
+MIN_INTERVAL_MS = VideoConfig.min_interval_ms
+MAX_SILENCE_S = VideoConfig.max_silence_s
+IMAGE_QUALITY = VideoConfig.image_quality
+
+# 入库阶段
+STAGE_PENDING = 'pending'
+STAGE_DETECTED = 'detected'
+STAGE_EXTRACTED = 'extracted'
+STAGE_DESCRIBED = 'described'
+STAGE_INDEXED = 'indexed'
+STAGE_FAILED = 'failed'
+
+
+def _run_cpu_stage(video_file):
+    """
+    在子进程中执行 CPU 密集的运动检测和帧提取阶段。
+    两个阶段都未完成时合并为一次解码，写出的JSON和帧目录与分开执行时相同；
+    已完成的阶段由 VideoDataLoader 的 detected/extracted 状态跳过，因此中断后可以直接续跑。
+    """
+    video_obj = VideoDataLoader(video_file, auto_process=False, reprocess=False)
+    if not video_obj.detected:
+        logger.info(f'正在检测视频 {video_obj.video_name} 的运动并提取帧')
+        # 描述阶段在另一个进程中从磁盘读取帧，因此总是保存事件帧
+        result = detect_and_extract_frames(video_obj.video_path, video_obj.video_start_time,
+                                           video_obj.json_dir, video_obj.frames_dir,
+                                           motion_threshold=MOTION_THRESHOLD, min_interval_ms=MIN_INTERVAL_MS,
+                                           max_silence_s=MAX_SILENCE_S, image_quality=IMAGE_QUALITY,
+                                           save_frames=True)
+        if result is None:
+            raise RuntimeError(f'无法打开视频文件 {video_file}')
+        logger.info(f'视频 {video_obj.video_name} 运动检测与帧提取完毕')
+    elif not video_obj.extracted:
+        logger.info(f'正在提取视频 {video_obj.video_name} 的帧')
+        video_obj._extract_frames()
+        logger.info(f'视频 {video_obj.video_name} 提取帧完毕')
+    return video_file
+
+
+def _run_describe_stage(video_file):
+    """
+    在描述线程池中执行依赖模型服务的描述生成阶段。
+    """
+    video_obj = VideoDataLoader(video_file, auto_process=False, reprocess=False)
+    if not video_obj.described:
+        logger.info(f'正在生成视频 {video_obj.video_name} 的描述')
+        video_obj._generate_descriptions()
+        logger.info(f'视频 {video_obj.video_name} 生成描述完毕')
+    return video_obj
+
+
+def ingest_videos(video_files,
+                  cpu_workers=INGEST_CPU_WORKERS,
+                  describe_workers=INGEST_DESCRIBE_WORKERS,
+                  add_to_database=True,
+                  progress_callback=None):
+    """
+    并行处理一批视频文件：运动检测和帧提取分布在进程池中，描述生成在独立的有界线程池中进行。
+
+    :param video_files:       视频文件路径列表
+    :param cpu_workers:       CPU 阶段的进程数
+    :param describe_workers:  描述阶段的并发数
+    :param add_to_database:   是否在描述完成后将事件加入向量数据库
+    :param progress_callback: 可选回调 progress_callback(video_file, stage)，每个文件每完成一个阶段调用一次
+    :return: 处理成功的 VideoDataLoader 对象列表，顺序与 video_files 一致
+    """
+    def report(video_file, stage):
+        logger.debug(f'入库进度: {video_file} -> {stage}')
+        if progress_callback is not None:
+            try:
+                progress_callback(video_file, stage)
+            except Exception as e:
+                logger.error(f'入库进度回调发生错误: {e}')
+
+    video_objects = {}
+    if not video_files:
+        return []
+
+    logger.info(f'开始并行入库 {len(video_files)} 个视频文件 (进程数 {cpu_workers}, 描述并发数 {describe_workers})')
+    for video_file in video_files:
+        report(video_file, STAGE_PENDING)
+
+    # 使用 spawn 避免在已有线程（录制、Flask）的进程中 fork
+    mp_context = multiprocessing.get_context('spawn')
+    progress = tqdm(total=len(video_files), desc='视频入库', unit='视频')
+    with ProcessPoolExecutor(max_workers=cpu_workers, mp_context=mp_context) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=describe_workers) as describe_pool:
+        # 未完成的任务 -> (视频文件, 完成后到达的阶段)，每个阶段完成后提交该文件的下一阶段
+        futures = {cpu_pool.submit(_run_cpu_stage, f): (f, STAGE_EXTRACTED) for f in video_files}
+        stage_names = {STAGE_EXTRACTED: '运动检测或帧提取', STAGE_DESCRIBED: '描述生成'}
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                video_file, stage = futures.pop(future)
+                try:
+                    result = future.result()
+                    if stage == STAGE_EXTRACTED:
+                        # 检测与提取在同一次解码中完成，依次报告两个阶段
+                        report(video_file, STAGE_DETECTED)
+                    report(video_file, stage)
+                    if stage == STAGE_EXTRACTED:
+                        futures[describe_pool.submit(_run_describe_stage, video_file)] = (video_file, STAGE_DESCRIBED)
+                        continue
+                    if add_to_database:
+                        # 数据库写入保持在主线程串行进行
+                        result.add_event_to_database()
+                        report(video_file, STAGE_INDEXED)
+                    video_objects[video_file] = result
+                except Exception as e:
+                    logger.error(f'视频 {video_file} {stage_names[stage]}失败: {e}')
+                    report(video_file, STAGE_FAILED)
+                progress.update(1)
+    progress.close()
+
+    logger.info(f'并行入库完成，成功 {len(video_objects)}/{len(video_files)} 个视频')
+    return [video_objects[f] for f in video_files if f in video_objects]
@@ -0,0 +1,207 @@
+# backend/live/event_feed.py
+
+import asyncio
+import threading
+
+from config import EventFeedConfig
+
+EVENT_PAGE_LIMIT = EventFeedConfig.page_limit
+EVENT_MAX_PAGE_LIMIT = EventFeedConfig.max_page_limit
+EVENT_KEEPALIVE_S = EventFeedConfig.keepalive_s
+EVENT_RETRY_MS = EventFeedConfig.retry_ms
+
+# 事件流的固定消息：连接建立时设置重连等待时间；空闲时的注释行；游标超出范围时通知浏览器清空列表
+_SSE_RETRY = f'retry: {EVENT_RETRY_MS}\n\n'.encode()
+_SSE_KEEPALIVE = b': keepalive\n\n'
+_SSE_RESET = b'event: reset\ndata: {}\n\n'
+
+
+def parse_cursor(value, default=0):
+    """
+    解析 since 参数或 Last-Event-ID 请求头。
+
+    :param value:   字符串，None 或空字符串时返回 default
+    :param default: 默认值
+    :return: 非负整数游标
+    :raises ValueError: 不是非负整数
+    """
+    if value is None or value == '':
+        return default
+    cursor = int(value)
+    if cursor < 0:
+        raise ValueError(f'游标不能为负数: {value}')
+    return cursor
+
+
+def parse_limit(value):
+    """
+    解析 limit 参数，未指定时为 EVENT_PAGE_LIMIT，超过 EVENT_MAX_PAGE_LIMIT 时截断。
+
+    :raises ValueError: 不是正整数
+    """
+    if value is None or value == '':
+        return EVENT_PAGE_LIMIT
+    limit = int(value)
+    if limit <= 0:
+        raise ValueError(f'limit 必须为正整数: {value}')
+    return min(limit, EVENT_MAX_PAGE_LIMIT)
+
+
+class EventFeed:
+    """
+    页面事件列表的推送：事件保存在事件目录（EventCatalog）中，每个事件加入时分配递增的游标并序列化一次 JSON，
+    之后所有请求直接拼接已序列化的内容。
+
+    浏览器记住最后收到的游标，只获取更新的事件：
+    since() 供 /events?since= 分页使用；stream() 和 astream() 生成 Server-Sent Events，
+    消息 id 为游标，断线重连时浏览器通过 Last-Event-ID 请求头从断点继续。
+    """
+
+    def __init__(self, catalog):
+        """
+        :param catalog: EventCatalog
+        """
+        self.catalog = catalog
+        self.condition = threading.Condition()
+        self.last_cursor = catalog.last_cursor()
+        self.async_waiters = set()  # (事件循环, asyncio.Event)，新事件加入时通知
+
+    def append(self, event, video_paths=()):
+        """
+        加入一个事件。
+
+        :param event:       事件字典，需包含 event_id 和 video_path，值可被 JSON 序列化
+        :param video_paths: 同时记为已处理的视频文件
+        :return: 最新事件的游标
+        """
+        return self.extend([event], video_paths)
+
+    def extend(self, events, video_paths=()):
+        """
+        按顺序加入多个事件，只通知一次等待的连接。参数同 EventCatalog.add_events。
+
+        :return: 最新事件的游标
+        """
+        added = self.catalog.add_events(events, video_paths)
+        with self.condition:
+            if added:
+                self.last_cursor = max(self.last_cursor, added[-1]['cursor'])
+                self._notify()
+            return self.last_cursor
+
+    def get(self, event_id):
+        """
+        :return: 事件字典，不存在时返回 None
+        """
+        return self.catalog.get(event_id)
+
+    def since(self, cursor=0, limit=None):
+        """
+        游标之后的事件。
+
+        :param cursor: 只返回游标大于此值的事件
+        :param limit:  最多返回的事件数，None 时不限
+        :return: (JSON 数组字符串, 返回的最后一个事件的游标；没有新事件时为 cursor)
+        """
+        rows = self.catalog.since(cursor, limit)
+        if rows:
+            cursor = rows[-1][0]
+        return '[' + ','.join(payload for _, payload in rows) + ']', cursor
+
+    def stream(self, cursor=0):
+        """
+        Server-Sent Events 生成器，供线程模型的服务（Flask）使用，每个连接占用一个线程。
+        先发送游标之后的存量事件，再等待新事件；超过 EVENT_KEEPALIVE_S 没有新事件时发送注释行，
+        写入失败时服务器关闭生成器。
+
+        :param cursor: 浏览器已收到的最后一个游标
+        """
+        yield _SSE_RETRY
+        cursor, reset = self._resume(cursor)
+        if reset:
+            yield _SSE_RESET
+        while True:
+            with self.condition:
+                newer = self.condition.wait_for(lambda: self.last_cursor > cursor, timeout=EVENT_KEEPALIVE_S)
+            if newer:
+                chunk, cursor = self._take(cursor)
+            else:
+                self._refresh()
+                chunk = _SSE_KEEPALIVE
+            if chunk:
+                yield chunk
+
+    async def astream(self, cursor=0):
+        """
+        stream() 的异步生成器版本，连接在事件循环中等待新事件，不占用线程。
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.condition:
+            self.async_waiters.add(waiter)
+        try:
+            yield _SSE_RETRY
+            cursor, reset = self._resume(cursor)
+            if reset:
+                yield _SSE_RESET
+            while True:
+                waiter[1].clear()
+                # 清除事件后再检查，两者之间加入的事件不会丢失通知
+                with self.condition:
+                    newer = self.last_cursor > cursor
+                if newer:
+                    chunk, cursor = self._take(cursor)
+                    if chunk:
+                        yield chunk
+                    continue
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), EVENT_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    self._refresh()
+                    yield _SSE_KEEPALIVE
+        finally:
+            with self.condition:
+                self.async_waiters.discard(waiter)
+
+    def _notify(self):
+        """
+        调用方需持有 condition。
+        """
+        self.condition.notify_all()
+        for loop, waiter in self.async_waiters:
+            try:
+                loop.call_soon_threadsafe(waiter.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def _refresh(self):
+        """
+        连接空闲时重新读取最新游标，其他进程写入事件目录的事件在下一次空闲检查时推送。
+        """
+        last_cursor = self.catalog.last_cursor()
+        with self.condition:
+            if last_cursor > self.last_cursor:
+                self.last_cursor = last_cursor
+                self._notify()
+
+    def _resume(self, cursor):
+        """
+        游标大于现有事件数时（事件目录被删除后浏览器带着旧的 Last-Event-ID 重连），从头发送并通知浏览器清空列表。
+
+        :return: (起始游标, 是否需要清空)
+        """
+        with self.condition:
+            if cursor > self.last_cursor:
+                return 0, True
+        return cursor, False
+
+    def _take(self, cursor):
+        """
+        :return: (游标之后最多 EVENT_PAGE_LIMIT 个事件的消息字节，没有时为空, 新游标)
+        """
+        rows = self.catalog.since(cursor, EVENT_PAGE_LIMIT)
+        if not rows:
+            # 游标之后的事件已不在事件目录中，跳到最新游标，避免反复查询
+            with self.condition:
+                return b'', max(cursor, self.last_cursor)
+        return ''.join(f'id: {row_cursor}\ndata: {payload}\n\n' for row_cursor, payload in rows).encode(), rows[-1][0]
@@ -0,0 +1,253 @@
+# backend/live/live_events.py
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+from config import LiveEventConfig, VideoRecordingConfig
+from logger import logger
+
+LIVE_EVENT_ENABLED = LiveEventConfig.enabled
+LIVE_EVENT_QUEUE_SIZE = LiveEventConfig.queue_size
+LIVE_KEYFRAME_INTERVAL_S = LiveEventConfig.keyframe_interval_s
+LIVE_MAX_KEYFRAMES = LiveEventConfig.max_keyframes
+LIVE_THUMBNAIL_DIR = LiveEventConfig.thumbnail_dir
+LIVE_IMAGE_QUALITY = LiveEventConfig.image_quality
+LIVE_SAVE_THUMBNAIL = LiveEventConfig.save_thumbnail
+VIDEO_DIR = VideoRecordingConfig.video_dir
+
+# 录制器发布、描述阶段消费的进程内事件队列
+live_event_queue = queue.Queue(maxsize=LIVE_EVENT_QUEUE_SIZE)
+
+# 正在由实时事件处理（录制中、排队或描述中）或已处理完成的录像文件，事后扫描时应跳过；
+# 事件被丢弃或描述失败时取消标记，交给事后扫描处理
+_live_video_paths = set()
+_live_video_paths_lock = threading.Lock()
+
+# 录制器运行在子进程中时，录像路径和事件经此转发给主进程，见 set_live_event_sink
+_event_sink = None
+LIVE_MESSAGE_VIDEO = 'video'
+LIVE_MESSAGE_EVENT = 'event'
+
+
+class LiveEvent:
+    """
+    录制器实时产生的运动事件，包含事件边界和采样的关键帧。
+    """
+
+    def __init__(self, source, video_path, start_time=None, camera=None):
+        """
+        :param source:     视频源标识（摄像头ID或RTSP地址）
+        :param video_path: 该事件对应的录像文件路径
+        :param start_time: 事件开始时间（datetime对象），默认当前时间
+        :param camera:     摄像头名称（多路录制时的视频源名称），写入事件元数据的 camera 字段
+        """
+        self.source = source
+        self.camera = camera
+        self.video_path = video_path
+        self.video_name = os.path.splitext(os.path.basename(video_path))[0]
+        self.start_time = start_time or datetime.now()
+        self.end_time = None
+        self.keyframes = []  # [(datetime, BGR帧)]
+        self._last_keyframe_ts = None
+
+        mark_live_video(video_path)
+
+    @property
+    def event_id(self):
+        # 录像文件名精确到秒，事件开始时间精确到毫秒，足以区分同一进程内的事件
+        return int(self.start_time.timestamp() * 1000)
+
+    def add_keyframe(self, frame, force=False):
+        """
+        按采样间隔添加关键帧。
+
+        :param frame: BGR帧，调用方保证之后不会再修改；只读视图（来自帧环形缓冲区）会在添加时复制
+        :param force: 忽略采样间隔（但仍受最大数量限制）
+        :return: 是否添加
+        """
+        if frame is None or len(self.keyframes) >= LIVE_MAX_KEYFRAMES:
+            return False
+        now = time.time()
+        if not force and self._last_keyframe_ts is not None \
+                and now - self._last_keyframe_ts < LIVE_KEYFRAME_INTERVAL_S:
+            return False
+        if not frame.flags.writeable:
+            # 环形缓冲区的槽位会被后续帧覆盖
+            frame = frame.copy()
+        self.keyframes.append((datetime.now(), frame))
+        self._last_keyframe_ts = now
+        return True
+
+    def finish(self, end_time=None):
+        self.end_time = end_time or datetime.now()
+
+
+def set_live_event_sink(sink):
+    """
+    设置跨进程转发函数。录制器运行在子进程中时调用，此后录像路径和结束的事件以
+    sink((消息类型, 内容)) 转发给主进程，由主进程调用 receive_live_message 处理。
+
+    :param sink: 不阻塞的转发函数，None 表示在本进程内处理
+    """
+    global _event_sink
+    _event_sink = sink
+
+
+def receive_live_message(message):
+    """
+    主进程处理子进程录制器转发的消息。
+
+    :param message: (LIVE_MESSAGE_VIDEO, 录像路径) 或 (LIVE_MESSAGE_EVENT, LiveEvent)
+    """
+    kind, payload = message
+    if kind == LIVE_MESSAGE_VIDEO:
+        mark_live_video(payload)
+    elif kind == LIVE_MESSAGE_EVENT:
+        mark_live_video(payload.video_path)
+        publish_live_event(payload)
+
+
+def mark_live_video(video_path):
+    """
+    标记录像文件由实时事件处理，事后扫描时跳过。录制开始时即标记，避免扫描到仍在写入的文件。
+    """
+    with _live_video_paths_lock:
+        _live_video_paths.add(os.path.normpath(video_path))
+    _forward(LIVE_MESSAGE_VIDEO, video_path)
+
+
+def unmark_live_video(video_path):
+    """
+    取消标记，事件未能生成描述时由事后扫描重新处理该录像。只在事件队列所在的进程调用。
+    """
+    with _live_video_paths_lock:
+        _live_video_paths.discard(os.path.normpath(video_path))
+
+
+def _forward(kind, payload):
+    if _event_sink is None:
+        return False
+    try:
+        _event_sink((kind, payload))
+    except Exception as e:
+        logger.warning(f"无法转发实时事件消息 {kind}: {e}")
+    return True
+
+
+def is_live_video(video_path):
+    """
+    判断录像文件是否已由实时事件处理。
+    """
+    with _live_video_paths_lock:
+        return os.path.normpath(video_path) in _live_video_paths
+
+
+def publish_live_event(event):
+    """
+    将结束的事件放入队列。队列已满时丢弃并记录警告，不阻塞录制线程。
+    """
+    if event.end_time is None:
+        event.finish()
+    if _forward(LIVE_MESSAGE_EVENT, event):
+        logger.info(f"转发实时事件: {event.video_name} ({len(event.keyframes)} 个关键帧)")
+        return
+    try:
+        live_event_queue.put_nowait(event)
+        logger.info(f"发布实时事件: {event.video_name} ({len(event.keyframes)} 个关键帧)")
+    except queue.Full:
+        logger.warning(f"实时事件队列已满，丢弃事件，录像交给事后扫描处理: {event.video_name}")
+        unmark_live_video(event.video_path)
+
+
+class LiveEventDescriber:
+    """
+    实时事件描述线程，从事件队列中取出事件，生成描述并写入向量数据库。
+    """
+
+    def __init__(self, on_described=None):
+        """
+        :param on_described: 可选回调 on_described(event, description, thumbnail_path)，描述完成后调用
+        """
+        self.on_described = on_described
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        logger.info("启动 LiveEventDescriber")
+        self.thread.start()
+
+    def stop(self):
+        logger.info("请求停止 LiveEventDescriber")
+        self.stop_event.set()
+        self.thread.join()
+        logger.info("LiveEventDescriber 已停止")
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                event = live_event_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                if not self._describe(event):
+                    unmark_live_video(event.video_path)
+            except Exception as e:
+                logger.error(f"实时事件描述失败，录像交给事后扫描处理 {event.video_name}: {e}")
+                unmark_live_video(event.video_path)
+            finally:
+                live_event_queue.task_done()
+
+    def _describe(self, event):
+        # 延迟导入，避免录制模块加载模型客户端和数据库
+        from backend.llm.visual import get_visual_explainer
+        from backend.llm.text import text_generate_conclusion
+        from backend.vdb.vector_database import vdb_add_events
+
+        if not event.keyframes:
+            logger.warning(f"实时事件没有关键帧，录像交给事后扫描处理: {event.video_name}")
+            return False
+
+        frames = [frame for _, frame in event.keyframes]
+        thumbnail_path = self._save_thumbnail(event, frames[0]) if LIVE_SAVE_THUMBNAIL else None
+
+        # 关键帧以内存数组交给视觉模型，由其缩放到模型输入尺寸后编码
+        responses = get_visual_explainer().explain_many(frames, show_progress=False)
+        description = text_generate_conclusion(responses, event.start_time, event.end_time)
+
+        metadata = {
+            'video_name': event.video_name,
+            'start_time': event.start_time,
+            'end_time': event.end_time,
+        }
+        if event.camera is not None:
+            metadata['camera'] = event.camera
+        vdb_add_events([description], [metadata])
+        logger.info(f"实时事件已入库: {event.video_name}")
+
+        if self.on_described is not None:
+            self.on_described(event, description, thumbnail_path)
+        return True
+
+    def _save_thumbnail(self, event, frame):
+        """
+        保存缩略图并返回前端可访问的路径（经 /data/cache 路由提供）。
+        """
+        os.makedirs(LIVE_THUMBNAIL_DIR, exist_ok=True)
+        path = os.path.join(LIVE_THUMBNAIL_DIR, f"{event.video_name}_{event.event_id}.jpg")
+        cv2.imwrite(path, frame, [int(cv2.IMWRITE_JPEG_QUALITY), LIVE_IMAGE_QUALITY])
+        relative = os.path.relpath(path, VIDEO_DIR).replace(os.sep, '/')
+        return f"/data/cache/{relative}"
+
+
+def start_live_event_describer(on_described=None):
+    """
+    启动实时事件描述线程。
+    """
+    describer = LiveEventDescriber(on_described=on_described)
+    describer.start()
+    return describer
@@ -1,3 +1,4 @@
+from ollama import AsyncClient
 from ollama import chat
 from ollama import ChatResponse
 from config import LLMConfig
@@ -9,8 +10,14 @@ LONG_LLM_MODEL = LLMConfig.long_text_model
 SHORT_LLM_PROMPT = LLMConfig.short_text_prompt
 SHORT_LLM_MODEL = LLMConfig.short_text_model
 
+ROLLUP_MODEL = LLMConfig.rollup_model
+ROLLUP_PROMPT = LLMConfig.rollup_prompt
+
 QUERY_MODEL = LLMConfig.query_model
 QUERY_MODEL_PROMPT = LLMConfig.query_prompt
+OLLAMA_HOST = LLMConfig.ollama_host
+
+_async_client = None
 
 
 def text_generate_conclusion(list_of_responses, start_time, end_time, print_input=False, print_output=False):
@@ -42,6 +49,35 @@ def text_generate_conclusion(list_of_responses, start_time, end_time, print_inpu
     return output_text
 
 
+def text_generate_rollup_summary(list_of_texts, start_time, end_time, print_output=False):
+    """
+    将一段时间内的事件描述（或下一级时段的汇总）概括为一段话。
+    """
+    messages = []
+    for text in list_of_texts:
+        messages.append({
+            'role': 'assistant',
+            'content': text,
+        })
+
+    messages.append({
+        'role': 'user',
+        'content': ROLLUP_PROMPT,
+    })
+
+    response: ChatResponse = chat(model=ROLLUP_MODEL, messages=messages)
+
+    time_text = f'{start_time}至{end_time}：'
+    output_text = f'{time_text} {response.message.content}'
+
+    if print_output:
+        print(output_text)
+
+    logger.debug(f'时段汇总: {output_text}')
+
+    return output_text
+
+
 def text_generate_short_conclusion(text, print_input=False, print_output=False):
     if print_input:
         print(text)
@@ -88,6 +124,30 @@ def _text_generate_response_from_query_rag_stream(user_query, rag_result, curren
         logger.error(f"流式响应时发生错误: {e}")
         yield f"Error: {e}"
 
+async def text_generate_response_from_query_rag_async(user_query, rag_result, current_time):
+    """
+    流式查询回答的异步版本，使用 ollama.AsyncClient，等待模型输出时不占用线程。
+
+    :return: 异步生成器，逐段返回回答内容；出错时以 "Error: " 开头的内容结束
+    """
+    messages = _arrange_rag_messages(user_query, rag_result, current_time)
+    logger.debug(f'查询消息: {messages}')
+    try:
+        async for part in await _get_async_client().chat(QUERY_MODEL, messages=messages, stream=True):
+            yield part['message']['content']
+    except Exception as e:
+        logger.error(f"流式响应时发生错误: {e}")
+        yield f"Error: {e}"
+
+def _get_async_client():
+    """
+    异步客户端的连接池绑定在创建时的事件循环上，只应在 ASGI 服务的事件循环中使用。
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncClient(host=OLLAMA_HOST)
+    return _async_client
+
 def _arrange_rag_messages(user_query, rag_result, current_time):
     messages = [{
         'role': 'system',
@@ -1,31 +1,248 @@
-from ollama import chat
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from ollama import Client
 from ollama import ChatResponse
 from tqdm import tqdm
 
+from backend.llm.visual_cache import cache_namespace, get_visual_cache, perceptual_hash
 from config import LLMConfig
 from logger import logger
 
 VLM_MODEL = LLMConfig.visual_model
 VLM_PROMPT = LLMConfig.visual_prompt
+VLM_MAX_IN_FLIGHT = LLMConfig.visual_max_in_flight
+VLM_TIMEOUT_S = LLMConfig.visual_timeout_s
+VLM_MAX_RETRIES = LLMConfig.visual_max_retries
+VLM_BATCH_SIZE = LLMConfig.visual_batch_size
+VLM_INPUT_MAX_SIDE = LLMConfig.visual_input_max_side
+VLM_IMAGE_QUALITY = LLMConfig.visual_image_quality
+OLLAMA_HOST = LLMConfig.ollama_host
+
+# 多图请求时附加的提示，要求模型按编号逐张输出
+BATCH_PROMPT = ('There are {count} images. Describe each image separately, '
+                'one line per image, starting with "Image N:" where N is the image number. ')
+BATCH_LINE_PATTERN = re.compile(r'^\s*\**\s*image\s*(\d+)\s*\**\s*[:：]\s*(.*)$', re.IGNORECASE)
+
+
+class VisualExplainer:
+    """
+    视觉模型描述引擎，使用有界线程池并发请求模型服务，支持超时、重试和多图批量请求，
+    返回结果与输入顺序一致。
+    """
+
+    def __init__(self, model=VLM_MODEL, prompt=VLM_PROMPT, host=OLLAMA_HOST,
+                 max_in_flight=VLM_MAX_IN_FLIGHT, timeout_s=VLM_TIMEOUT_S,
+                 max_retries=VLM_MAX_RETRIES, batch_size=VLM_BATCH_SIZE, cache='default',
+                 input_max_side=VLM_INPUT_MAX_SIDE, image_quality=VLM_IMAGE_QUALITY):
+        """
+        :param model:         视觉模型名称
+        :param prompt:        视觉提示词
+        :param host:          模型服务地址
+        :param max_in_flight: 同时进行的请求数
+        :param timeout_s:     单个请求超时，秒
+        :param max_retries:   失败后的重试次数
+        :param batch_size:    每个请求包含的图片数
+        :param cache:         描述缓存 VisualDescriptionCache，'default' 使用共享缓存，None 表示不使用缓存
+        :param input_max_side: 图片发送前缩放到的最长边，None 表示不缩放
+        :param image_quality: 缩放后图片的JPEG编码质量
+        """
+        self.model = model
+        self.prompt = prompt
+        self.max_retries = max_retries
+        self.batch_size = max(1, int(batch_size))
+        self.client = Client(host=host, timeout=timeout_s)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='vlm')
+        self.cache = get_visual_cache() if cache == 'default' else cache
+        self.cache_namespace = cache_namespace(model, prompt)
+        self.input_max_side = input_max_side
+        self.image_quality = image_quality
+
+    def explain(self, image):
+        """
+        :param image: BGR帧数组、图片路径、编码后的图片字节或 base64 字符串
+        :return: 描述文本
+        """
+        phash = self._hash(image)
+        cached = self._cache_get(phash)
+        if cached is not None:
+            return cached
+        response = self._chat(self.prompt, [image])
+        self._cache_put(phash, response)
+        return response
+
+    def explain_many(self, images, show_progress=True):
+        """
+        并发描述多张图片，缓存命中的图片不再请求模型；本次调用中相同或近似重复的图片只请求一次。
+
+        :param images:        图片列表（BGR帧数组、路径、字节或 base64 字符串）
+        :param show_progress: 是否显示进度条
+        :return: 描述文本列表，顺序与 images 一致
+        """
+        responses = [None] * len(images)
+        pending = []  # [(序号, 图片, 哈希)]，每组相同或近似重复的图片只保留第一张
+        duplicates = {}  # 组内第一张图片的序号 -> 同组其余图片的序号
+        for i, image in enumerate(images):
+            phash = self._hash(image)
+            cached = self._cache_get(phash)
+            if cached is not None:
+                responses[i] = cached
+                continue
+            # 本次调用中已有相同或近似重复的图片等待请求时，共用其结果
+            first = next((j for j, _, other in pending if other is not None and self.cache.is_near(phash, other)), None) \
+                if phash is not None else None
+            if first is None:
+                pending.append((i, image, phash))
+            else:
+                duplicates.setdefault(first, []).append(i)
+
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        futures = [self.executor.submit(self._explain_batch, [image for _, image, _ in batch]) for batch in batches]
+
+        with tqdm(total=len(images), desc='视觉模型识别', unit='图片', disable=not show_progress) as progress:
+            progress.update(len(images) - len(pending) - sum(map(len, duplicates.values())))
+            for future, batch in zip(futures, batches):
+                for (i, _, phash), response in zip(batch, future.result()):
+                    for j in [i] + duplicates.get(i, []):
+                        responses[j] = response
+                    self._cache_put(phash, response)
+                    progress.update(1 + len(duplicates.get(i, [])))
+        return responses
+
+    def prepare_image(self, image):
+        """
+        图片缩放到模型输入尺寸后编码为JPEG字节。图片路径和编码后的字节先解码，
+        不超过模型输入尺寸或无法解码时原样返回；base64 字符串原样返回。
+        """
+        if isinstance(image, (bytes, bytearray)):
+            decoded = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        elif isinstance(image, str) and os.path.exists(image):
+            decoded = cv2.imread(image, cv2.IMREAD_COLOR)
+        elif isinstance(image, np.ndarray):
+            return self._encode(image)
+        else:
+            return image
+        if decoded is None or not self._needs_resize(decoded):
+            return image
+        return self._encode(decoded)
+
+    def _needs_resize(self, image):
+        return bool(self.input_max_side) and max(image.shape[:2]) > self.input_max_side
+
+    def _encode(self, image):
+        """
+        帧数组缩放到模型输入尺寸后编码为JPEG字节。
+        """
+        height, width = image.shape[:2]
+        if self._needs_resize(image):
+            scale = self.input_max_side / max(height, width)
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        ret, jpeg = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), self.image_quality])
+        if not ret:
+            raise ValueError('帧编码失败')
+        return jpeg.tobytes()
+
+    def _hash(self, image):
+        if self.cache is None:
+            return None
+        try:
+            return perceptual_hash(image)
+        except Exception as e:
+            logger.debug(f'无法计算图片哈希，跳过缓存: {e}')
+            return None
+
+    def _cache_get(self, phash):
+        if self.cache is None:
+            return None
+        return self.cache.get(self.cache_namespace, phash)
+
+    def _cache_put(self, phash, response):
+        if self.cache is not None:
+            self.cache.put(self.cache_namespace, phash, response)
+
+    def _explain_batch(self, batch):
+        """
+        一次请求描述多张图片；若模型输出无法按图片拆分，退回逐张请求。
+        """
+        if len(batch) == 1:
+            return [self._chat(self.prompt, batch)]
+        content = self._chat(BATCH_PROMPT.format(count=len(batch)) + self.prompt, batch)
+        parsed = {}
+        for line in content.splitlines():
+            match = BATCH_LINE_PATTERN.match(line)
+            if match:
+                parsed[int(match.group(1))] = match.group(2).strip()
+        if sorted(parsed) == list(range(1, len(batch) + 1)):
+            return [parsed[i] for i in range(1, len(batch) + 1)]
+        logger.debug(f'多图响应无法拆分，改为逐张请求: {content}')
+        return [self._chat(self.prompt, [image]) for image in batch]
+
+    def _chat(self, prompt, images):
+        images = [self.prepare_image(image) for image in images]
+        attempt = 0
+        while True:
+            try:
+                response: ChatResponse = self.client.chat(model=self.model, messages=[
+                    {
+                        'role': 'user',
+                        'content': prompt,
+                        'images': images,
+                    },
+                ])
+                return response.message.content
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logger.error(f'视觉模型请求失败，已重试 {attempt} 次: {e}')
+                    raise
+                attempt += 1
+                logger.warning(f'视觉模型请求失败，第 {attempt} 次重试: {e}')
+                time.sleep(min(2 ** (attempt - 1), 10))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+_default_explainer = None
+_default_explainer_lock = threading.Lock()
+
+
+def get_visual_explainer():
+    """
+    获取共享的视觉模型描述引擎。
+    """
+    global _default_explainer
+    with _default_explainer_lock:
+        if _default_explainer is None:
+            _default_explainer = VisualExplainer()
+        return _default_explainer
+
 
 def visual_explain_single_image(image_path, print_output=False):
-    response: ChatResponse = chat(model=VLM_MODEL, messages=[
-        {
-            'role': 'user',
-            'content': VLM_PROMPT,
-            'images': [image_path],
-        },
-    ])
+    response = get_visual_explainer().explain(image_path)
     if print_output:
-        print(response.message.content)
-    logger.debug(f'Response: {response.message.content}')
-    return response.message.content
+        print(response)
+    logger.debug(f'Response: {response}')
+    return response
+
+def visual_explain_frames(frames, print_output=False):
+    """
+    直接描述内存中的帧，不经过磁盘。
+
+    :param frames: BGR帧数组或编码后的图片字节列表
+    """
+    return visual_explain_multiple_images(frames, print_output=print_output)
 
 def visual_explain_multiple_images(image_paths_list, print_output=False):
-    responses = []
-    for image_path in tqdm(image_paths_list, desc='视觉模型识别', unit='图片'):
-        response = visual_explain_single_image(image_path, print_output=print_output)
-        responses.append(response)
+    responses = get_visual_explainer().explain_many(image_paths_list)
+    if print_output:
+        for response in responses:
+            print(response)
 
     logger.debug(f'Responses: {responses}')
 
@@ -34,4 +251,4 @@ def visual_explain_multiple_images(image_paths_list, print_output=False):
 if __name__ == '__main__':
     print('Running Test...')
     image_paths_list = ['/home/patrick/project_nova/test/images/image1.jpg', '/home/patrick/project_nova/test/images/image2.jpg']
-    response = visual_explain_multiple_images(image_paths_list, print_output=True)
\ No newline at end of file
+    response = visual_explain_multiple_images(image_paths_list, print_output=True)
@@ -0,0 +1,249 @@
+# backend/llm/visual_cache.py
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from config import VisualCacheConfig
+from logger import logger
+
+VISUAL_CACHE_ENABLED = VisualCacheConfig.enabled
+VISUAL_CACHE_PATH = VisualCacheConfig.cache_path
+VISUAL_CACHE_MAX_ENTRIES = VisualCacheConfig.max_entries
+VISUAL_CACHE_HASH_SIZE = VisualCacheConfig.hash_size
+VISUAL_CACHE_HAMMING_THRESHOLD = VisualCacheConfig.hamming_threshold
+VISUAL_CACHE_SAVE_EVERY = VisualCacheConfig.save_every
+
+# 近似重复查找要求的最小哈希网格边长，更粗的哈希无法区分画面中是否出现人或车辆
+_MIN_NEAR_HASH_SIZE = 32
+_CACHE_FILE_VERSION = 3
+# 右侧格子比左侧亮超过此灰度值时该位为 1，平坦区域的相邻格子不会随噪声和重新编码翻转
+_DHASH_DEAD_ZONE = 1.0
+
+
+def perceptual_hash(image, hash_size=VISUAL_CACHE_HASH_SIZE):
+    """
+    计算图片的 hash_size² 位差值哈希 (dHash)。
+    网格均值按浮点计算，相邻格子的亮度差超过 _DHASH_DEAD_ZONE 才记为 1，
+    避免平坦区域的位随噪声翻转，使近似重复画面的汉明距离明显小于出现新目标的画面。
+
+    :param image:     图片路径、编码后的图片字节或 BGR/灰度数组
+    :param hash_size: 网格边长
+    :return: 整数哈希，无法解码时返回 None
+    """
+    if isinstance(image, np.ndarray):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    elif isinstance(image, (bytes, bytearray)):
+        gray = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    elif isinstance(image, str) and os.path.exists(image):
+        gray = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+    else:
+        # base64 字符串等无法直接解码的输入不参与缓存
+        return None
+    if gray is None:
+        return None
+
+    small = cv2.resize(gray.astype(np.float32), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = ((small[:, 1:] - small[:, :-1]) > _DHASH_DEAD_ZONE).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def cache_namespace(model, prompt):
+    """
+    模型与提示词决定描述内容，两者任一变化都使用新的命名空间。
+    """
+    return hashlib.md5(f'{model}\0{prompt}'.encode('utf-8')).hexdigest()[:16]
+
+
+class VisualDescriptionCache:
+    """
+    视觉模型描述缓存，以 (模型+提示词, 感知哈希) 为键，支持 LRU 淘汰和持久化。
+
+    默认只有哈希完全相同的画面才命中。近似重复查找只在哈希足够精细时启用，
+    按鸽巢原理把哈希分为 阈值+1 段，距离不超过阈值的哈希至少有一段完全相同，
+    查找时只比较这些段相同的候选，不遍历全部缓存。
+    """
+
+    def __init__(self, cache_path=VISUAL_CACHE_PATH, max_entries=VISUAL_CACHE_MAX_ENTRIES,
+                 hamming_threshold=VISUAL_CACHE_HAMMING_THRESHOLD, save_every=VISUAL_CACHE_SAVE_EVERY,
+                 hash_size=VISUAL_CACHE_HASH_SIZE):
+        """
+        :param cache_path:        缓存持久化文件路径，None 表示仅内存
+        :param max_entries:       最大缓存条数
+        :param hamming_threshold: 近似重复的汉明距离阈值，hash_size 小于 32 时不生效
+        :param save_every:        每新增多少条写盘一次
+        :param hash_size:         与 perceptual_hash 一致的网格边长，用于校验持久化文件
+        """
+        if hamming_threshold > 0 and hash_size < _MIN_NEAR_HASH_SIZE:
+            logger.warning(f'哈希网格边长 {hash_size} 过粗，近似重复查找已关闭，仅精确匹配')
+            hamming_threshold = 0
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.hamming_threshold = hamming_threshold
+        self.save_every = save_every
+        self.hash_size = hash_size
+        self.entries = OrderedDict()  # (命名空间, 哈希) -> 描述，按最近使用排序
+        # 近似重复查找的分段索引: (命名空间, 段序号, 段值) -> {哈希}
+        self.block_bits = -(-hash_size * hash_size // (hamming_threshold + 1))
+        self.blocks = {}
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._unsaved = 0
+        self._load()
+
+    def get(self, namespace, phash):
+        """
+        :return: 缓存的描述，未命中时返回 None
+        """
+        if phash is None:
+            return None
+        with self.lock:
+            key = (namespace, phash)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+            if self.hamming_threshold > 0:
+                best_key, best_distance = None, self.hamming_threshold + 1
+                for candidate in self._candidates(namespace, phash):
+                    distance = (candidate ^ phash).bit_count()
+                    if distance < best_distance:
+                        best_key, best_distance = (namespace, candidate), distance
+                if best_key is not None:
+                    self.entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.near_hits += 1
+                    return self.entries[best_key]
+
+            self.misses += 1
+            return None
+
+    def is_near(self, phash, other):
+        """
+        :return: 两个哈希相同，或汉明距离不超过近似重复阈值
+        """
+        return phash == other or (self.hamming_threshold > 0 and (phash ^ other).bit_count() <= self.hamming_threshold)
+
+    def put(self, namespace, phash, description):
+        if phash is None or description is None:
+            return
+        with self.lock:
+            self._add(namespace, phash, description)
+            while len(self.entries) > self.max_entries:
+                (old_namespace, old_hash), _ = self.entries.popitem(last=False)
+                self._index(old_namespace, old_hash, remove=True)
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def _add(self, namespace, phash, description):
+        """
+        调用方需持有 lock。
+        """
+        key = (namespace, phash)
+        if key not in self.entries:
+            self._index(namespace, phash)
+        self.entries[key] = description
+        self.entries.move_to_end(key)
+
+    def _block_keys(self, namespace, phash):
+        mask = (1 << self.block_bits) - 1
+        return [(namespace, i, (phash >> (i * self.block_bits)) & mask) for i in range(self.hamming_threshold + 1)]
+
+    def _index(self, namespace, phash, remove=False):
+        """
+        调用方需持有 lock。仅精确匹配时不建立索引。
+        """
+        if self.hamming_threshold == 0:
+            return
+        for block_key in self._block_keys(namespace, phash):
+            if remove:
+                hashes = self.blocks.get(block_key)
+                if hashes is not None:
+                    hashes.discard(phash)
+                    if not hashes:
+                        del self.blocks[block_key]
+            else:
+                self.blocks.setdefault(block_key, set()).add(phash)
+
+    def _candidates(self, namespace, phash):
+        """
+        调用方需持有 lock。
+        """
+        candidates = set()
+        for block_key in self._block_keys(namespace, phash):
+            candidates |= self.blocks.get(block_key, set())
+        return candidates
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self.lock:
+            data = [[ns, f'{phash:x}', description] for (ns, phash), description in self.entries.items()]
+            self._unsaved = 0
+        with self.save_lock:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            tmp_path = f'{self.cache_path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': _CACHE_FILE_VERSION, 'hash_size': self.hash_size, 'entries': data},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        logger.debug(f'视觉描述缓存已保存: {len(data)} 条')
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != _CACHE_FILE_VERSION or data.get('hash_size') != self.hash_size:
+                # 哈希方式不同的缓存无法复用
+                logger.info('视觉描述缓存的哈希方式已变化，不加载旧缓存')
+                return
+            for ns, phash_hex, description in data.get('entries', [])[-self.max_entries:]:
+                self._add(ns, int(phash_hex, 16), description)
+            logger.info(f'已加载视觉描述缓存 {len(self.entries)} 条')
+        except Exception as e:
+            logger.error(f'加载视觉描述缓存失败，将使用空缓存: {e}')
+            self.entries.clear()
+            self.blocks.clear()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_visual_cache():
+    """
+    获取共享的视觉描述缓存，未启用时返回 None。进程退出时自动写盘。
+    """
+    global _default_cache
+    if not VISUAL_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = VisualDescriptionCache()
+            atexit.register(_default_cache.save)
+        return _default_cache
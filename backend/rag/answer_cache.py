@@ -0,0 +1,184 @@
+# backend/rag/answer_cache.py
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from backend.vdb.vector_database import vector_store, vdb_add_event_listener
+from config import AnswerCacheConfig
+from logger import logger
+
+ANSWER_CACHE_ENABLED = AnswerCacheConfig.enabled
+ANSWER_CACHE_MAX_ENTRIES = AnswerCacheConfig.max_entries
+ANSWER_CACHE_TTL_S = AnswerCacheConfig.ttl_s
+STREAM_CHUNK_CHARS = AnswerCacheConfig.stream_chunk_chars
+
+PUNCTUATION_PATTERN = re.compile(r'[\s?？!！。.,，、~～]+')
+
+
+def normalize_query(query):
+    """
+    去除空白和标点并转为小写，"昨天有人来吗？" 与 "昨天有人来吗" 视为同一问题。
+    """
+    return PUNCTUATION_PATTERN.sub('', query).lower()
+
+
+def answer_cache_key(query, source_ids, today=None):
+    """
+    键中不包含时间范围："最近一小时"等相对时段的边界随当前时间变化，包含后永远不会命中。
+    时间范围由查询、日期和检索到的事件确定，时段内的新事件由 invalidate_events 使条目失效。
+
+    :param query:      用户查询
+    :param source_ids: 检索到的事件（或汇总）ID
+    :param today:      当前日期，回答中会使用"昨天"等相对说法，日期变化后不再复用
+    """
+    today = today or datetime.now().date()
+    key_str = '\0'.join([normalize_query(query), ','.join(sorted(source_ids)), today.isoformat()])
+    return hashlib.sha256(key_str.encode('utf-8')).hexdigest()
+
+
+def replay_stream(answer, chunk_chars=STREAM_CHUNK_CHARS):
+    """
+    将缓存的完整回答按段返回，与模型流式输出的使用方式一致。
+    """
+    for start in range(0, len(answer), chunk_chars):
+        yield answer[start:start + chunk_chars]
+
+
+async def replay_stream_async(answer, chunk_chars=STREAM_CHUNK_CHARS):
+    """
+    replay_stream 的异步生成器版本。
+    """
+    for part in replay_stream(answer, chunk_chars):
+        yield part
+
+
+class AnswerCache:
+    """
+    rag_query 回答缓存，以 (规范化查询, 检索到的事件ID, 日期) 为键。
+    有新事件写入某条缓存的时间范围时该条目失效；没有时间范围的条目在任何新事件写入时失效，
+    尚未结束的时间范围（如"最近一小时"）在之后的任何时间有新事件写入时失效。
+    """
+
+    def __init__(self, event_store=None, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_s=ANSWER_CACHE_TTL_S):
+        """
+        :param event_store: 只有写入该数据库的事件会使条目失效，None 表示任何数据库
+        :param max_entries: 最大缓存条数
+        :param ttl_s:       缓存有效期，秒
+        """
+        self.event_store = event_store
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.entries = OrderedDict()  # 键 -> (回答, 时间范围 epoch 秒或 None, 写入时间)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def get(self, key):
+        """
+        :return: 缓存的回答，未命中或已过期时返回 None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl_s:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, answer, window):
+        """
+        :param window: 回答对应的时间范围 (开始时间, 结束时间)，结束时间为 None 表示尚未结束
+        """
+        if not answer:
+            return
+        window_ts = None
+        if window:
+            window_ts = (window[0].timestamp(), window[1].timestamp() if window[1] is not None else float('inf'))
+        with self.lock:
+            self.entries[key] = (answer, window_ts, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def cache_stream(self, key, parts, window):
+        """
+        包装模型的流式输出，原样逐段返回，完整结束后写入缓存。
+        """
+        collected = []
+        failed = False
+        for part in parts:
+            # 模型流式输出出错时以 "Error: " 开头的内容结束，这类回答不缓存
+            failed = failed or part.startswith('Error: ')
+            collected.append(part)
+            yield part
+        if not failed:
+            self.put(key, ''.join(collected), window)
+
+    async def cache_stream_async(self, key, parts, window):
+        """
+        cache_stream 的异步版本，包装异步生成器。
+        """
+        collected = []
+        failed = False
+        async for part in parts:
+            failed = failed or part.startswith('Error: ')
+            collected.append(part)
+            yield part
+        if not failed:
+            self.put(key, ''.join(collected), window)
+
+    def invalidate_events(self, metadatas, store=None):
+        """
+        新事件入库回调，移除时间范围与新事件有交集的条目。
+        """
+        if self.event_store is not None and store is not None and store is not self.event_store:
+            return
+        spans = [(meta['start_ts'], meta['end_ts']) for meta in metadatas
+                 if meta.get('start_ts') is not None and meta.get('end_ts') is not None]
+        with self.lock:
+            stale = [key for key, (_, window_ts, _) in self.entries.items()
+                     if window_ts is None or len(spans) < len(metadatas)
+                     or any(start < window_ts[1] and end >= window_ts[0] for start, end in spans)]
+            for key in stale:
+                del self.entries[key]
+            self.invalidated += len(stale)
+        if stale:
+            logger.debug(f'新事件入库，{len(stale)} 条查询回答缓存失效')
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidated': self.invalidated,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """
+    获取共享的查询回答缓存，未启用时返回 None。首次调用时注册新事件入库回调。
+    """
+    global _default_cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AnswerCache(vector_store)
+            vdb_add_event_listener(_default_cache.invalidate_events)
+        return _default_cache
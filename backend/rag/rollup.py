@@ -0,0 +1,329 @@
+# backend/rag/rollup.py
+
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from backend.llm.text import text_generate_rollup_summary
+from backend.vdb.rollup_store import RollupStore
+from backend.vdb.vector_database import BATCH_SIZE, vector_store, vdb_add_event_listener
+from config import RollupConfig
+from logger import logger
+
+ROLLUP_ENABLED = RollupConfig.enabled
+DEFAULT_CAMERA = RollupConfig.default_camera
+REFRESH_INTERVAL_S = RollupConfig.refresh_interval_s
+SETTLE_S = RollupConfig.settle_s
+MAX_EVENTS_PER_SUMMARY = RollupConfig.max_events_per_summary
+ROUTE_MIN_SPAN_H = RollupConfig.route_min_span_h
+DAY_ROUTE_MIN_SPAN_H = RollupConfig.day_route_min_span_h
+MAX_ROLLUPS = RollupConfig.max_rollups
+
+HOUR = 'hour'
+DAY = 'day'
+
+# 概括性问题的常见说法，这类问题用汇总回答，具体事物的问题仍检索事件
+COARSE_QUERY_WORDS = ('发生了什么', '发生什么', '有什么事', '有啥事', '什么情况', '情况如何', '情况怎么样',
+                      '怎么样', '总结', '概括', '汇总', '概况', '都有什么', '有哪些事', '动静')
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 汇总存储中记录的对账水位：上次对账开始的时间，之后写入的事件（indexed_ts 不小于水位）需要对账
+RECONCILE_WATERMARK = 'reconcile_indexed_ts'
+
+
+def event_camera(metadata):
+    """
+    事件所属的摄像头，元数据中没有 camera 字段时归属默认摄像头。
+    """
+    return str(metadata.get('camera') or DEFAULT_CAMERA)
+
+
+def bucket_start(ts, level):
+    start = datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0)
+    return start.replace(hour=0) if level == DAY else start
+
+
+def bucket_end(start, level):
+    return start + (timedelta(days=1) if level == DAY else timedelta(hours=1))
+
+
+def rollup_id(level, camera, start):
+    return f'{level}:{camera}:{start.strftime(TIME_FORMAT)}'
+
+
+def is_coarse_query(query, time_range):
+    """
+    判断是否为较长时间范围内的概括性问题，例如 "这周发生了什么"。
+    """
+    if not time_range:
+        return False
+    span_h = (time_range[1] - time_range[0]).total_seconds() / 3600
+    return span_h >= ROUTE_MIN_SPAN_H and any(word in query for word in COARSE_QUERY_WORDS)
+
+
+def _sample_evenly(items, limit):
+    if len(items) <= limit:
+        return items
+    step = len(items) / limit
+    return [items[int(i * step)] for i in range(limit)]
+
+
+class RollupIndex:
+    """
+    按摄像头维护每小时和每日的事件汇总。
+    新事件入库时只标记所在的小时为待更新，后台刷新时重新汇总这些小时及其所在的日期，
+    每日汇总由当天的小时汇总生成，不再读取原始事件。
+    """
+
+    def __init__(self, event_store, rollup_store, summarize=text_generate_rollup_summary,
+                 settle_s=SETTLE_S, max_events_per_summary=MAX_EVENTS_PER_SUMMARY, batch_size=BATCH_SIZE):
+        """
+        :param event_store:            事件向量数据库
+        :param rollup_store:           汇总存储 RollupStore
+        :param summarize:              汇总函数 summarize(texts, start_time, end_time)
+        :param settle_s:               时段最后一次收到新事件后等待多久再重新汇总，秒
+        :param max_events_per_summary: 每次汇总最多输入的描述数
+        :param batch_size:             分页读取数据库的每批条数
+        """
+        self.event_store = event_store
+        self.rollup_store = rollup_store
+        self.summarize = summarize
+        self.settle_s = settle_s
+        self.max_events_per_summary = max_events_per_summary
+        self.batch_size = batch_size
+        self.dirty = {}  # (级别, 摄像头, 时段开始) -> 最后一次标记的时间（time.monotonic）
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def mark_events(self, metadatas, store=None):
+        """
+        新事件入库回调，标记事件所在的小时为待更新。
+        """
+        if store is not None and store is not self.event_store:
+            return
+        now = time.monotonic()
+        with self.lock:
+            for meta in metadatas:
+                ts = meta.get('start_ts')
+                if ts is None:
+                    continue
+                self.dirty[(HOUR, event_camera(meta), bucket_start(ts, HOUR))] = now
+
+    def reconcile(self):
+        """
+        标记上次对账以来入库的事件所在的小时，用于进程重启期间或其他进程入库的事件。
+        只读取 indexed_ts 不小于对账水位的事件；汇总存储中还没有水位时（首次启动）做一次全量对账。
+
+        :return: 标记的小时数
+        """
+        started = time.time()
+        watermark = self.rollup_store.get_state(RECONCILE_WATERMARK)
+        if watermark is None:
+            marked = self._reconcile_all()
+        else:
+            marked = self._mark_indexed_since(watermark)
+        self.rollup_store.set_state(RECONCILE_WATERMARK, started)
+        if marked:
+            logger.info(f'发现 {marked} 个小时的汇总需要更新')
+        return marked
+
+    def _mark_indexed_since(self, watermark):
+        now = time.monotonic()
+        keys = set()
+        for meta in self._iter_metadatas(self.event_store, where={'indexed_ts': {'$gte': watermark}}):
+            ts = meta.get('start_ts')
+            if ts is not None:
+                keys.add((HOUR, event_camera(meta), bucket_start(ts, HOUR)))
+        marked = 0
+        with self.lock:
+            for key in keys:
+                if key not in self.dirty:
+                    self.dirty[key] = now
+                    marked += 1
+        return marked
+
+    def _reconcile_all(self):
+        """
+        对比每小时的事件数与已有汇总记录的事件数，标记不一致的小时，包括事件已被删除的小时。
+        """
+        counts = Counter()
+        for meta in self._iter_metadatas(self.event_store):
+            ts = meta.get('start_ts')
+            if ts is not None:
+                counts[(event_camera(meta), bucket_start(ts, HOUR))] += 1
+
+        stored = {(camera, datetime.fromtimestamp(start_ts)): count
+                  for (camera, start_ts), count in self.rollup_store.event_counts(HOUR).items()}
+
+        marked = 0
+        with self.lock:
+            for (camera, start), count in counts.items():
+                if stored.get((camera, start)) != count:
+                    self.dirty.setdefault((HOUR, camera, start), 0)
+                    marked += 1
+            for camera, start in stored.keys() - counts.keys():
+                # 事件已被删除的时段
+                self.dirty.setdefault((HOUR, camera, start), 0)
+                marked += 1
+        return marked
+
+    def refresh(self, force=False):
+        """
+        重新汇总已稳定的待更新小时，然后汇总受影响的日期。
+
+        :param force: 为 True 时不等待 settle_s，立即汇总全部待更新时段
+        :return: 更新的汇总数
+        """
+        with self.refresh_lock:
+            self.reconcile()
+            updated = 0
+            for level in (HOUR, DAY):
+                for _, camera, start in self._take_ready(level, force):
+                    try:
+                        self._update_bucket(level, camera, start)
+                        updated += 1
+                    except Exception as e:
+                        logger.error(f'更新{camera} {start} 的汇总失败，稍后重试: {e}')
+                        with self.lock:
+                            self.dirty.setdefault((level, camera, start), time.monotonic())
+                        continue
+                    if level == HOUR:
+                        with self.lock:
+                            self.dirty[(DAY, camera, bucket_start(start.timestamp(), DAY))] = 0
+            return updated
+
+    def pending(self):
+        with self.lock:
+            return len(self.dirty)
+
+    def search(self, time_range, camera=None, max_rollups=MAX_ROLLUPS):
+        """
+        读取与时间范围有交集的汇总，较长的范围使用每日汇总，否则使用每小时汇总。
+
+        :return: 按时间排序的 [(汇总文本, 元数据)]
+        """
+        start, end = time_range
+        span_h = (end - start).total_seconds() / 3600
+        level = DAY if span_h >= DAY_ROUTE_MIN_SPAN_H else HOUR
+        results = self.rollup_store.between(level, start.timestamp(), end.timestamp(), camera)
+        if len(results) > max_rollups:
+            logger.debug(f'汇总数 {len(results)} 超过上限，仅使用最近的 {max_rollups} 条')
+            results = results[-max_rollups:]
+        return results
+
+    def _take_ready(self, level, force):
+        now = time.monotonic()
+        with self.lock:
+            ready = [key for key, marked in self.dirty.items()
+                     if key[0] == level and (force or now - marked >= self.settle_s)]
+            for key in ready:
+                del self.dirty[key]
+        # 最近的时段最可能被查询，优先汇总
+        return sorted(ready, key=lambda key: key[2], reverse=True)
+
+    def _update_bucket(self, level, camera, start):
+        end = bucket_end(start, level)
+        if level == HOUR:
+            time_filter = [{'start_ts': {'$gte': start.timestamp()}}, {'start_ts': {'$lt': end.timestamp()}}]
+            page = self.event_store.get(where={'$and': time_filter}, include=['documents', 'metadatas'])
+            sources = [(text, meta) for text, meta in zip(page.get('documents', []), page.get('metadatas', []))
+                       if event_camera(meta) == camera]
+            event_count = len(sources)
+        else:
+            sources = self.rollup_store.between(HOUR, start.timestamp(), end.timestamp(), camera)
+            event_count = sum(meta.get('event_count', 0) for _, meta in sources)
+
+        bucket_id = rollup_id(level, camera, start)
+        if not sources:
+            self.rollup_store.delete(bucket_id)
+            return
+
+        sources.sort(key=lambda item: item[1].get('start_ts', 0))
+        texts = _sample_evenly([text for text, _ in sources], self.max_events_per_summary)
+        video_names = []
+        for _, meta in sources:
+            names = meta.get('video_names', '').split(',') if level == DAY else [meta.get('video_name', '')]
+            video_names.extend(name for name in names if name and name not in video_names)
+
+        summary = self.summarize(texts, start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT))
+        self.rollup_store.put(bucket_id, summary, {
+            'level': level,
+            'camera': camera,
+            'start_time': start.strftime(TIME_FORMAT),
+            'end_time': end.strftime(TIME_FORMAT),
+            'start_ts': start.timestamp(),
+            'end_ts': end.timestamp(),
+            'event_count': event_count,
+            'video_names': ','.join(video_names),
+        })
+        logger.debug(f'已更新{level}汇总 {bucket_id}: {event_count} 个事件')
+
+    def _iter_metadatas(self, store, where=None):
+        offset = 0
+        while True:
+            page = store.get(where=where, include=['metadatas'], limit=self.batch_size, offset=offset)
+            metadatas = page.get('metadatas', [])
+            if not metadatas:
+                break
+            for meta in metadatas:
+                yield meta or {}
+            offset += len(metadatas)
+
+
+class RollupUpdater:
+    """
+    后台汇总线程，定期重新汇总收到新事件的时段。
+    """
+
+    def __init__(self, index, interval_s=REFRESH_INTERVAL_S):
+        self.index = index
+        self.interval_s = interval_s
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        logger.info("启动 RollupUpdater")
+        self.thread.start()
+
+    def stop(self):
+        logger.info("请求停止 RollupUpdater")
+        self.stop_event.set()
+        self.thread.join()
+        logger.info("RollupUpdater 已停止")
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                updated = self.index.refresh()
+                if updated:
+                    logger.info(f'已更新 {updated} 条时段汇总，剩余 {self.index.pending()} 条待更新')
+            except Exception as e:
+                logger.error(f'更新时段汇总时发生错误: {e}')
+            self.stop_event.wait(self.interval_s)
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_rollup_index():
+    """
+    获取共享的汇总索引，首次调用时注册新事件入库回调。
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = RollupIndex(vector_store, RollupStore())
+            vdb_add_event_listener(_default_index.mark_events)
+        return _default_index
+
+
+def start_rollup_updater():
+    """
+    启动后台汇总线程。
+    """
+    updater = RollupUpdater(get_rollup_index())
+    updater.start()
+    return updater
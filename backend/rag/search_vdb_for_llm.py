@@ -1,8 +1,13 @@
+import asyncio
 import os
 from datetime import datetime
 
-from backend.vdb.vector_database import vdb_search_event
-from backend.llm.text import text_generate_response_from_query_rag
+from backend.vdb.vector_database import event_id_of, vdb_search_event
+from backend.vdb.event_catalog import get_event_catalog
+from backend.rag.time_range import parse_time_range
+from backend.rag.rollup import ROLLUP_ENABLED, get_rollup_index, is_coarse_query
+from backend.rag.answer_cache import answer_cache_key, get_answer_cache, replay_stream, replay_stream_async
+from backend.llm.text import text_generate_response_from_query_rag, text_generate_response_from_query_rag_async
 
 from logger import logger
 from config import GlobalConfig
@@ -12,15 +17,54 @@ def get_user_query_input():
     return user_query
 
 
-def get_rag_result(user_query):
-    rag_results = vdb_search_event(user_query)
+def get_rag_result(user_query, time_range=None):
+    """
+    :return: (检索结果文本, 视频名列表, 事件ID列表)
+    """
+    # 在本地解析查询中的时间范围，直接在向量数据库中按时间过滤
+    time_range = time_range or parse_time_range(user_query)
+    if time_range:
+        logger.debug(f'解析到查询时间范围: {time_range[0]} ~ {time_range[1]}')
+    rag_results = vdb_search_event(user_query, time_range=time_range)
     # 转为字符串
     result_str = str()
+    if time_range:
+        result_str += (f'查询时间范围：{time_range[0].strftime("%Y-%m-%d %H:%M")} 至 '
+                       f'{time_range[1].strftime("%Y-%m-%d %H:%M")} \n\ \n')
+        # 检索只返回最相关的几个事件，时间范围内的事件总数由事件目录的时间索引统计
+        event_count = get_event_catalog().count_between(time_range[0].timestamp(), time_range[1].timestamp())
+        if event_count >= len(rag_results):
+            # 事件目录尚未记录全部事件（如只有向量数据库的旧数据）时不提供总数
+            result_str += f'该时间范围内共记录 {event_count} 个事件，以下为其中最相关的 {len(rag_results)} 个 \n\ \n'
     video_name_list = list()
     for result in rag_results:
         result_str += f'搜索结果摘要：{result.page_content} \n\ \n'
         video_name_list.append(result.metadata.get('video_name'))
-    return result_str, video_name_list
+    return result_str, video_name_list, [event_id_of(result) for result in rag_results]
+
+
+def get_rollup_result(time_range):
+    """
+    读取时间范围内的时段汇总，没有汇总时返回 None。
+
+    :return: (汇总文本, 视频名列表, 汇总ID列表)
+    """
+    rollups = get_rollup_index().search(time_range)
+    if not rollups:
+        return None
+    logger.debug(f'使用 {len(rollups)} 条时段汇总回答')
+    result_str = (f'查询时间范围：{time_range[0].strftime("%Y-%m-%d %H:%M")} 至 '
+                  f'{time_range[1].strftime("%Y-%m-%d %H:%M")} \n\ \n')
+    video_name_list = list()
+    source_ids = list()
+    for summary, metadata in rollups:
+        # 汇总ID附带事件数，汇总重新生成后不再复用旧回答
+        source_ids.append(f'{metadata["level"]}:{metadata["camera"]}:{metadata["start_time"]}#{metadata.get("event_count")}')
+        result_str += f'时段汇总（{metadata.get("event_count")} 个事件）：{summary} \n\ \n'
+        for video_name in metadata.get('video_names', '').split(','):
+            if video_name and video_name not in video_name_list:
+                video_name_list.append(video_name)
+    return result_str, video_name_list, source_ids
 
 
 def get_current_time():
@@ -30,19 +74,85 @@ def get_current_time():
     return current_time_str
 
 
+def _prepare_rag_query(user_query):
+    """
+    检索与回答缓存查找，不调用查询模型。
+
+    :return: (检索结果文本, 视频名列表, 回答缓存, 缓存键, 缓存时段, 缓存的回答)，未启用缓存或未命中时后几项为 None
+    """
+    logger.debug(f'用户查询: {user_query}')
+    time_range = parse_time_range(user_query)
+    rollup_result = None
+    if ROLLUP_ENABLED and is_coarse_query(user_query, time_range):
+        # 较长时间范围的概括性问题直接使用时段汇总，代价与存档规模无关
+        rollup_result = get_rollup_result(time_range)
+    if rollup_result is not None:
+        rag_result, video_name_list, source_ids = rollup_result
+    else:
+        rag_result, video_name_list, source_ids = get_rag_result(user_query, time_range)
+
+    # 相同问题、相同时间范围且检索到相同事件时复用回答，跳过查询模型
+    answer_cache = get_answer_cache()
+    cache_key = window = cached = None
+    if answer_cache is not None:
+        # 缓存使用完整时段（如整个今天），该时段内有新事件入库时缓存失效
+        now = datetime.now()
+        window = parse_time_range(user_query, now=now, clip_to_now=False)
+        if window is not None and window[1] >= now:
+            # 截止到当前时间的相对时段（如"最近一小时"），之后入库的事件都使缓存失效
+            window = (window[0], None)
+        cache_key = answer_cache_key(user_query, source_ids)
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            logger.debug('命中查询回答缓存')
+    return rag_result, video_name_list, answer_cache, cache_key, window, cached
+
+
 def rag_query(user_query=None, stream=False, with_video_list=False):
     while not user_query:
         logger.debug('未输入查询内容，获取用户输入')
         user_query = get_user_query_input()
-    logger.debug(f'用户查询: {user_query}')
-    rag_result, video_name_list = get_rag_result(user_query)
-    text_response = text_generate_response_from_query_rag(user_query=user_query,
-                                                          rag_result=rag_result,
-                                                          current_time=get_current_time(),
-                                                          stream=stream)
+    rag_result, video_name_list, answer_cache, cache_key, window, cached = _prepare_rag_query(user_query)
+
+    if cached is not None:
+        text_response = replay_stream(cached) if stream else cached
+    else:
+        text_response = text_generate_response_from_query_rag(user_query=user_query,
+                                                              rag_result=rag_result,
+                                                              current_time=get_current_time(),
+                                                              stream=stream)
+        if answer_cache is not None:
+            if stream:
+                text_response = answer_cache.cache_stream(cache_key, text_response, window)
+            else:
+                answer_cache.put(cache_key, text_response, window)
     logger.debug(f'查询结果: {text_response}')
     logger.debug(f'使用的视频: {video_name_list}')
     if not with_video_list:
         return text_response
     else:
-        return text_response, video_name_list
\ No newline at end of file
+        return text_response, video_name_list
+
+
+async def rag_query_async(user_query, with_video_list=False):
+    """
+    rag_query 的异步流式版本，供 ASGI 服务使用：检索在线程池中执行，回答由异步客户端流式生成。
+
+    :return: 逐段返回回答的异步生成器；with_video_list 时为 (异步生成器, 视频名列表)
+    """
+    rag_result, video_name_list, answer_cache, cache_key, window, cached = \
+        await asyncio.to_thread(_prepare_rag_query, user_query)
+
+    if cached is not None:
+        text_response = replay_stream_async(cached)
+    else:
+        text_response = text_generate_response_from_query_rag_async(user_query=user_query,
+                                                                    rag_result=rag_result,
+                                                                    current_time=get_current_time())
+        if answer_cache is not None:
+            text_response = answer_cache.cache_stream_async(cache_key, text_response, window)
+    logger.debug(f'使用的视频: {video_name_list}')
+    if not with_video_list:
+        return text_response
+    else:
+        return text_response, video_name_list
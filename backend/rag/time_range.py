@@ -0,0 +1,237 @@
+# backend/rag/time_range.py
+
+import re
+from datetime import datetime, timedelta
+
+# 时段 -> (开始小时, 结束小时)
+DAY_PARTS = [
+    ('凌晨', (0, 6)),
+    ('清晨', (5, 9)),
+    ('早上', (6, 9)),
+    ('早晨', (6, 9)),
+    ('上午', (6, 12)),
+    ('中午', (11, 14)),
+    ('下午', (12, 18)),
+    ('傍晚', (17, 19)),
+    ('晚上', (18, 24)),
+    ('夜里', (18, 24)),
+    ('夜间', (18, 24)),
+    ('半夜', (0, 4)),
+]
+
+CN_DIGITS = {'零': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5,
+             '六': 6, '七': 7, '八': 8, '九': 9}
+WEEKDAYS = {'一': 0, '二': 1, '三': 2, '四': 3, '五': 4, '六': 5, '日': 6, '天': 6, '末': 5}
+NUM = r'(\d+|[零一二两三四五六七八九十]+)'
+# 点/时只在有时间上下文时表示钟点，避免“有一点奇怪”被解析为 1 点
+HOUR_PATTERN = re.compile(NUM + r'(点钟|[点时])(半|' + NUM + r'分|左右|前后|以前|以后|之前|之后)?')
+HOUR_CONTEXT_BEFORE = re.compile('(?:' + '|'.join(word for word, _ in DAY_PARTS) +
+                                 r'|今早|今晚|今夜|昨晚|昨夜|[日号天])$')
+
+
+def _to_int(text):
+    """
+    解析阿拉伯数字或不超过99的中文数字。
+    """
+    if text.isdigit():
+        return int(text)
+    if '十' in text:
+        tens, _, ones = text.partition('十')
+        return (CN_DIGITS.get(tens, 1) if tens else 1) * 10 + (CN_DIGITS.get(ones, 0) if ones else 0)
+    value = 0
+    for ch in text:
+        value = value * 10 + CN_DIGITS[ch]
+    return value
+
+
+def _day_start(dt):
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _month_start(dt):
+    return _day_start(dt).replace(day=1)
+
+
+def _resolve_day(query, now):
+    """
+    解析查询中的日期部分。
+
+    :return: (开始时间, 结束时间, 是否为单日)，未找到时返回 None
+    """
+    today = _day_start(now)
+
+    # 相对时长：最近/过去/前 N 小时、N 分钟、N 天（“前两天”为最近两天，“两天前”为当天，见下方相对日期）
+    match = re.search(r'(?:最近|过去|近|这|前)' + NUM + r'个?(小时|钟头|分钟|天|日)', query) \
+        or re.search(NUM + r'个?(小时|钟头|分钟|天|日)(?:之内|以内|内)', query)
+    if match:
+        amount = _to_int(match.group(1))
+        unit = match.group(2)
+        if unit in ('小时', '钟头'):
+            delta = timedelta(hours=amount)
+        elif unit == '分钟':
+            delta = timedelta(minutes=amount)
+        else:
+            delta = timedelta(days=amount)
+        return now - delta, now, False
+    if re.search(r'刚才|刚刚', query):
+        return now - timedelta(hours=1), now, False
+
+    # 绝对日期：YYYY-MM-DD、YYYY年M月D日、M月D日、D号
+    match = re.search(r'(\d{4})[-/年](\d{1,2})[-/月](\d{1,2})[日号]?', query)
+    if match:
+        day = datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        return day, day + timedelta(days=1), True
+    match = re.search(NUM + r'月' + NUM + r'[日号]', query)
+    if match:
+        day = datetime(now.year, _to_int(match.group(1)), _to_int(match.group(2)))
+        if day > now:
+            day = day.replace(year=now.year - 1)
+        return day, day + timedelta(days=1), True
+    match = re.search(r'(?<![月\d])' + NUM + r'[日号]', query)
+    if match and not re.search(r'[一二两三四五六七八九十\d]+[日天]前', query):
+        day_of_month = _to_int(match.group(1))
+        if 1 <= day_of_month <= 31:
+            month_start = _month_start(now)
+            if day_of_month > now.day:
+                month_start = _month_start(month_start - timedelta(days=1))
+            try:
+                day = month_start.replace(day=day_of_month)
+                return day, day + timedelta(days=1), True
+            except ValueError:
+                pass
+
+    # 相对日期
+    match = re.search(NUM + r'[天日]前', query)
+    if match:
+        day = today - timedelta(days=_to_int(match.group(1)))
+        return day, day + timedelta(days=1), True
+    for words, offset in ((('大前天',), -3), (('前天',), -2), (('昨天', '昨日', '昨晚', '昨夜'), -1),
+                          (('今天', '今日', '今晚', '今早', '今夜'), 0)):
+        if any(word in query for word in words):
+            day = today + timedelta(days=offset)
+            return day, day + timedelta(days=1), True
+
+    # 星期
+    this_monday = today - timedelta(days=today.weekday())
+    match = re.search(r'(上上|上|这|本)?(?:个)?(?:周|星期|礼拜)([一二三四五六日天末])', query)
+    if match:
+        prefix, weekday = match.group(1), WEEKDAYS[match.group(2)]
+        week_offset = {'上上': -2, '上': -1}.get(prefix, 0)
+        day = this_monday + timedelta(weeks=week_offset, days=weekday)
+        if not prefix and day > today:
+            day -= timedelta(weeks=1)
+        days = 2 if match.group(2) == '末' else 1
+        return day, day + timedelta(days=days), days == 1
+    if re.search(r'上上(?:个)?(?:周|星期|礼拜)', query):
+        return this_monday - timedelta(weeks=2), this_monday - timedelta(weeks=1), False
+    if re.search(r'上(?:个)?(?:周|星期|礼拜)', query):
+        return this_monday - timedelta(weeks=1), this_monday, False
+    if re.search(r'(?:这|本)(?:个)?(?:周|星期|礼拜)', query):
+        return this_monday, this_monday + timedelta(weeks=1), False
+
+    # 月份
+    if re.search(r'上(?:个)?月', query):
+        this_month = _month_start(now)
+        return _month_start(this_month - timedelta(days=1)), this_month, False
+    if re.search(r'(?:这|本)(?:个)?月', query):
+        return _month_start(now), _month_start(_month_start(now) + timedelta(days=32)), False
+
+    return None
+
+
+def _word_in(query, words):
+    return any(word in query for word in words)
+
+
+def _find_hour(query):
+    """
+    查找表示钟点的 N点/N时：带“钟”、后接半/N分/左右等、数字为阿拉伯数字，或紧跟在时段、日期词之后。
+
+    :return: re.Match，第一组为小时数，没有时返回 None
+    """
+    for match in HOUR_PATTERN.finditer(query):
+        if match.group(2) == '点钟' or match.group(3) or match.group(1).isdigit() \
+                or HOUR_CONTEXT_BEFORE.search(query, 0, match.start()):
+            return match
+    return None
+
+
+def _latest_started(days, hours, now):
+    """
+    候选日期与钟点组合中最近一个已开始的时刻，都还未开始时取最早的一个。
+    """
+    starts = sorted(day + timedelta(hours=hour) for day in days for hour in hours)
+    started = [dt for dt in starts if dt <= now]
+    return started[-1] if started else starts[0]
+
+
+def _apply_day_part(query, start, end, single_day, day_given, now):
+    """
+    在单日范围内进一步应用时段（上午、下午、N点等）。
+    """
+    part = None
+    for word, hours in DAY_PARTS:
+        if word in query:
+            part = hours
+            break
+    if _word_in(query, ('昨晚', '今晚', '昨夜', '今夜')) and part is None:
+        part = (18, 24)
+
+    hour_match = _find_hour(query)
+    hours = None
+    if hour_match:
+        hour = _to_int(hour_match.group(1))
+        if part is not None and hour == 12 and (part[0] >= 18 or part[1] <= 6):
+            # 晚上/夜里12点是次日0点，凌晨/半夜12点是当日0点
+            hour = 24 if part[0] >= 18 else 0
+        elif part is not None and part[0] >= 12 and hour < 12:
+            hour += 12
+        if 0 <= hour <= 24:
+            # 没有时段的 1-11 点可能是上午也可能是下午，取最近一个已开始的
+            hours = (hour, hour + 12) if part is None and 1 <= hour < 12 else (hour,)
+
+    if hours is not None:
+        length = 1
+    elif part is not None:
+        hours, length = (part[0],), part[1] - part[0]
+    else:
+        return start, end
+    if not day_given:
+        # 只提到时段没有提到日期：取最近一个已开始的该时段
+        today = _day_start(now)
+        days = (today - timedelta(days=1), today)
+    elif single_day:
+        days = (start,)
+    else:
+        return start, end
+    start = _latest_started(days, hours, now)
+    return start, start + timedelta(hours=length)
+
+
+def parse_time_range(query, now=None, clip_to_now=True):
+    """
+    从自然语言查询中解析时间范围。
+
+    :param query:       用户查询，例如 "昨天下午有人来过吗"
+    :param now:         当前时间，默认 datetime.now()
+    :param clip_to_now: 正在进行的时间段是否截止到当前时间，为 False 时返回完整时段（如整个今天）
+    :return: (开始时间, 结束时间)，查询中没有时间表达或日期不存在时返回 None
+    """
+    now = now or datetime.now()
+    try:
+        resolved = _resolve_day(query, now)
+    except ValueError:
+        # 不存在的日期（如 2月30日、13月1日），以及上一年没有对应日期（如 2月29日）时不按时间过滤
+        return None
+    if resolved is None:
+        start, end, single_day, day_given = None, None, False, False
+    else:
+        (start, end, single_day), day_given = resolved, True
+
+    start, end = _apply_day_part(query, start, end, single_day, day_given, now)
+    if start is None:
+        return None
+    # 正在进行的时间段截止到当前时间
+    if clip_to_now and start < now < end:
+        end = now
+    return start, end
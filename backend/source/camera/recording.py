@@ -4,10 +4,17 @@ import cv2
 import threading
 import time
 import os
-from collections import deque
+from functools import partial
 from datetime import datetime
 
 from config import CameraConfig, VideoRecordingConfig
+from backend.source.frame_buffer import CompressedFrameBuffer, FrameRingBuffer
+from backend.source.recording_writer import RecordingWriter
+from backend.source.frame_scheduler import FrameScheduler
+from backend.source.frame_format import negotiate_format, negotiate_from_buffer, save_recording_metadata
+from backend.source.video_writers import open_video_writer, prepare_video_writer
+from backend.source.preview_bus import PREVIEW_FPS, PreviewBuffer
+from backend.live.live_events import LIVE_EVENT_ENABLED, LiveEvent, publish_live_event
 from logger import logger
 
 # 从配置文件加载参数
@@ -18,10 +25,12 @@ VIDEO_DIR = VideoRecordingConfig.video_dir
 VIDEO_CACHE_DURATION_S = VideoRecordingConfig.video_cache_duration_s
 VIDEO_FPS = VideoRecordingConfig.video_fps
 VIDEO_SIZE = tuple(VideoRecordingConfig.video_size)  # 确保是元组，例如 (1920, 1080)
-VIDEO_CODEC = VideoRecordingConfig.video_codec
-VIDEO_BITRATE_MBPS = VideoRecordingConfig.video_bitrate_mbps
 VIDEO_RECORDING_WINDOW_S = VideoRecordingConfig.video_recording_window_s
 MIN_MOTION_AREA = VideoRecordingConfig.min_motion_area  # 添加一个最小运动面积的配置
+PREROLL_MODE = VideoRecordingConfig.preroll_mode
+PREROLL_JPEG_QUALITY = VideoRecordingConfig.preroll_jpeg_quality
+PREROLL_RAW_BUFFER_S = VideoRecordingConfig.preroll_raw_buffer_s
+CAPTURE_RETRY_S = 0.1  # 读取失败后重试前的等待时间，秒
 
 # 新增的运动检测灵敏度参数
 MOTION_BG_HISTORY = VideoRecordingConfig.motion_bg_history
@@ -37,29 +46,63 @@ class CameraRecorder:
     同时提供获取当前摄像头画面的功能，便于实时显示在前端。
     """
 
-    def __init__(self):
-        self.capture = cv2.VideoCapture(CAMERA_ID)
+    def __init__(self, camera_id=CAMERA_ID, video_dir=VIDEO_DIR, name=None, preview=None):
+        """
+        :param camera_id: 摄像头编号或设备路径；也可以是视频文件路径，此时按文件帧率播放并循环，用于模拟摄像头
+        :param video_dir: 录像保存目录
+        :param name:      摄像头名称，多路录制时写入事件元数据，None 时使用默认摄像头
+        :param preview:   实时画面共享内存 PreviewBuffer，None 时自行创建
+        """
+        self.camera_id = camera_id
+        self.name = name
+        self.video_dir = video_dir
+        self.capture = cv2.VideoCapture(camera_id)
         if not self.capture.isOpened():
-            logger.error(f"无法打开摄像头 ID: {CAMERA_ID}")
-            raise ValueError(f"无法打开摄像头 ID: {CAMERA_ID}")
-
-        # 设置摄像头参数（可选）
-        self.capture.set(cv2.CAP_PROP_FPS, VIDEO_FPS)
-        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_SIZE[0])
-        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_SIZE[1])
+            logger.error(f"无法打开摄像头 ID: {camera_id}")
+            raise ValueError(f"无法打开摄像头 ID: {camera_id}")
+
+        # 视频文件解码不会按帧率阻塞，需要自行控制节奏
+        self.is_file = isinstance(camera_id, str) and os.path.isfile(camera_id)
+        if self.is_file:
+            file_fps = self.capture.get(cv2.CAP_PROP_FPS)
+            self.file_frame_interval = 1.0 / (file_fps if file_fps and file_fps > 0 else VIDEO_FPS)
+        else:
+            # 设置摄像头参数（可选）
+            self.capture.set(cv2.CAP_PROP_FPS, VIDEO_FPS)
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_SIZE[0])
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_SIZE[1])
+
+        # 预分配的帧环形缓冲区，作为实时画面和运动检测的帧来源；
+        # 'raw' 模式下同时作为预录缓存，'jpeg' 模式下预录缓存为逐帧压缩的独立缓冲区
+        if PREROLL_MODE == 'jpeg':
+            self.frame_buffer = FrameRingBuffer(int(PREROLL_RAW_BUFFER_S * VIDEO_FPS))
+            self.preroll_buffer = CompressedFrameBuffer(int(VIDEO_CACHE_DURATION_S * VIDEO_FPS), PREROLL_JPEG_QUALITY)
+        else:
+            self.frame_buffer = FrameRingBuffer(int(VIDEO_CACHE_DURATION_S * VIDEO_FPS))
+            self.preroll_buffer = None
 
-        self.frame_buffer = deque(maxlen=int(VIDEO_CACHE_DURATION_S * VIDEO_FPS))
-        self.buffer_lock = threading.Lock()
+        # 录像写入线程，缩放、编码和预录写入都不占用采集线程
+        self.writer = RecordingWriter(VIDEO_SIZE, self.frame_buffer)
+        self.frame_format = None  # 视频源协商格式，首次录制时根据实际分辨率和帧率确定
 
         self.recording = False
         self.recording_lock = threading.Lock()
-        self.video_writer = None
         self.record_start_time = None
 
         self.last_motion_time = None
+        self.live_event = None  # 当前录制对应的实时事件
 
         self.stop_event = threading.Event()
         self.thread = threading.Thread(target=self._run, daemon=True)
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True, name='camera-capture')
+
+        # 帧时钟调度：录制逐帧进行，运动检测按配置的间隔进行，两者频率相互独立
+        self.scheduler = FrameScheduler(self.frame_buffer, 'CameraRecorder')
+        self.scheduler.add_consumer(self._on_frame, name='recording')
+        self.scheduler.add_consumer(self._on_motion_tick, VIDEO_MOTION_DETECT_INTERVAL_MS / 1000.0, name='motion')
+        # 实时画面按 PREVIEW_FPS 编码一次写入共享内存，与浏览器连接数无关
+        self.preview = preview if preview is not None else PreviewBuffer.create()
+        self.scheduler.add_consumer(self._on_preview_tick, 1.0 / PREVIEW_FPS, name='preview')
 
         # 初始化背景减除器，使用配置文件中的参数
         self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
@@ -68,20 +111,20 @@ class CameraRecorder:
             detectShadows=MOTION_DETECTSHADOWS
         )
 
-        # 当前帧，用于实时显示
-        self.current_frame = None
-        self.current_frame_lock = threading.Lock()
-
     def start(self):
         """
         启动摄像头录制线程。
         """
         logger.info("启动 CameraRecorder")
         # 确保视频保存目录存在
-        if not os.path.exists(VIDEO_DIR):
-            os.makedirs(VIDEO_DIR)
-            logger.info(f"创建视频保存目录: {VIDEO_DIR}")
-
+        if not os.path.exists(self.video_dir):
+            os.makedirs(self.video_dir)
+            logger.info(f"创建视频保存目录: {self.video_dir}")
+        # 在开始录制前检查 ffmpeg，避免首次录制时在调度线程中启动探测子进程
+        prepare_video_writer()
+
+        self.writer.start()
+        self.capture_thread.start()
         self.thread.start()
 
         # 等待冷启动时间
@@ -89,69 +132,74 @@ class CameraRecorder:
         time.sleep(COLD_START_WAIT_S)
         logger.info(f"冷启动完成，开始运动检测")
 
-    def _run(self):
+    def _capture_loop(self):
         """
-        后台线程运行的主循环，负责帧获取、运动检测和视频录制。
-        使用时间控制机制分离帧捕捉和运动检测的频率。
+        采集线程：阻塞在摄像头读取上，直接解码到环形缓冲区的槽位中并发布，不做其他处理。
+        帧的节奏由摄像头决定（视频文件按文件帧率等待），处理由调度线程按帧序号完成。
         """
-        logger.info("CameraRecorder 线程开始运行")
-        frame_interval = 1.0 / VIDEO_FPS  # 每帧的时间间隔
+        logger.info("CameraRecorder 采集线程开始运行")
         next_frame_time = time.time()
-        next_motion_time = time.time()
-
         while not self.stop_event.is_set():
-            current_time = time.time()
-
-            # 捕捉帧
-            if current_time >= next_frame_time:
-                ret, frame = self.capture.read()
-                if not ret:
-                    logger.warning("无法从摄像头读取帧")
-                    next_frame_time += frame_interval
+            slot = self.frame_buffer.acquire()
+            ret, frame = self.capture.read(slot) if slot is not None else self.capture.read()
+            if not ret:
+                if self.is_file:
+                    # 视频文件播放结束，从头循环
+                    self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
                     continue
+                logger.warning("无法从摄像头读取帧")
+                self.stop_event.wait(CAPTURE_RETRY_S)
+                continue
+            self.frame_buffer.commit(frame)
+            if self.is_file:
+                next_frame_time = max(next_frame_time + self.file_frame_interval, time.time() - self.file_frame_interval)
+                self.stop_event.wait(max(0.0, next_frame_time - time.time()))
+        logger.info("CameraRecorder 采集线程已停止")
 
-                # 更新当前帧
-                with self.current_frame_lock:
-                    self.current_frame = frame.copy()
-
-                # 缓存最新帧
-                with self.buffer_lock:
-                    self.frame_buffer.append(frame.copy())
-
-                # 如果正在录制，写入当前帧
-                if self.recording:
-                    self._write_frame(frame)
-
-                next_frame_time += frame_interval
-
-            # 运动检测
-            if current_time >= next_motion_time:
-                with self.buffer_lock:
-                    if len(self.frame_buffer) > 0:
-                        latest_frame = self.frame_buffer[-1].copy()
-                    else:
-                        latest_frame = None
-
-                if latest_frame is not None:
-                    motion = self._detect_motion(latest_frame)
-                    if motion:
-                        logger.debug("检测到运动")
-                        self.last_motion_time = current_time
-                        if not self.recording:
-                            self._start_recording()
-                    else:
-                        if self.recording and (current_time - self.last_motion_time) > VIDEO_RECORDING_WINDOW_S:
-                            self._stop_recording()
-
-                next_motion_time += VIDEO_MOTION_DETECT_INTERVAL_MS / 1000.0
-
-            # 确保循环不会过快运行
-            time.sleep(0.001)
+    def _run(self):
+        """
+        调度线程：按帧序号把新帧交给录制（逐帧）和运动检测（每 VIDEO_MOTION_DETECT_INTERVAL_MS 帧时间一次），
+        没有新帧时阻塞等待。
+        """
+        logger.info("CameraRecorder 线程开始运行")
+        self.scheduler.run(self.stop_event)
 
         # 清理资源
+        self.capture_thread.join()
         self._cleanup()
         logger.info("CameraRecorder 线程已停止")
 
+    def _on_frame(self, seq, frame, timestamp):
+        """
+        逐帧处理：正在录制时交给写入线程，否则放入压缩预录缓存（'jpeg' 模式）。
+        """
+        if self.recording:
+            self._write_frame(seq, frame)
+        elif self.preroll_buffer is not None:
+            self.preroll_buffer.add(seq, frame, timestamp)
+
+    def _on_motion_tick(self, seq, frame, timestamp):
+        """
+        按运动检测间隔处理一帧：检测到运动时开始录制或添加关键帧，超过录制窗口无运动时停止录制。
+        """
+        motion = self._detect_motion(frame)
+        if motion:
+            logger.debug("检测到运动")
+            self.last_motion_time = timestamp
+            if not self.recording:
+                self._start_recording()
+            elif self.live_event is not None:
+                self.live_event.add_keyframe(frame)
+        else:
+            if self.recording and (timestamp - self.last_motion_time) > VIDEO_RECORDING_WINDOW_S:
+                self._stop_recording()
+
+    def _on_preview_tick(self, seq, frame, timestamp):
+        """
+        按实时画面帧率编码一帧写入共享内存，无人观看时跳过。
+        """
+        self.preview.publish(frame, timestamp)
+
     def _detect_motion(self, frame):
         """
         使用背景减除法检测运动。
@@ -184,32 +232,81 @@ class CameraRecorder:
                 return  # 已经在录制中
 
             timestamp = datetime.now().strftime('%Y-%m-%d-%H_%M_%S')
-            filename = os.path.join(VIDEO_DIR, f"{timestamp}.mp4")
-            fourcc = cv2.VideoWriter_fourcc(*VIDEO_CODEC)
+            filename = os.path.join(self.video_dir, f"{timestamp}.mp4")
 
-            self.video_writer = cv2.VideoWriter(
-                filename,
-                fourcc,
-                VIDEO_FPS,
-                VIDEO_SIZE
-            )
+            frame_format = self._negotiate_format()
+            video_writer = open_video_writer(filename, frame_format.output_fps, frame_format.output_size)
 
-            if not self.video_writer.isOpened():
+            if not video_writer.isOpened():
                 logger.error(f"无法打开视频写入器，无法录制视频: {filename}")
-                self.video_writer = None
                 return
 
             logger.info(f"开始录制视频: {filename}")
 
-            # 写入缓存中的帧
-            with self.buffer_lock:
-                for buffered_frame in list(self.frame_buffer):
-                    resized_frame = cv2.resize(buffered_frame, VIDEO_SIZE)
-                    self.video_writer.write(resized_frame)
+            # 缓存中的帧交给写入线程写入（压缩帧在写入线程中解码），采集线程不等待
+            self._log_buffer_memory()
+            if self.preroll_buffer is not None:
+                preroll_frames = self.preroll_buffer.iter_frames(self.preroll_buffer.snapshot())
+                # 已交给写入线程，避免下一次录制重复写入
+                self.preroll_buffer.clear()
+            else:
+                # 只取调度线程已分发的帧，之后的帧会由逐帧处理写入，避免重复
+                preroll_frames = [(seq, frame) for seq, frame in self.frame_buffer.snapshot()
+                                  if seq <= self.scheduler.last_seq]
+            self.writer.open(video_writer, preroll_frames, frame_format)
+            save_recording_metadata(filename, frame_format, trigger_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            latest = self.frame_buffer.latest()
+            trigger_frame = latest[1] if latest is not None else None
+
+            # 发布实时事件，触发帧作为第一个关键帧
+            if LIVE_EVENT_ENABLED:
+                self.live_event = LiveEvent(self.camera_id, filename, camera=self.name)
+                self.live_event.add_keyframe(trigger_frame, force=True)
 
             self.recording = True
             self.record_start_time = time.time()
 
+    def buffer_memory(self):
+        """
+        获取帧缓存的内存占用，用于确定可承受的预录时长 video_cache_duration_s。
+
+        :return: {'raw_bytes': 原始帧缓冲区字节数, 'preroll_bytes': 预录缓存字节数,
+                  'preroll_frames': 预录帧数, 'bytes_per_second': 预录每秒字节数}
+        """
+        raw_bytes = self.frame_buffer.nbytes()
+        if self.preroll_buffer is not None:
+            preroll_bytes = self.preroll_buffer.nbytes()
+            preroll_frames = len(self.preroll_buffer)
+        else:
+            preroll_bytes = raw_bytes
+            preroll_frames = len(self.frame_buffer)
+        bytes_per_second = preroll_bytes / preroll_frames * VIDEO_FPS if preroll_frames else 0
+        return {
+            'raw_bytes': raw_bytes,
+            'preroll_bytes': preroll_bytes,
+            'preroll_frames': preroll_frames,
+            'bytes_per_second': bytes_per_second,
+        }
+
+    def _log_buffer_memory(self):
+        memory = self.buffer_memory()
+        logger.info(f"预录缓存: {memory['preroll_frames']} 帧 ({PREROLL_MODE}), "
+                    f"原始帧缓冲区 {memory['raw_bytes'] / 1024 / 1024:.1f} MB, "
+                    f"预录 {memory['preroll_bytes'] / 1024 / 1024:.1f} MB, "
+                    f"约 {memory['bytes_per_second'] / 1024 / 1024:.2f} MB/秒")
+
+    def _negotiate_format(self):
+        """
+        协商视频源格式：首次录制或源分辨率变化时根据缓冲帧的实际分辨率和帧率重新协商，之后复用。
+        """
+        latest = self.frame_buffer.latest()
+        if self.frame_format is None or (latest is not None and not self.frame_format.matches(latest[1])):
+            self.frame_format = negotiate_from_buffer(self.frame_buffer, self.capture.get(cv2.CAP_PROP_FPS))
+        if self.frame_format is None:
+            # 尚无帧可供协商，按配置的分辨率和帧率录制
+            return negotiate_format(VIDEO_SIZE, VIDEO_FPS)
+        return self.frame_format
+
     def _stop_recording(self):
         """
         停止视频录制。
@@ -219,39 +316,49 @@ class CameraRecorder:
                 return  # 未在录制中
 
             logger.info("停止录制视频")
-            self.video_writer.release()
-            self.video_writer = None
+            # 写入线程写完已提交的帧并关闭文件后再发布实时事件
+            on_closed = partial(publish_live_event, self.live_event) if self.live_event is not None else None
+            self.writer.close(on_closed)
+            self.live_event = None
             self.recording = False
             self.record_start_time = None
 
-    def _write_frame(self, frame):
+    def _write_frame(self, seq, frame):
         """
-        将帧写入视频文件。
+        将帧提交给写入线程，队列已满时丢弃该帧（由写入线程计数）。
 
-        :param frame: 当前视频帧
+        :param seq:   帧序号
+        :param frame: 帧环形缓冲区中的只读视图
         """
-        if self.video_writer is not None:
-            try:
-                resized_frame = cv2.resize(frame, VIDEO_SIZE)
-                self.video_writer.write(resized_frame)
-            except Exception as e:
-                logger.error(f"写入帧时发生错误: {e}")
-        else:
-            logger.error("视频写入器未初始化，无法写入帧")
+        if frame is None:
+            return
+        if self.preroll_buffer is not None and self.writer.backlog() >= self.frame_buffer.capacity // 2:
+            # 原始帧缓冲区较小（jpeg 预录模式），写入积压（如正在写入预录帧）时先压缩，避免帧在队列中被覆盖
+            ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), PREROLL_JPEG_QUALITY])
+            if ret:
+                frame = jpeg.tobytes()
+        self.writer.write(seq, frame)
 
     def _cleanup(self):
         """
         清理资源，停止录制和关闭视频捕捉。
         """
         logger.info("清理 CameraRecorder 资源")
-        if self.recording and self.video_writer is not None:
-            self.video_writer.release()
-            logger.info("已释放视频写入器")
-            self.recording = False
+        if self.recording:
+            self._stop_recording()
+        self.writer.stop()
+        logger.info("已释放视频写入器")
+        self.preview.close()
         if self.capture.isOpened():
             self.capture.release()
             logger.info("已释放摄像头资源")
 
+    def is_alive(self):
+        """
+        采集线程和调度线程是否都在运行。
+        """
+        return self.thread.is_alive() and self.capture_thread.is_alive()
+
     def stop(self):
         """
         停止录制并终止后台线程。
@@ -263,23 +370,13 @@ class CameraRecorder:
 
     def get_jpeg_frame(self):
         """
-        获取当前摄像头画面的 JPEG 编码数据。
+        获取当前实时画面的 JPEG 编码数据（按 PREVIEW_FPS 编码的缩小画面）。
 
         :return: JPEG 编码的图像数据（bytes）或 None 如果没有可用帧。
         """
-        with self.current_frame_lock:
-            if self.current_frame is not None:
-                # 将BGR格式转换为RGB
-                rgb_frame = cv2.cvtColor(self.current_frame, cv2.COLOR_BGR2RGB)
-                # 编码为JPEG
-                ret, jpeg = cv2.imencode('.jpg', rgb_frame)
-                if ret:
-                    return jpeg.tobytes()
-                else:
-                    logger.error("JPEG编码失败")
-                    return None
-            else:
-                return None
+        self.preview.touch()
+        frame = self.preview.read()
+        return frame[2] if frame is not None else None
 
 
 def start_camera_recording():
@@ -0,0 +1,242 @@
+# backend/source/frame_buffer.py
+
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    预分配的帧环形缓冲区，每帧带有递增的序号。
+
+    采集线程通过 acquire() 取得下一个槽位，直接把帧解码到槽位中（cv2.VideoCapture.read(image)），
+    再用 commit() 发布；读取方拿到的是只读视图，不复制帧数据。
+    同一次采集同时供预录缓存、实时预览和运动检测使用，每帧没有额外的内存分配。
+
+    视图在其后又写入 capacity 帧之前保持有效，需要长期保存的帧（如关键帧）由读取方自行复制，
+    可用 is_valid(seq) 检查视图是否已被覆盖。
+    """
+
+    def __init__(self, capacity):
+        """
+        :param capacity: 可读取的最大帧数，内部多分配一个槽位供采集线程写入
+        """
+        self.capacity = max(1, int(capacity))
+        self.slots = self.capacity + 1
+        self.storage = None  # 首帧到达时按帧尺寸分配
+        self.timestamps = np.zeros(self.slots, dtype=np.float64)
+        self.next_seq = 0  # 下一帧的序号，已发布的帧为 [next_seq - count, next_seq)
+        self.count = 0
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        with self.condition:
+            return self.count
+
+    @property
+    def latest_seq(self):
+        """
+        最新一帧的序号，没有帧时为 -1。
+        """
+        with self.condition:
+            return self.next_seq - 1
+
+    @property
+    def oldest_seq(self):
+        with self.condition:
+            return self.next_seq - self.count
+
+    def acquire(self):
+        """
+        取得下一帧的可写槽位，尚未分配存储时返回 None。只应由唯一的采集线程调用。
+        """
+        if self.storage is None:
+            return None
+        return self.storage[self.next_seq % self.slots]
+
+    def commit(self, frame, timestamp=None):
+        """
+        发布一帧。frame 若就是 acquire() 返回的槽位则不复制，否则复制到槽位中。
+
+        :param frame:     BGR帧
+        :param timestamp: 采集时间（time.time()），默认当前时间
+        :return: 该帧的序号
+        """
+        if self.storage is None or self.storage.shape[1:] != frame.shape or self.storage.dtype != frame.dtype:
+            self._allocate(frame)
+        with self.condition:
+            seq = self.next_seq
+            index = seq % self.slots
+            slot = self.storage[index]
+            if not np.shares_memory(slot, frame):
+                np.copyto(slot, frame)
+            self.timestamps[index] = timestamp if timestamp is not None else time.time()
+            self.next_seq += 1
+            self.count = min(self.count + 1, self.capacity)
+            self.condition.notify_all()
+            return seq
+
+    def is_valid(self, seq):
+        with self.condition:
+            return self.next_seq - self.count <= seq < self.next_seq
+
+    def get(self, seq):
+        """
+        :return: 序号对应帧的只读视图，已被覆盖或尚未写入时返回 None
+        """
+        with self.condition:
+            if not self.next_seq - self.count <= seq < self.next_seq:
+                return None
+            return self._view(seq)
+
+    def get_timestamp(self, seq):
+        with self.condition:
+            if not self.next_seq - self.count <= seq < self.next_seq:
+                return None
+            return float(self.timestamps[seq % self.slots])
+
+    def latest(self):
+        """
+        :return: (序号, 只读视图)，没有帧时返回 None
+        """
+        with self.condition:
+            if self.count == 0:
+                return None
+            seq = self.next_seq - 1
+            return seq, self._view(seq)
+
+    def frame_rate(self, min_frames=2):
+        """
+        以缓冲帧的采集时间估计帧率，使用相邻帧间隔的中位数以减小抖动影响。
+
+        :param min_frames: 至少需要的帧数
+        :return: 帧率，帧数不足时返回 None
+        """
+        with self.condition:
+            if self.count < max(2, min_frames):
+                return None
+            indices = np.arange(self.next_seq - self.count, self.next_seq) % self.slots
+            intervals = np.diff(self.timestamps[indices])
+        interval = float(np.median(intervals))
+        return 1.0 / interval if interval > 0 else None
+
+    def frames_since(self, seq):
+        """
+        :param seq: 已处理的最后一帧序号，-1 表示从最早的帧开始
+        :return: 之后仍在缓冲区中的 [(序号, 只读视图)]，按序号升序
+        """
+        with self.condition:
+            start = max(seq + 1, self.next_seq - self.count)
+            return [(s, self._view(s)) for s in range(start, self.next_seq)]
+
+    def snapshot(self):
+        """
+        :return: 缓冲区中全部帧的 [(序号, 只读视图)]，按序号升序
+        """
+        return self.frames_since(-1)
+
+    def wait_newer(self, seq, timeout=None):
+        """
+        等待序号大于 seq 的帧。
+
+        :return: 最新一帧的 (序号, 只读视图)，超时返回 None
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.next_seq - 1 > seq, timeout=timeout):
+                return None
+            latest = self.next_seq - 1
+            return latest, self._view(latest)
+
+    def clear(self):
+        with self.condition:
+            self.count = 0
+
+    def nbytes(self):
+        return 0 if self.storage is None else self.storage.nbytes
+
+    def _allocate(self, frame):
+        with self.condition:
+            self.storage = np.empty((self.slots,) + frame.shape, dtype=frame.dtype)
+            # 帧尺寸变化后旧帧不再可用
+            self.count = 0
+
+    def _view(self, seq):
+        view = self.storage[seq % self.slots].view()
+        view.flags.writeable = False
+        return view
+
+
+class CompressedFrameBuffer:
+    """
+    逐帧JPEG压缩的预录缓存，帧在加入时编码，在开始录制写入时才解码。
+    内存占用约为原始帧的 1/10 以下，可以支持 30~60 秒的预录时长。
+    """
+
+    def __init__(self, capacity, quality=80):
+        """
+        :param capacity: 最多保存的帧数
+        :param quality:  JPEG编码质量
+        """
+        self.capacity = max(1, int(capacity))
+        self.quality = quality
+        self.packets = deque()  # [(序号, 采集时间, JPEG字节)]
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.packets)
+
+    def add(self, seq, frame, timestamp=None):
+        """
+        编码并保存一帧，编码失败时丢弃该帧。
+
+        :return: 是否保存
+        """
+        ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        if not ret:
+            return False
+        data = jpeg.tobytes()
+        with self.lock:
+            self.packets.append((seq, timestamp if timestamp is not None else time.time(), data))
+            self.total_bytes += len(data)
+            while len(self.packets) > self.capacity:
+                self.total_bytes -= len(self.packets.popleft()[2])
+        return True
+
+    def snapshot(self):
+        """
+        :return: 当前全部压缩帧 [(序号, 采集时间, JPEG字节)]，按序号升序
+        """
+        with self.lock:
+            return list(self.packets)
+
+    def iter_frames(self, packets=None):
+        """
+        逐帧解码，解码失败的帧被跳过。
+
+        :param packets: snapshot() 的结果，默认当前全部压缩帧
+        :return: 生成 (序号, BGR帧)
+        """
+        for seq, _, data in (packets if packets is not None else self.snapshot()):
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield seq, frame
+
+    def duration_s(self):
+        with self.lock:
+            if len(self.packets) < 2:
+                return 0.0
+            return self.packets[-1][1] - self.packets[0][1]
+
+    def clear(self):
+        with self.lock:
+            self.packets.clear()
+            self.total_bytes = 0
+
+    def nbytes(self):
+        with self.lock:
+            return self.total_bytes
@@ -0,0 +1,221 @@
+# backend/source/frame_format.py
+
+import json
+import os
+
+import cv2
+import numpy as np
+
+from config import VideoRecordingConfig
+from logger import logger
+
+VIDEO_FPS = VideoRecordingConfig.video_fps
+VIDEO_SIZE = tuple(VideoRecordingConfig.video_size)
+VIDEO_ASPECT_MODE = VideoRecordingConfig.video_aspect_mode
+
+# 转换方式
+CONVERSION_NONE = 'none'
+CONVERSION_RESIZE = 'resize'
+CONVERSION_LETTERBOX = 'letterbox'
+
+# 实测帧率的合理范围，超出时视为无效
+MIN_FPS = 1
+MAX_FPS = 120
+# 实测帧率至少需要的帧数
+MIN_FPS_SAMPLES = 10
+# 实测帧率与报告帧率或常见帧率相差不超过此比例时取后者
+FPS_TOLERANCE = 0.05
+COMMON_FPS = (5, 10, 12.5, 15, 20, 24, 25, 29.97, 30, 50, 59.94, 60)
+# 宽高比相差不超过此比例时直接缩放
+ASPECT_TOLERANCE = 0.01
+
+METADATA_SUFFIX = '.meta.json'
+
+
+class FrameFormat:
+    """
+    视频源与录像之间协商后的帧格式：源分辨率和帧率、录像分辨率和帧率，以及开销最小的转换方式。
+
+    - 'none'：源分辨率与录像分辨率一致，帧直接写入，不缩放不复制
+    - 'resize'：宽高比一致（或配置为拉伸），直接缩放
+    - 'letterbox'：宽高比不一致，等比缩放后居中放入黑边画布，画布预分配并复用
+
+    convert() 只应在单一线程（录像写入线程）中调用，letterbox 画布在下一次调用时被覆盖。
+    """
+
+    def __init__(self, source_size, source_fps, output_size, output_fps, conversion):
+        self.source_size = tuple(int(v) for v in source_size)
+        self.source_fps = float(source_fps)
+        self.output_size = tuple(int(v) for v in output_size)
+        self.output_fps = float(output_fps)
+        self.conversion = conversion
+        self.canvas = None
+        self.content_rect = (0, 0) + self.output_size  # 画面在录像中的区域 (x, y, 宽, 高)
+
+        if conversion == CONVERSION_LETTERBOX:
+            src_w, src_h = self.source_size
+            out_w, out_h = self.output_size
+            scale = min(out_w / src_w, out_h / src_h)
+            w, h = max(1, int(round(src_w * scale))), max(1, int(round(src_h * scale)))
+            x, y = (out_w - w) // 2, (out_h - h) // 2
+            self.content_rect = (x, y, w, h)
+            self.canvas = np.zeros((out_h, out_w, 3), dtype=np.uint8)
+
+    def matches(self, frame):
+        """
+        帧尺寸是否与协商时的源分辨率一致。
+        """
+        return (frame.shape[1], frame.shape[0]) == self.source_size
+
+    def convert(self, frame):
+        """
+        :param frame: 源 BGR 帧
+        :return: 录像分辨率的帧；'none' 时返回源帧本身
+        """
+        if not self.matches(frame):
+            # 源分辨率在协商后发生变化（如重连后的码流），退回直接缩放
+            return cv2.resize(frame, self.output_size)
+        if self.conversion == CONVERSION_NONE:
+            return frame
+        if self.conversion == CONVERSION_RESIZE:
+            return cv2.resize(frame, self.output_size)
+        x, y, w, h = self.content_rect
+        cv2.resize(frame, (w, h), dst=self.canvas[y:y + h, x:x + w])
+        return self.canvas
+
+    def to_metadata(self):
+        return {
+            'source_width': self.source_size[0],
+            'source_height': self.source_size[1],
+            'source_fps': round(self.source_fps, 3),
+            'width': self.output_size[0],
+            'height': self.output_size[1],
+            'fps': round(self.output_fps, 3),
+            'conversion': self.conversion,
+            'content_rect': list(self.content_rect),
+        }
+
+    def __repr__(self):
+        return (f"FrameFormat({self.source_size[0]}x{self.source_size[1]}@{self.source_fps:.2f} -> "
+                f"{self.output_size[0]}x{self.output_size[1]}@{self.output_fps:.2f}, {self.conversion})")
+
+
+def negotiate_format(source_size, source_fps=None, output_size=VIDEO_SIZE, aspect_mode=VIDEO_ASPECT_MODE):
+    """
+    根据视频源的实际分辨率和帧率选择录像格式与转换方式。
+
+    录像帧率跟随源帧率（每个采集到的帧都会写入，容器帧率与之一致才能保证播放速度正确），
+    源帧率无效时使用配置的 video_fps。
+
+    :param source_size: 源分辨率 (宽, 高)
+    :param source_fps:  源帧率，None 或超出合理范围时视为未知
+    :param output_size: 录像分辨率 (宽, 高)
+    :param aspect_mode: 宽高比不一致时的处理，'letterbox' 加黑边保持比例，'stretch' 直接拉伸
+    :return: FrameFormat
+    """
+    source_size = tuple(int(v) for v in source_size)
+    output_size = tuple(int(v) for v in output_size)
+    if source_fps is None or not MIN_FPS <= source_fps <= MAX_FPS:
+        source_fps = VIDEO_FPS
+    output_fps = round(source_fps, 2)
+
+    if source_size == output_size:
+        conversion = CONVERSION_NONE
+    else:
+        source_aspect = source_size[0] / source_size[1]
+        output_aspect = output_size[0] / output_size[1]
+        if aspect_mode != 'letterbox' or abs(source_aspect / output_aspect - 1) <= ASPECT_TOLERANCE:
+            conversion = CONVERSION_RESIZE
+        else:
+            conversion = CONVERSION_LETTERBOX
+    return FrameFormat(source_size, source_fps, output_size, output_fps, conversion)
+
+
+def negotiate_from_buffer(frame_buffer, reported_fps=None, output_size=VIDEO_SIZE, aspect_mode=VIDEO_ASPECT_MODE):
+    """
+    以帧环形缓冲区中最新帧的尺寸和帧时间戳实测的帧率进行协商；
+    缓冲帧数不足以实测时使用视频源报告的帧率（如 cv2.CAP_PROP_FPS）。
+
+    :param frame_buffer: FrameRingBuffer
+    :param reported_fps: 视频源报告的帧率
+    :return: FrameFormat，缓冲区中没有帧时返回 None
+    """
+    latest = frame_buffer.latest()
+    if latest is None:
+        return None
+    frame = latest[1]
+    measured_fps = frame_buffer.frame_rate(MIN_FPS_SAMPLES)
+    source_fps = _normalize_fps(measured_fps, reported_fps)
+    frame_format = negotiate_format((frame.shape[1], frame.shape[0]), source_fps, output_size, aspect_mode)
+    measured = f"{measured_fps:.2f}" if measured_fps is not None else '未知'
+    logger.info(f"视频源格式协商完成: {frame_format} (实测帧率 {measured}, 报告帧率 {reported_fps})")
+    return frame_format
+
+
+def _normalize_fps(measured_fps, reported_fps):
+    """
+    实测帧率受到达时间抖动影响，接近报告帧率或常见帧率时取后者。
+    """
+    reported_valid = reported_fps is not None and MIN_FPS <= reported_fps <= MAX_FPS
+    if measured_fps is None or not MIN_FPS <= measured_fps <= MAX_FPS:
+        return reported_fps if reported_valid else None
+    if reported_valid and abs(measured_fps / reported_fps - 1) <= FPS_TOLERANCE:
+        return reported_fps
+    nearest = min(COMMON_FPS, key=lambda fps: abs(measured_fps / fps - 1))
+    if abs(measured_fps / nearest - 1) <= FPS_TOLERANCE:
+        return nearest
+    return round(measured_fps, 1)
+
+
+def metadata_path(video_path):
+    """
+    录像元数据文件路径，与视频同目录同名，后缀为 .meta.json。
+    """
+    return os.path.splitext(video_path)[0] + METADATA_SUFFIX
+
+
+def save_recording_metadata(video_path, frame_format, **extra):
+    """
+    保存录像的协商格式，供运动检测和帧提取直接读取，无需重新探测视频文件。
+
+    :param video_path:   录像文件路径
+    :param frame_format: FrameFormat
+    :param extra:        其他需要记录的字段
+    """
+    metadata = frame_format.to_metadata()
+    metadata.update(extra)
+    try:
+        with open(metadata_path(video_path), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        logger.error(f"无法保存录像元数据: {video_path}, {e}")
+
+
+def load_recording_metadata(video_path):
+    """
+    :return: 录像元数据字典，不存在或无法读取时返回 None
+    """
+    path = metadata_path(video_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取录像元数据: {path}, {e}")
+        return None
+
+
+def video_stream_info(cap, video_path=None):
+    """
+    获取视频的帧率和分辨率，优先使用录像元数据，没有元数据时从已打开的 VideoCapture 读取。
+
+    :param cap:        已打开的 cv2.VideoCapture
+    :param video_path: 视频文件路径，None 时不读取元数据
+    :return: (帧率, 宽, 高)
+    """
+    metadata = load_recording_metadata(video_path) if video_path else None
+    if metadata is not None and metadata.get('fps'):
+        return float(metadata['fps']), int(metadata['width']), int(metadata['height'])
+    return (cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
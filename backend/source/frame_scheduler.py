@@ -0,0 +1,129 @@
+# backend/source/frame_scheduler.py
+
+import threading
+import time
+
+from logger import logger
+
+# 等待新帧的超时时间，超时后检查停止标志
+WAIT_TIMEOUT_S = 0.5
+# 超过此时间没有新帧时输出警告
+NO_FRAME_WARNING_S = 5
+
+
+class _Consumer:
+    def __init__(self, callback, interval_s, name):
+        self.callback = callback
+        self.interval_s = interval_s
+        self.name = name
+        self.next_due = None  # 定频消费者下一次调用的帧时间
+        self.calls = 0
+
+
+class FrameScheduler:
+    """
+    帧时钟调度器：阻塞等待帧环形缓冲区中的新帧，按帧序号依次把帧分发给消费者。
+
+    - 逐帧消费者（interval_s=0）按序号收到每一帧，不重复、不跳过；
+      调度落后超过缓冲区容量时，已被覆盖的帧计入 frames_missed
+    - 定频消费者按帧的采集时间（帧时钟）每隔 interval_s 收到一次当时的帧，
+      与视频源帧率及其他消费者的频率相互独立
+
+    每一帧先交给全部逐帧消费者，再交给到期的定频消费者，因此定频消费者被调用时，
+    逐帧消费者已处理到同一帧（last_seq）。没有新帧时线程阻塞在缓冲区的条件变量上，空闲时不占用 CPU。
+    """
+
+    def __init__(self, frame_buffer, name='frame-scheduler'):
+        """
+        :param frame_buffer: 帧环形缓冲区 FrameRingBuffer，由采集线程写入
+        :param name:         日志中的名称
+        """
+        self.frame_buffer = frame_buffer
+        self.name = name
+        self.consumers = []
+        self.last_seq = -1  # 已分发的最后一帧序号
+        self.frames_dispatched = 0
+        self.frames_missed = 0
+        self.lock = threading.Lock()
+
+    def add_consumer(self, callback, interval_s=0.0, name=None):
+        """
+        :param callback:   callback(序号, 只读视图, 采集时间)，在调度线程中调用
+        :param interval_s: 调用间隔（帧时间，秒），0 表示逐帧调用
+        :param name:       日志中的名称
+        """
+        self.consumers.append(_Consumer(callback, max(0.0, float(interval_s)), name or callback.__name__))
+        # 逐帧消费者排在定频消费者之前
+        self.consumers.sort(key=lambda consumer: consumer.interval_s > 0)
+
+    def run(self, stop_event):
+        """
+        调度循环，阻塞运行直到 stop_event 被设置。
+        """
+        # 从调度开始时的最新帧之后开始分发
+        self.last_seq = self.frame_buffer.latest_seq
+        last_frame_time = time.time()
+        warned = False
+        while not stop_event.is_set():
+            if self.frame_buffer.wait_newer(self.last_seq, timeout=WAIT_TIMEOUT_S) is None:
+                if not warned and time.time() - last_frame_time > NO_FRAME_WARNING_S:
+                    logger.warning(f"{self.name}: 超过 {NO_FRAME_WARNING_S} 秒未获取到视频帧")
+                    warned = True
+                continue
+            last_frame_time = time.time()
+            warned = False
+            self.dispatch()
+
+    def dispatch(self):
+        """
+        分发上次分发之后缓冲区中的全部新帧。
+
+        :return: 分发的帧数
+        """
+        frames = self.frame_buffer.frames_since(self.last_seq)
+        if not frames:
+            return 0
+        missed = frames[0][0] - self.last_seq - 1
+        if missed > 0 and self.last_seq >= 0:
+            with self.lock:
+                self.frames_missed += missed
+            logger.warning(f"{self.name}: 调度落后，{missed} 帧在分发前已被覆盖")
+
+        for seq, frame in frames:
+            timestamp = self.frame_buffer.get_timestamp(seq)
+            if timestamp is None:
+                # 分发过程中已被覆盖
+                with self.lock:
+                    self.frames_missed += 1
+                self.last_seq = seq
+                continue
+            self.last_seq = seq
+            for consumer in self.consumers:
+                if consumer.interval_s > 0:
+                    if consumer.next_due is not None and timestamp < consumer.next_due:
+                        continue
+                    # 落后超过一个间隔时不补调，从当前帧重新计时
+                    if consumer.next_due is None or timestamp - consumer.next_due >= consumer.interval_s:
+                        consumer.next_due = timestamp + consumer.interval_s
+                    else:
+                        consumer.next_due += consumer.interval_s
+                self._call(consumer, seq, frame, timestamp)
+        with self.lock:
+            self.frames_dispatched += len(frames)
+        return len(frames)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'last_seq': self.last_seq,
+                'frames_dispatched': self.frames_dispatched,
+                'frames_missed': self.frames_missed,
+                'calls': {consumer.name: consumer.calls for consumer in self.consumers},
+            }
+
+    def _call(self, consumer, seq, frame, timestamp):
+        consumer.calls += 1
+        try:
+            consumer.callback(seq, frame, timestamp)
+        except Exception as e:
+            logger.error(f"{self.name}: {consumer.name} 处理第 {seq} 帧时发生错误: {e}")
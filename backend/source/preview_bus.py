@@ -0,0 +1,268 @@
+# backend/source/preview_bus.py
+
+import asyncio
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from config import PreviewConfig
+from logger import logger
+
+PREVIEW_FPS = PreviewConfig.fps
+PREVIEW_WIDTH = PreviewConfig.width
+PREVIEW_JPEG_QUALITY = PreviewConfig.jpeg_quality
+PREVIEW_BUFFER_BYTES = PreviewConfig.buffer_kb * 1024
+PREVIEW_IDLE_TIMEOUT_S = PreviewConfig.idle_timeout_s
+
+# 共享内存布局：画面状态（写入计数、采集时间、JPEG长度、宽、高）、最近观看时间、JPEG数据
+_STATE = struct.Struct('<QdIII')
+_VIEWED = struct.Struct('<d')
+_VIEWED_OFFSET = 32
+_HEADER_SIZE = 64
+# 读取期间画面被改写时的重试次数
+_READ_RETRIES = 5
+# 等待新画面的超时时间，超时后重新检查
+_WAIT_TIMEOUT_S = 1.0
+
+
+class PreviewBuffer:
+    """
+    一路视频源的实时画面共享内存：录制器写入缩小后的最新画面JPEG，Web 进程读取。
+
+    只有一个写入者（录制器的调度线程）。写入计数为顺序锁：写入前后各加一，
+    读取前后计数一致且为偶数时数据完整，读取不阻塞写入。序号为写入计数的一半。
+    Web 进程读取时更新最近观看时间，超过 PREVIEW_IDLE_TIMEOUT_S 无人观看时录制器跳过编码。
+    """
+
+    def __init__(self, shm, owner):
+        """
+        请使用 create() 或 attach()。
+
+        :param shm:   SharedMemory
+        :param owner: 是否由本进程创建，关闭时负责删除共享内存
+        """
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+        self.data = np.ndarray((shm.size - _HEADER_SIZE,), dtype=np.uint8, buffer=shm.buf, offset=_HEADER_SIZE)
+        self.frames_published = 0
+        self.frames_dropped = 0
+
+    @classmethod
+    def create(cls, name=None, capacity=PREVIEW_BUFFER_BYTES):
+        """
+        创建共享内存。
+
+        :param name:     共享内存名称，None 时自动生成
+        :param capacity: JPEG数据容量，字节
+        """
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER_SIZE + capacity)
+        _STATE.pack_into(shm.buf, 0, 0, 0.0, 0, 0, 0)
+        _VIEWED.pack_into(shm.buf, _VIEWED_OFFSET, 0.0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        连接其他进程创建的共享内存。
+        """
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    def touch(self):
+        """
+        记录有浏览器正在观看。
+        """
+        if self.data is None:
+            return
+        _VIEWED.pack_into(self.shm.buf, _VIEWED_OFFSET, time.time())
+
+    def has_viewers(self):
+        last_viewed = _VIEWED.unpack_from(self.shm.buf, _VIEWED_OFFSET)[0]
+        return time.time() - last_viewed <= PREVIEW_IDLE_TIMEOUT_S
+
+    def publish(self, frame, timestamp, width=PREVIEW_WIDTH, quality=PREVIEW_JPEG_QUALITY):
+        """
+        缩小并编码一帧，写入共享内存；无人观看时直接返回。
+
+        :param frame:     BGR 帧，可以是帧环形缓冲区中的只读视图
+        :param timestamp: 采集时间
+        :param width:     画面宽度，源画面更窄时不放大
+        :param quality:   JPEG编码质量
+        :return: 是否写入
+        """
+        if not self.has_viewers():
+            return False
+        height, source_width = frame.shape[:2]
+        if source_width > width:
+            height = max(1, int(round(height * width / source_width)))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        else:
+            width = source_width
+        ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ret:
+            logger.error("实时画面JPEG编码失败")
+            return False
+        if jpeg.size > self.data.size:
+            self.frames_dropped += 1
+            logger.warning(f"实时画面 {jpeg.size} 字节超过共享内存容量 {self.data.size} 字节，已丢弃")
+            return False
+
+        count = _STATE.unpack_from(self.shm.buf, 0)[0]
+        if count % 2:
+            # 上一个写入进程在写入中途退出
+            count += 1
+        struct.pack_into('<Q', self.shm.buf, 0, count + 1)
+        self.data[:jpeg.size] = jpeg.ravel()
+        _STATE.pack_into(self.shm.buf, 0, count + 2, timestamp, jpeg.size, width, height)
+        self.frames_published += 1
+        return True
+
+    def read(self, after_seq=0):
+        """
+        :param after_seq: 只返回序号大于此值的画面
+        :return: (序号, 采集时间, JPEG字节)，没有更新的画面或已关闭时返回 None
+        """
+        if self.data is None:
+            return None
+        for _ in range(_READ_RETRIES):
+            count, timestamp, length, _, _ = _STATE.unpack_from(self.shm.buf, 0)
+            if count % 2:
+                time.sleep(0.001)
+                continue
+            seq = count // 2
+            if seq <= after_seq:
+                return None
+            jpeg = self.data[:length].tobytes()
+            if _STATE.unpack_from(self.shm.buf, 0)[0] == count:
+                return seq, timestamp, jpeg
+        return None
+
+    def close(self):
+        """
+        断开共享内存，创建者同时删除共享内存。
+        """
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class PreviewChannel:
+    """
+    Web 进程中一路实时画面的分发：一个轮询线程从共享内存取出新画面，所有浏览器连接共用同一份 JPEG 字节，
+    CPU 开销与观看人数无关。轮询线程只在有连接时运行，并持续更新最近观看时间。
+
+    frames() 供线程模型的服务（Flask）使用，每个连接占用一个线程；
+    aframes() 供 asyncio 服务使用，连接在事件循环中等待新画面，不占用线程。
+    """
+
+    def __init__(self, buffer, fps=PREVIEW_FPS):
+        """
+        :param buffer: PreviewBuffer
+        :param fps:    实时画面帧率，轮询间隔为帧间隔的四分之一
+        """
+        self.buffer = buffer
+        self.poll_interval_s = 1.0 / (4 * fps)
+        self.condition = threading.Condition()
+        self.latest = None  # (序号, 采集时间, JPEG字节)
+        self.clients = 0
+        self.thread = None
+        self.async_waiters = set()  # (事件循环, asyncio.Event)，新画面到达时由轮询线程通知
+
+    def frames(self):
+        """
+        逐个返回新画面的 JPEG 字节，每个画面只返回一次；连接建立时跳过已过期的画面。
+        生成器关闭（浏览器断开）时注销连接。
+        """
+        last_seq = self._add_client()
+        try:
+            while True:
+                with self.condition:
+                    if not self.condition.wait_for(lambda: self._newer(last_seq) is not None,
+                                                   timeout=_WAIT_TIMEOUT_S):
+                        continue
+                    last_seq, _, jpeg = self.latest
+                yield jpeg
+        finally:
+            self._remove_client()
+
+    async def aframes(self):
+        """
+        frames() 的异步生成器版本，在事件循环中等待新画面。
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        last_seq = self._add_client(waiter)
+        try:
+            while True:
+                waiter[1].clear()
+                with self.condition:
+                    frame = self._newer(last_seq)
+                if frame is None:
+                    # 清除事件后再检查，轮询线程在两者之间写入的画面不会丢失通知
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), _WAIT_TIMEOUT_S)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                last_seq, _, jpeg = frame
+                yield jpeg
+        finally:
+            self._remove_client(waiter)
+
+    def _newer(self, last_seq):
+        """
+        调用方需持有 condition。
+        """
+        if self.latest is not None and self.latest[0] > last_seq:
+            return self.latest
+        return None
+
+    def _add_client(self, waiter=None):
+        """
+        注册连接，需要时启动轮询线程。
+
+        :return: 连接的起始序号，已过期的画面不发送
+        """
+        with self.condition:
+            self.clients += 1
+            if waiter is not None:
+                self.async_waiters.add(waiter)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._poll, daemon=True, name='preview-channel')
+                self.thread.start()
+            if self.latest is not None and time.time() - self.latest[1] > PREVIEW_IDLE_TIMEOUT_S:
+                return self.latest[0]
+            return 0
+
+    def _remove_client(self, waiter=None):
+        with self.condition:
+            self.clients -= 1
+            self.async_waiters.discard(waiter)
+
+    def _poll(self):
+        while True:
+            with self.condition:
+                if self.clients == 0:
+                    self.thread = None
+                    return
+                last_seq = self.latest[0] if self.latest is not None else 0
+            self.buffer.touch()
+            frame = self.buffer.read(last_seq)
+            if frame is not None:
+                with self.condition:
+                    self.latest = frame
+                    self.condition.notify_all()
+                    for loop, event in self.async_waiters:
+                        try:
+                            loop.call_soon_threadsafe(event.set)
+                        except RuntimeError:
+                            # 事件循环已关闭
+                            pass
+            time.sleep(self.poll_interval_s)
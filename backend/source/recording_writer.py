@@ -0,0 +1,217 @@
+# backend/source/recording_writer.py
+
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import VideoRecordingConfig
+from logger import logger
+
+WRITER_QUEUE_SIZE = VideoRecordingConfig.writer_queue_size
+WRITER_PUT_TIMEOUT_MS = VideoRecordingConfig.writer_put_timeout_ms
+
+# 写入线程的指令
+_OPEN = 'open'
+_FRAME = 'frame'
+_CLOSE = 'close'
+_EXIT = 'exit'
+
+# 无需转换的视图距离被覆盖不足此帧数时先复制再写入
+_OVERWRITE_MARGIN = 2
+
+
+class RecordingWriter:
+    """
+    录像写入线程。采集线程只把帧放入有界队列，缩放、编码和预录缓存的写入都在该线程中完成，
+    采集节奏不受编码和预录写入影响。
+
+    队列已满时新帧被丢弃并计数（可配置短暂等待作为背压）；来自帧环形缓冲区的只读视图
+    在写入前后检查是否已被采集线程覆盖，被覆盖的帧同样丢弃并计数。
+    写入可能阻塞的写入器（blocking_write 为 True，如 ffmpeg 管道）总是写入视图的副本；
+    其他写入器直接写入视图，写入后槽位已被覆盖时计为损坏帧。
+    帧按 open() 时给出的协商格式 FrameFormat 转换，源分辨率与录像一致时直接写入视图，不缩放不复制。
+    帧也可以以JPEG字节提交，由写入线程解码，用于原始帧缓冲区较小、写入积压时保留帧。
+    """
+
+    def __init__(self, frame_size, frame_buffer=None, queue_size=WRITER_QUEUE_SIZE,
+                 put_timeout_ms=WRITER_PUT_TIMEOUT_MS, name='recording-writer'):
+        """
+        :param frame_size:     录像分辨率 (宽, 高)
+        :param frame_buffer:   帧环形缓冲区 FrameRingBuffer，用于检查只读视图是否已被覆盖
+        :param queue_size:     队列容量（帧数）
+        :param put_timeout_ms: 队列满时采集线程最多等待的毫秒数，0 表示立即丢弃
+        """
+        self.frame_size = tuple(frame_size)
+        self.frame_buffer = frame_buffer
+        self.put_timeout_s = put_timeout_ms / 1000.0
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self.video_writer = None
+        self.frame_format = None
+        self.lock = threading.Lock()
+        self.frames_written = 0
+        self.frames_dropped = 0  # 队列满被丢弃的帧
+        self.frames_stale = 0  # 写入前已被采集线程覆盖的帧
+        self.frames_torn = 0  # 直接写入视图期间被采集线程覆盖的帧，录像中可能是不完整的画面
+        self.preroll_frames = 0
+        self.max_queue_depth = 0
+
+    def start(self):
+        self.thread.start()
+
+    def open(self, video_writer, preroll_frames=(), frame_format=None):
+        """
+        开始一段新录像。
+
+        :param video_writer:   已打开的视频写入器（具有 write/release 方法），此后由写入线程独占
+        :param preroll_frames: 预录帧 [(序号, 帧)] 或生成器，在写入线程中逐帧读取（如解码压缩帧）
+        :param frame_format:   协商的帧格式 FrameFormat，None 时尺寸不一致的帧缩放到 frame_size
+        """
+        self.queue.put((_OPEN, (video_writer, preroll_frames, frame_format)))
+
+    def write(self, seq, frame):
+        """
+        提交一帧，不阻塞采集线程（最多等待 put_timeout_ms）。
+
+        :param seq:   帧序号
+        :param frame: 帧环形缓冲区中的只读视图、BGR帧或JPEG字节
+        :return: 是否已放入队列
+        """
+        try:
+            if self.put_timeout_s > 0:
+                self.queue.put((_FRAME, (seq, frame)), timeout=self.put_timeout_s)
+            else:
+                self.queue.put_nowait((_FRAME, (seq, frame)))
+        except queue.Full:
+            with self.lock:
+                self.frames_dropped += 1
+                if self.frames_dropped % 30 == 1:
+                    logger.warning(f"录像写入队列已满，已丢弃 {self.frames_dropped} 帧")
+            return False
+        depth = self.queue.qsize()
+        with self.lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+        return True
+
+    def backlog(self):
+        """
+        队列中等待写入的指令数。
+        """
+        return self.queue.qsize()
+
+    def close(self, on_closed=None):
+        """
+        结束当前录像。队列中已提交的帧写完并释放写入器后，在写入线程中调用 on_closed()。
+        """
+        self.queue.put((_CLOSE, on_closed))
+
+    def stop(self):
+        """
+        写完队列中的帧并停止写入线程。
+        """
+        self.queue.put((_EXIT, None))
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'frames_written': self.frames_written,
+                'frames_dropped': self.frames_dropped,
+                'frames_stale': self.frames_stale,
+                'frames_torn': self.frames_torn,
+                'preroll_frames': self.preroll_frames,
+                'queue_depth': self.queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+            }
+
+    def _run(self):
+        while True:
+            command, payload = self.queue.get()
+            try:
+                if command == _FRAME:
+                    self._write(*payload)
+                elif command == _OPEN:
+                    self._open(*payload)
+                elif command == _CLOSE:
+                    self._close(payload)
+                elif command == _EXIT:
+                    self._close(None)
+                    return
+            except Exception as e:
+                logger.error(f"录像写入线程发生错误: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _open(self, video_writer, preroll_frames, frame_format):
+        if self.video_writer is not None:
+            self._close(None)
+        self.video_writer = video_writer
+        self.frame_format = frame_format
+        start_time = time.time()
+        written = 0
+        for seq, frame in preroll_frames:
+            if self._write(seq, frame):
+                written += 1
+        with self.lock:
+            self.preroll_frames += written
+        logger.info(f"预录帧写入完成: {written} 帧，耗时 {time.time() - start_time:.2f} 秒")
+
+    def _write(self, seq, frame):
+        if self.video_writer is None:
+            logger.error("视频写入器未初始化，无法写入帧")
+            return False
+        if isinstance(frame, bytes):
+            frame = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                self._count_stale()
+                return False
+        from_ring = self.frame_buffer is not None and not frame.flags.writeable
+        if from_ring and not self.frame_buffer.is_valid(seq):
+            self._count_stale()
+            return False
+        output_frame = self._convert(frame)
+        if from_ring and output_frame is frame and (
+                getattr(self.video_writer, 'blocking_write', False)
+                or seq - self.frame_buffer.oldest_seq < _OVERWRITE_MARGIN):
+            # 写入可能长时间阻塞，或视图即将被覆盖，复制后再写入，避免写入过程中被采集线程改写
+            output_frame = frame.copy()
+        # 转换（或复制）完成后槽位仍未被覆盖，说明读取的是完整的一帧
+        if from_ring and output_frame is not frame and not self.frame_buffer.is_valid(seq):
+            self._count_stale()
+            return False
+        self.video_writer.write(output_frame)
+        torn = from_ring and output_frame is frame and not self.frame_buffer.is_valid(seq)
+        with self.lock:
+            self.frames_written += 1
+            if torn:
+                # 已写入录像无法撤回，只计数
+                self.frames_torn += 1
+                if self.frames_torn % 30 == 1:
+                    logger.warning(f"写入期间帧被采集线程覆盖，已有 {self.frames_torn} 帧可能不完整")
+        return True
+
+    def _convert(self, frame):
+        if self.frame_format is not None:
+            return self.frame_format.convert(frame)
+        if (frame.shape[1], frame.shape[0]) == self.frame_size:
+            return frame
+        return cv2.resize(frame, self.frame_size)
+
+    def _count_stale(self):
+        with self.lock:
+            self.frames_stale += 1
+
+    def _close(self, on_closed):
+        if self.video_writer is not None:
+            self.video_writer.release()
+            self.video_writer = None
+            stats = self.stats()
+            logger.info(f"录像已保存: 累计写入 {stats['frames_written']} 帧，丢弃 {stats['frames_dropped']} 帧，"
+                        f"覆盖 {stats['frames_stale']} 帧，写入期间被覆盖 {stats['frames_torn']} 帧，"
+                        f"最大队列深度 {stats['max_queue_depth']}")
+        if on_closed is not None:
+            on_closed()
@@ -4,12 +4,19 @@ import cv2
 import threading
 import time
 import os
-from collections import deque
+from functools import partial
 from datetime import datetime
 
-from backend.source.rtsp.rtsp import RealTimeVideo
+from backend.source.frame_buffer import CompressedFrameBuffer, FrameRingBuffer
+from backend.source.recording_writer import RecordingWriter
+from backend.source.frame_scheduler import FrameScheduler
+from backend.source.frame_format import negotiate_format, negotiate_from_buffer, save_recording_metadata
+from backend.source.video_writers import open_video_writer, prepare_video_writer
+from backend.source.preview_bus import PREVIEW_FPS, PreviewBuffer
+from backend.source.rtsp.rtsp import RTSP_URL, RealTimeVideo
 from backend.data.dataloader import VideoDataLoader
 from config import VideoRecordingConfig
+from backend.live.live_events import LIVE_EVENT_ENABLED, LiveEvent, publish_live_event
 from logger import logger
 
 # 从配置文件加载参数
@@ -18,10 +25,11 @@ VIDEO_DIR = VideoRecordingConfig.video_dir
 VIDEO_CACHE_DURATION_S = VideoRecordingConfig.video_cache_duration_s
 VIDEO_FPS = VideoRecordingConfig.video_fps
 VIDEO_SIZE = tuple(VideoRecordingConfig.video_size)  # 确保是元组，例如 (1920, 1080)
-VIDEO_CODEC = VideoRecordingConfig.video_codec
-VIDEO_BITRATE_MBPS = VideoRecordingConfig.video_bitrate_mbps
 VIDEO_RECORDING_WINDOW_S = VideoRecordingConfig.video_recording_window_s
 MIN_MOTION_AREA = VideoRecordingConfig.min_motion_area  # 添加一个最小运动面积的配置
+PREROLL_MODE = VideoRecordingConfig.preroll_mode
+PREROLL_JPEG_QUALITY = VideoRecordingConfig.preroll_jpeg_quality
+PREROLL_RAW_BUFFER_S = VideoRecordingConfig.preroll_raw_buffer_s
 
 
 class VideoRecorder:
@@ -29,17 +37,43 @@ class VideoRecorder:
     视频录制类，负责从 RTSP 流中获取视频帧，检测运动，并在检测到运动时录制视频。
     """
 
-    def __init__(self):
-        self.rtsp_client = RealTimeVideo()
-        self.frame_buffer = deque(maxlen=int(VIDEO_CACHE_DURATION_S * VIDEO_FPS))
-        self.buffer_lock = threading.Lock()
+    def __init__(self, rtsp_url=RTSP_URL, video_dir=VIDEO_DIR, name=None, preview=None):
+        """
+        :param rtsp_url:  RTSP 流地址
+        :param video_dir: 录像保存目录
+        :param name:      摄像头名称，多路录制时写入事件元数据，None 时使用默认摄像头
+        :param preview:   实时画面共享内存 PreviewBuffer，None 时自行创建
+        """
+        self.video_dir = video_dir
+        self.name = name
+        # RTSP 客户端直接解码到该环形缓冲区，录制器按序号读取，不再逐帧复制；
+        # 'raw' 模式下同时作为预录缓存，'jpeg' 模式下预录缓存为逐帧压缩的独立缓冲区
+        if PREROLL_MODE == 'jpeg':
+            self.frame_buffer = FrameRingBuffer(int(PREROLL_RAW_BUFFER_S * VIDEO_FPS))
+            self.preroll_buffer = CompressedFrameBuffer(int(VIDEO_CACHE_DURATION_S * VIDEO_FPS), PREROLL_JPEG_QUALITY)
+        else:
+            self.frame_buffer = FrameRingBuffer(int(VIDEO_CACHE_DURATION_S * VIDEO_FPS))
+            self.preroll_buffer = None
+
+        # 录像写入线程，缩放、编码和预录写入都不占用采集线程
+        self.writer = RecordingWriter(VIDEO_SIZE, self.frame_buffer)
+        self.frame_format = None  # 视频源协商格式，首次录制时根据实际分辨率和帧率确定
+        self.rtsp_client = RealTimeVideo(rtsp_url, frame_buffer=self.frame_buffer)
+
+        # 帧时钟调度：录制逐帧进行，运动检测按配置的间隔进行，两者频率相互独立
+        self.scheduler = FrameScheduler(self.frame_buffer, 'VideoRecorder')
+        self.scheduler.add_consumer(self._on_frame, name='recording')
+        self.scheduler.add_consumer(self._on_motion_tick, VIDEO_MOTION_DETECT_INTERVAL_MS / 1000.0, name='motion')
+        # 实时画面按 PREVIEW_FPS 编码一次写入共享内存，与浏览器连接数无关
+        self.preview = preview if preview is not None else PreviewBuffer.create()
+        self.scheduler.add_consumer(self._on_preview_tick, 1.0 / PREVIEW_FPS, name='preview')
 
         self.recording = False
         self.recording_lock = threading.Lock()
-        self.video_writer = None
         self.record_start_time = None
 
         self.last_motion_time = None
+        self.live_event = None  # 当前录制对应的实时事件
         self.motion_detected = False
 
         self.stop_event = threading.Event()
@@ -54,55 +88,61 @@ class VideoRecorder:
         """
         logger.info("启动 VideoRecorder")
         # 确保视频保存目录存在
-        if not os.path.exists(VIDEO_DIR):
-            os.makedirs(VIDEO_DIR)
-            logger.info(f"创建视频保存目录: {VIDEO_DIR}")
+        if not os.path.exists(self.video_dir):
+            os.makedirs(self.video_dir)
+            logger.info(f"创建视频保存目录: {self.video_dir}")
+        # 在开始录制前检查 ffmpeg，避免首次录制时在调度线程中启动探测子进程
+        prepare_video_writer()
 
         self.rtsp_client.start()
+        self.writer.start()
         self.thread.start()
         logger.info("VideoRecorder 已启动并在后台运行")
 
     def _run(self):
         """
-        后台线程运行的主循环，负责帧获取、运动检测和视频录制。
+        调度线程：RealTimeVideo 阻塞在 RTSP 读取上并把帧解码到环形缓冲区，
+        本线程按帧序号把新帧交给录制（逐帧，不重复、不跳过）和运动检测（每 VIDEO_MOTION_DETECT_INTERVAL_MS 帧时间一次），
+        没有新帧时阻塞等待。
         """
         logger.info("VideoRecorder 线程开始运行")
-        while not self.stop_event.is_set():
-            frame = self.rtsp_client.get_frame()
-            if frame is not None:
-                # 缓存最新帧
-                with self.buffer_lock:
-                    self.frame_buffer.append(frame.copy())
-
-                # 运动检测
-                motion = self._detect_motion(frame)
-
-                current_time = time.time()
-
-                if motion:
-                    logger.debug("检测到运动")
-                    self.last_motion_time = current_time
-                    if not self.recording:
-                        self._start_recording()
-                else:
-                    if self.recording and (current_time - self.last_motion_time) > VIDEO_RECORDING_WINDOW_S:
-                        self._stop_recording()
-
-                # 如果正在录制，写入当前帧
-                if self.recording:
-                    self._write_frame(frame)
-
-            else:
-                logger.warning("未获取到视频帧")
-                time.sleep(VIDEO_MOTION_DETECT_INTERVAL_MS / 1000.0)
-
-            # 根据检测间隔调整循环频率
-            time.sleep(VIDEO_MOTION_DETECT_INTERVAL_MS / 1000.0)
+        self.scheduler.run(self.stop_event)
 
         # 清理资源
         self._cleanup()
         logger.info("VideoRecorder 线程已停止")
 
+    def _on_frame(self, seq, frame, timestamp):
+        """
+        逐帧处理：正在录制时交给写入线程，否则放入压缩预录缓存（'jpeg' 模式）。
+        """
+        if self.recording:
+            self._write_frame(seq, frame)
+        elif self.preroll_buffer is not None:
+            self.preroll_buffer.add(seq, frame, timestamp)
+
+    def _on_motion_tick(self, seq, frame, timestamp):
+        """
+        按运动检测间隔处理一帧：检测到运动时开始录制或添加关键帧，超过录制窗口无运动时停止录制。
+        """
+        motion = self._detect_motion(frame)
+        if motion:
+            logger.debug("检测到运动")
+            self.last_motion_time = timestamp
+            if not self.recording:
+                self._start_recording()
+            elif self.live_event is not None:
+                self.live_event.add_keyframe(frame)
+        else:
+            if self.recording and (timestamp - self.last_motion_time) > VIDEO_RECORDING_WINDOW_S:
+                self._stop_recording()
+
+    def _on_preview_tick(self, seq, frame, timestamp):
+        """
+        按实时画面帧率编码一帧写入共享内存，无人观看时跳过。
+        """
+        self.preview.publish(frame, timestamp)
+
     def _detect_motion(self, frame):
         """
         使用背景减除法检测运动。
@@ -134,33 +174,81 @@ class VideoRecorder:
                 return  # 已经在录制中
 
             timestamp = datetime.now().strftime('%Y-%m-%d-%H_%M_%S')
-            filename = os.path.join(VIDEO_DIR, f"{timestamp}.mp4")
-            fourcc = cv2.VideoWriter_fourcc(*VIDEO_CODEC)
-            bitrate = VIDEO_BITRATE_MBPS * 1000000  # 转换为 bps
-
-            self.video_writer = cv2.VideoWriter(
-                filename,
-                fourcc,
-                VIDEO_FPS,
-                VIDEO_SIZE
-            )
-
-            if not self.video_writer.isOpened():
+            filename = os.path.join(self.video_dir, f"{timestamp}.mp4")
+
+            frame_format = self._negotiate_format()
+            video_writer = open_video_writer(filename, frame_format.output_fps, frame_format.output_size)
+
+            if not video_writer.isOpened():
                 logger.error(f"无法打开视频写入器，无法录制视频: {filename}")
-                self.video_writer = None
                 return
 
             logger.info(f"开始录制视频: {filename}")
 
-            # 写入缓存中的帧
-            with self.buffer_lock:
-                for buffered_frame in list(self.frame_buffer):
-                    resized_frame = cv2.resize(buffered_frame, VIDEO_SIZE)
-                    self.video_writer.write(resized_frame)
+            # 缓存中的帧交给写入线程写入（压缩帧在写入线程中解码，已被覆盖的原始帧被跳过）
+            self._log_buffer_memory()
+            if self.preroll_buffer is not None:
+                preroll_frames = self.preroll_buffer.iter_frames(self.preroll_buffer.snapshot())
+                # 已交给写入线程，避免下一次录制重复写入
+                self.preroll_buffer.clear()
+            else:
+                # 只取调度线程已分发的帧，之后的帧会由逐帧处理写入，避免重复
+                preroll_frames = [(seq, frame) for seq, frame in self.frame_buffer.snapshot()
+                                  if seq <= self.scheduler.last_seq]
+            self.writer.open(video_writer, preroll_frames, frame_format)
+            save_recording_metadata(filename, frame_format, trigger_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            latest = self.frame_buffer.latest()
+            trigger_frame = latest[1] if latest is not None else None
+
+            # 发布实时事件，触发帧作为第一个关键帧
+            if LIVE_EVENT_ENABLED:
+                self.live_event = LiveEvent(self.rtsp_client.rtsp_url, filename, camera=self.name)
+                self.live_event.add_keyframe(trigger_frame, force=True)
 
             self.recording = True
             self.record_start_time = time.time()
 
+    def buffer_memory(self):
+        """
+        获取帧缓存的内存占用，用于确定可承受的预录时长 video_cache_duration_s。
+
+        :return: {'raw_bytes': 原始帧缓冲区字节数, 'preroll_bytes': 预录缓存字节数,
+                  'preroll_frames': 预录帧数, 'bytes_per_second': 预录每秒字节数}
+        """
+        raw_bytes = self.frame_buffer.nbytes()
+        if self.preroll_buffer is not None:
+            preroll_bytes = self.preroll_buffer.nbytes()
+            preroll_frames = len(self.preroll_buffer)
+        else:
+            preroll_bytes = raw_bytes
+            preroll_frames = len(self.frame_buffer)
+        bytes_per_second = preroll_bytes / preroll_frames * VIDEO_FPS if preroll_frames else 0
+        return {
+            'raw_bytes': raw_bytes,
+            'preroll_bytes': preroll_bytes,
+            'preroll_frames': preroll_frames,
+            'bytes_per_second': bytes_per_second,
+        }
+
+    def _log_buffer_memory(self):
+        memory = self.buffer_memory()
+        logger.info(f"预录缓存: {memory['preroll_frames']} 帧 ({PREROLL_MODE}), "
+                    f"原始帧缓冲区 {memory['raw_bytes'] / 1024 / 1024:.1f} MB, "
+                    f"预录 {memory['preroll_bytes'] / 1024 / 1024:.1f} MB, "
+                    f"约 {memory['bytes_per_second'] / 1024 / 1024:.2f} MB/秒")
+
+    def _negotiate_format(self):
+        """
+        协商视频源格式：首次录制或源分辨率变化时根据缓冲帧的实际分辨率和帧率重新协商，之后复用。
+        """
+        latest = self.frame_buffer.latest()
+        if self.frame_format is None or (latest is not None and not self.frame_format.matches(latest[1])):
+            self.frame_format = negotiate_from_buffer(self.frame_buffer, self.rtsp_client.reported_fps)
+        if self.frame_format is None:
+            # 尚无帧可供协商，按配置的分辨率和帧率录制
+            return negotiate_format(VIDEO_SIZE, VIDEO_FPS)
+        return self.frame_format
+
     def _stop_recording(self):
         """
         停止视频录制。
@@ -170,34 +258,48 @@ class VideoRecorder:
                 return  # 未在录制中
 
             logger.info("停止录制视频")
-            self.video_writer.release()
-            self.video_writer = None
+            # 写入线程写完已提交的帧并关闭文件后再发布实时事件
+            on_closed = partial(publish_live_event, self.live_event) if self.live_event is not None else None
+            self.writer.close(on_closed)
+            self.live_event = None
             self.recording = False
             self.record_start_time = None
 
-    def _write_frame(self, frame):
+    def _write_frame(self, seq, frame):
         """
-        将帧写入视频文件。
+        将帧提交给写入线程，队列已满时丢弃该帧（由写入线程计数）。
 
-        :param frame: 当前视频帧
+        :param seq:   帧序号
+        :param frame: 帧环形缓冲区中的只读视图
         """
-        if self.video_writer is not None:
-            resized_frame = cv2.resize(frame, VIDEO_SIZE)
-            self.video_writer.write(resized_frame)
-        else:
-            logger.error("视频写入器未初始化，无法写入帧")
+        if frame is None:
+            return
+        if self.preroll_buffer is not None and self.writer.backlog() >= self.frame_buffer.capacity // 2:
+            # 原始帧缓冲区较小（jpeg 预录模式），写入积压（如正在写入预录帧）时先压缩，避免帧在队列中被覆盖
+            ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), PREROLL_JPEG_QUALITY])
+            if ret:
+                frame = jpeg.tobytes()
+        self.writer.write(seq, frame)
 
     def _cleanup(self):
         """
         清理资源，停止录制和关闭视频捕捉。
         """
         logger.info("清理 VideoRecorder 资源")
-        if self.recording and self.video_writer is not None:
-            self.video_writer.release()
-            logger.info("已释放视频写入器")
-            self.recording = False
+        if self.recording:
+            self._stop_recording()
+        self.writer.stop()
+        logger.info("已释放视频写入器")
+        self.preview.close()
         self.rtsp_client.stop()
 
+    def is_alive(self):
+        """
+        调度线程和 RTSP 采集线程是否都在运行（RTSP 重连达到最大次数后采集线程退出）。
+        """
+        rtsp_thread = self.rtsp_client.thread
+        return self.thread.is_alive() and rtsp_thread is not None and rtsp_thread.is_alive()
+
     def stop(self):
         """
         停止录制并终止后台线程。
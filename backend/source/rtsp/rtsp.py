@@ -4,6 +4,7 @@ import cv2
 import threading
 import time
 import sys  # 导入 sys 模块以便在达到最大重试次数后退出程序
+from backend.source.frame_buffer import FrameRingBuffer
 from config import RTSPClientConfig
 from logger import logger
 
@@ -29,21 +30,22 @@ class RealTimeVideo:
         video.stop()
     """
 
-    def __init__(self, rtsp_url=RTSP_URL, reconnect_delay=5):
+    def __init__(self, rtsp_url=RTSP_URL, reconnect_delay=5, frame_buffer=None):
         """
         初始化 RealTimeVideo 实例。
 
         :param rtsp_url: RTSP 流的 URL 地址。
         :param reconnect_delay: 重新连接的延迟时间（秒）。
+        :param frame_buffer: 帧环形缓冲区 FrameRingBuffer，帧直接解码到其中；默认只保留最近几帧。
         """
         self.rtsp_url = rtsp_url
         self.reconnect_delay = reconnect_delay
         self.capture = None
         self.thread = None
         self.stopped = False
-        self.frame = None
-        self.lock = threading.Lock()
+        self.frame_buffer = frame_buffer if frame_buffer is not None else FrameRingBuffer(2)
         self.connected = False
+        self.reported_fps = None  # 码流报告的帧率（cv2.CAP_PROP_FPS），连接后更新
 
         # 初始化重试参数
         self.retry_count = 0  # 当前重试次数
@@ -84,9 +86,11 @@ class RealTimeVideo:
                 else:
                     self.connected = True
                     self.retry_count = 0  # 重置重试计数
+                    self.reported_fps = self.capture.get(cv2.CAP_PROP_FPS)
                     logger.info(f"成功连接到 RTSP 流: {self.rtsp_url}")
 
-            ret, frame = self.capture.read()
+            slot = self.frame_buffer.acquire()
+            ret, frame = self.capture.read(slot) if slot is not None else self.capture.read()
             if not ret:
                 logger.warning("无法从 RTSP 流读取帧，尝试重新连接。")
                 self.capture.release()
@@ -103,8 +107,7 @@ class RealTimeVideo:
                 time.sleep(RTSP_RETRY_DURATION_S)
                 continue
 
-            with self.lock:
-                self.frame = frame
+            self.frame_buffer.commit(frame)
 
     def get_frame(self):
         """
@@ -112,11 +115,19 @@ class RealTimeVideo:
 
         :return: 最新的视频帧（BGR 格式的 NumPy 数组）或 None 如果没有可用帧。
         """
-        with self.lock:
-            if self.frame is not None:
-                return self.frame.copy()
-            else:
-                return None
+        latest = self.frame_buffer.latest()
+        if latest is not None:
+            return latest[1].copy()
+        else:
+            return None
+
+    def get_latest(self):
+        """
+        获取最新帧的只读视图，不复制帧数据。
+
+        :return: (序号, 只读视图) 或 None 如果没有可用帧。
+        """
+        return self.frame_buffer.latest()
 
     def stop(self):
         """
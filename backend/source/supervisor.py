@@ -0,0 +1,397 @@
+# backend/source/supervisor.py
+
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import re
+import sys
+import threading
+import time
+
+from backend.live.live_events import receive_live_message, set_live_event_sink
+from backend.source.preview_bus import PreviewBuffer
+from config import LogConfig, SupervisorConfig, VideoRecordingConfig
+from logger import logger
+
+SUPERVISOR_SOURCES = SupervisorConfig.sources
+SUPERVISOR_CPU_AFFINITY = SupervisorConfig.cpu_affinity
+SUPERVISOR_RESERVED_CPUS = SupervisorConfig.reserved_cpus
+RESTART_BACKOFF_S = SupervisorConfig.restart_backoff_s
+RESTART_BACKOFF_MAX_S = SupervisorConfig.restart_backoff_max_s
+RESTART_BACKOFF_RESET_S = SupervisorConfig.restart_backoff_reset_s
+HEARTBEAT_INTERVAL_S = SupervisorConfig.heartbeat_interval_s
+HEARTBEAT_TIMEOUT_S = SupervisorConfig.heartbeat_timeout_s
+STOP_TIMEOUT_S = SupervisorConfig.stop_timeout_s
+VIDEO_DIR = VideoRecordingConfig.video_dir
+COLD_START_WAIT_S = VideoRecordingConfig.cold_start_wait_s
+
+# 录制进程发往主进程的消息类型
+MESSAGE_STATUS = 'status'
+MESSAGE_LIVE = 'live'
+
+# 录制进程状态
+STATE_STARTING = 'starting'
+STATE_RUNNING = 'running'
+STATE_BACKOFF = 'backoff'
+STATE_STOPPED = 'stopped'
+
+_NETWORK_SOURCE = re.compile(r'^(rtsp|rtsps|rtmp|http|https)://', re.IGNORECASE)
+
+
+def normalize_sources(sources=SUPERVISOR_SOURCES, video_dir=VIDEO_DIR):
+    """
+    规范化视频源配置，补全名称和录像目录。
+
+    :param sources: SupervisorConfig.sources 格式的列表，元素也可以直接是视频源（地址、编号或文件路径）
+    :return: [{'name', 'source', 'cpus', 'video_dir'}]
+    """
+    specs = []
+    names = set()
+    for index, item in enumerate(sources):
+        spec = dict(item) if isinstance(item, dict) else {'source': item}
+        name = str(spec.get('name') or f'camera{index}')
+        if name in names:
+            raise ValueError(f"视频源名称重复: {name}")
+        names.add(name)
+        source = spec['source']
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        specs.append({
+            'name': name,
+            'source': source,
+            'cpus': list(spec['cpus']) if spec.get('cpus') else None,
+            'video_dir': spec.get('video_dir') or os.path.join(video_dir, name),
+        })
+    return specs
+
+
+def camera_video_dirs(sources=SUPERVISOR_SOURCES):
+    """
+    多路录制时各视频源的录像目录。
+    """
+    return [spec['video_dir'] for spec in normalize_sources(sources)]
+
+
+def assign_cpus(specs, enabled=SUPERVISOR_CPU_AFFINITY, reserved=SUPERVISOR_RESERVED_CPUS):
+    """
+    为未指定 cpus 的视频源轮流分配 CPU，可用 CPU 多于保留数时跳过前 reserved 个留给主进程。
+
+    :return: 与 specs 顺序一致的 CPU 列表，不绑定时为 None
+    """
+    if not enabled or not hasattr(os, 'sched_getaffinity'):
+        return [spec['cpus'] for spec in specs]
+    available = sorted(os.sched_getaffinity(0))
+    if len(available) > reserved:
+        available = available[reserved:]
+    assigned = []
+    auto_index = 0
+    for spec in specs:
+        if spec['cpus']:
+            assigned.append(spec['cpus'])
+        else:
+            assigned.append([available[auto_index % len(available)]])
+            auto_index += 1
+    return assigned
+
+
+def create_recorder(spec, preview=None):
+    """
+    按视频源类型创建录制器：网络流使用 VideoRecorder（带重连），摄像头编号、设备路径和视频文件使用 CameraRecorder。
+
+    :param spec:    normalize_sources() 返回的视频源
+    :param preview: 实时画面共享内存 PreviewBuffer，None 时由录制器自行创建
+    """
+    source = spec['source']
+    if isinstance(source, str) and _NETWORK_SOURCE.match(source):
+        from backend.source.rtsp.recording import VideoRecorder
+        return VideoRecorder(source, spec['video_dir'], name=spec['name'], preview=preview)
+    from backend.source.camera.recording import CameraRecorder
+    return CameraRecorder(source, spec['video_dir'], name=spec['name'], preview=preview)
+
+
+class _MessageSender:
+    """
+    录制进程中向主进程发送消息，心跳和实时事件来自不同线程，发送需加锁。
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, kind, payload):
+        with self.lock:
+            try:
+                self.conn.send((kind, payload))
+            except (OSError, ValueError) as e:
+                logger.warning(f"无法向主进程发送消息: {e}")
+
+
+def _recorder_worker(spec, cpus, preview_name, conn, stop_event):
+    """
+    录制进程入口：运行一路视频源的录制器，定期上报状态，录制器线程退出时以非零状态码结束。
+    状态和实时事件经各进程独立的管道发送，进程被强制结束时只影响自身的管道；
+    实时画面写入主进程创建的共享内存，重启后继续使用同一块共享内存。
+    """
+    name = spec['name']
+    # 同一日志文件中区分各路视频源
+    formatter = logging.Formatter(LogConfig.log_format.replace('%(message)s', f'[{name}] %(message)s'))
+    for handler in logger.handlers:
+        handler.setFormatter(formatter)
+
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning(f"无法绑定 CPU {cpus}: {e}")
+
+    sender = _MessageSender(conn)
+    set_live_event_sink(lambda message: sender.send(MESSAGE_LIVE, message))
+    recorder = create_recorder(spec, PreviewBuffer.attach(preview_name))
+    sender.send(MESSAGE_STATUS, {'name': name, 'pid': os.getpid(), 'state': STATE_STARTING, 'time': time.time()})
+    recorder.start()
+    logger.info(f"录制进程已启动: {spec['source']} -> {spec['video_dir']} (CPU {cpus})")
+
+    last_frames = recorder.scheduler.stats()['frames_dispatched']
+    last_time = time.time()
+    exit_code = 0
+    while not stop_event.wait(HEARTBEAT_INTERVAL_S):
+        if not recorder.is_alive():
+            logger.error("录制线程已退出，结束录制进程")
+            exit_code = 1
+            break
+        now = time.time()
+        scheduler_stats = recorder.scheduler.stats()
+        fps = (scheduler_stats['frames_dispatched'] - last_frames) / (now - last_time)
+        last_frames, last_time = scheduler_stats['frames_dispatched'], now
+        sender.send(MESSAGE_STATUS, {
+            'name': name,
+            'pid': os.getpid(),
+            'state': STATE_RUNNING,
+            'time': now,
+            'fps': round(fps, 2),
+            'frames': scheduler_stats['frames_dispatched'],
+            'frames_missed': scheduler_stats['frames_missed'],
+            'recording': recorder.recording,
+            'writer': recorder.writer.stats(),
+        })
+
+    recorder.stop()
+    conn.close()
+    sys.exit(exit_code)
+
+
+class _Worker:
+    def __init__(self, spec, cpus):
+        self.spec = spec
+        self.cpus = cpus
+        self.process = None
+        self.conn = None  # 主进程一端的管道
+        # 每个进程独立的停止事件：进程在等待事件时被强制结束会使事件的内部状态失效，不能复用
+        self.stop_event = None
+        self.state = STATE_STOPPED
+        self.started_at = None
+        self.restart_at = None
+        self.backoff_s = RESTART_BACKOFF_S
+        self.restarts = 0
+        self.last_exit_code = None
+        self.last_status = {}
+        self.last_heartbeat = None
+
+
+class RecorderSupervisor:
+    """
+    多路录制监督器：每路视频源一个录制进程（spawn 启动），各自绑定 CPU、写入独立的录像目录，
+    采集、运动检测和编码不再共享主进程的 GIL，可扩展的路数取决于 CPU 核数。
+
+    录制进程异常退出或心跳超时时按指数退避重启；各进程定期上报帧率、丢帧和写入统计，由 stats() 汇总。
+    录制进程产生的实时事件经管道转发回主进程，由主进程的实时事件描述线程处理。
+    """
+
+    def __init__(self, sources=SUPERVISOR_SOURCES):
+        """
+        :param sources: SupervisorConfig.sources 格式的视频源列表
+        """
+        specs = normalize_sources(sources)
+        self.context = multiprocessing.get_context('spawn')
+        self.workers = [_Worker(spec, cpus) for spec, cpus in zip(specs, assign_cpus(specs))]
+        # 各路实时画面的共享内存由主进程创建和删除，录制进程重启不影响正在观看的浏览器
+        self.previews = {spec['name']: PreviewBuffer.create() for spec in specs}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()  # 停止重启录制进程
+        self.monitor_stop_event = threading.Event()  # 停止接收录制进程的消息
+        self.monitor_thread = threading.Thread(target=self._monitor, daemon=True, name='recorder-supervisor')
+
+    def start(self):
+        logger.info(f"启动 RecorderSupervisor，共 {len(self.workers)} 路视频源")
+        for worker in self.workers:
+            os.makedirs(worker.spec['video_dir'], exist_ok=True)
+            self._spawn(worker)
+        self.monitor_thread.start()
+
+    def stop(self):
+        """
+        通知全部录制进程结束当前录像并退出，超时未退出的进程被强制结束。
+        录制进程退出前发布的实时事件在全部进程退出后才停止转发。
+        """
+        logger.info("请求停止 RecorderSupervisor")
+        with self.lock:
+            self.stop_event.set()
+        for worker in self.workers:
+            if worker.stop_event is not None:
+                worker.stop_event.set()
+        deadline = time.time() + STOP_TIMEOUT_S
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            worker.process.join(max(0.0, deadline - time.time()))
+            if worker.process.is_alive():
+                logger.warning(f"录制进程 {worker.spec['name']} 未按时退出，强制结束")
+                worker.process.kill()
+                worker.process.join()
+            worker.state = STATE_STOPPED
+        self.monitor_stop_event.set()
+        if self.monitor_thread.is_alive():
+            self.monitor_thread.join()
+        for preview in self.previews.values():
+            preview.close()
+        logger.info("RecorderSupervisor 已停止")
+
+    def stats(self):
+        """
+        :return: {'cameras': {名称: 状态}, 'total_fps': 总帧率, 'running': 运行中的路数, 'total': 总路数}
+        """
+        now = time.time()
+        cameras = {}
+        with self.lock:
+            for worker in self.workers:
+                status = worker.last_status
+                cameras[worker.spec['name']] = {
+                    'source': str(worker.spec['source']),
+                    'video_dir': worker.spec['video_dir'],
+                    'state': worker.state,
+                    'pid': worker.process.pid if worker.process is not None else None,
+                    'cpus': worker.cpus,
+                    'restarts': worker.restarts,
+                    'last_exit_code': worker.last_exit_code,
+                    'heartbeat_age_s': round(now - worker.last_heartbeat, 1) if worker.last_heartbeat else None,
+                    'fps': status.get('fps', 0.0),
+                    'frames': status.get('frames', 0),
+                    'frames_missed': status.get('frames_missed', 0),
+                    'recording': status.get('recording', False),
+                    'writer': status.get('writer'),
+                }
+        return {
+            'cameras': cameras,
+            'total_fps': round(sum(camera['fps'] for camera in cameras.values()), 2),
+            'running': sum(1 for camera in cameras.values() if camera['state'] == STATE_RUNNING),
+            'total': len(cameras),
+        }
+
+    def get_jpeg_frame(self, camera=None):
+        """
+        获取一路视频源当前实时画面的 JPEG 编码数据。
+
+        :param camera: 视频源名称，None 时为第一路
+        :return: JPEG 字节，没有可用画面时返回 None
+        """
+        preview = self.previews.get(camera if camera is not None else self.workers[0].spec['name'])
+        if preview is None:
+            return None
+        preview.touch()
+        frame = preview.read()
+        return frame[2] if frame is not None else None
+
+    def _spawn(self, worker):
+        if worker.conn is not None:
+            worker.conn.close()
+        worker.conn, child_conn = self.context.Pipe(duplex=False)
+        worker.stop_event = self.context.Event()
+        worker.process = self.context.Process(
+            target=_recorder_worker,
+            args=(worker.spec, worker.cpus, self.previews[worker.spec['name']].name, child_conn,
+                  worker.stop_event),
+            name=f"recorder-{worker.spec['name']}",
+            daemon=True,
+        )
+        worker.process.start()
+        child_conn.close()
+        worker.state = STATE_STARTING
+        worker.started_at = time.time()
+        worker.last_heartbeat = worker.started_at
+        worker.restart_at = None
+        logger.info(f"录制进程 {worker.spec['name']} 已启动 (pid {worker.process.pid}, CPU {worker.cpus})")
+
+    def _monitor(self):
+        while not self.monitor_stop_event.is_set():
+            with self.lock:
+                conns = {worker.conn: worker for worker in self.workers if worker.conn is not None}
+            if conns:
+                for conn in multiprocessing.connection.wait(list(conns), timeout=1):
+                    self._receive(conns[conn], conn)
+            else:
+                self.monitor_stop_event.wait(1)
+            with self.lock:
+                if not self.stop_event.is_set():
+                    for worker in self.workers:
+                        self._check(worker)
+
+    def _receive(self, worker, conn):
+        try:
+            kind, payload = conn.recv()
+        except (EOFError, OSError):
+            # 录制进程已退出，由 _check 处理重启
+            with self.lock:
+                if worker.conn is conn:
+                    worker.conn = None
+                    conn.close()
+            return
+        if kind == MESSAGE_LIVE:
+            try:
+                receive_live_message(payload)
+            except Exception as e:
+                logger.error(f"处理录制进程转发的实时事件时发生错误: {e}")
+        elif kind == MESSAGE_STATUS:
+            with self.lock:
+                if worker.conn is conn:
+                    worker.state = payload['state']
+                    worker.last_status = payload
+                    worker.last_heartbeat = time.time()
+
+    def _check(self, worker):
+        now = time.time()
+        name = worker.spec['name']
+        if worker.state == STATE_BACKOFF:
+            if now >= worker.restart_at:
+                worker.restarts += 1
+                self._spawn(worker)
+            return
+        if worker.process is None:
+            return
+
+        # 启动时的冷启动等待期间不上报心跳
+        timeout = HEARTBEAT_TIMEOUT_S + (COLD_START_WAIT_S if worker.state == STATE_STARTING else 0)
+        if worker.process.is_alive():
+            if now - worker.last_heartbeat <= timeout:
+                return
+            logger.error(f"录制进程 {name} 超过 {now - worker.last_heartbeat:.0f} 秒未上报状态，强制结束")
+            worker.process.kill()
+            worker.process.join()
+
+        worker.last_exit_code = worker.process.exitcode
+        if now - worker.started_at >= RESTART_BACKOFF_RESET_S:
+            worker.backoff_s = RESTART_BACKOFF_S
+        worker.restart_at = now + worker.backoff_s
+        logger.warning(f"录制进程 {name} 已退出 (状态码 {worker.last_exit_code})，{worker.backoff_s:.0f} 秒后重启")
+        worker.backoff_s = min(worker.backoff_s * 2, RESTART_BACKOFF_MAX_S)
+        worker.state = STATE_BACKOFF
+        worker.last_status = {}
+
+
+def start_recorder_supervisor(sources=SUPERVISOR_SOURCES):
+    """
+    启动多路录制监督器。
+    """
+    supervisor = RecorderSupervisor(sources)
+    supervisor.start()
+    return supervisor
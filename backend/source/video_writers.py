@@ -0,0 +1,219 @@
+# backend/source/video_writers.py
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+from config import VideoRecordingConfig
+from logger import logger
+
+VIDEO_FPS = VideoRecordingConfig.video_fps
+VIDEO_SIZE = tuple(VideoRecordingConfig.video_size)
+VIDEO_CODEC = VideoRecordingConfig.video_codec
+VIDEO_BITRATE_MBPS = VideoRecordingConfig.video_bitrate_mbps
+VIDEO_GOP = VideoRecordingConfig.video_gop
+VIDEO_WRITER_BACKEND = VideoRecordingConfig.video_writer_backend
+FFMPEG_PATH = VideoRecordingConfig.ffmpeg_path
+FFMPEG_CODEC = VideoRecordingConfig.ffmpeg_codec
+FFMPEG_PRESET = VideoRecordingConfig.ffmpeg_preset
+
+_probe_lock = threading.Lock()
+_ffmpeg_exe = None
+_encoder_support = {}
+_prepared = {}  # 编码器 -> 录制器启动时 prepare_video_writer 的检查结果
+
+
+def find_ffmpeg(ffmpeg_path=FFMPEG_PATH):
+    """
+    查找 ffmpeg 可执行文件：配置的路径、PATH 中的 ffmpeg、imageio-ffmpeg 附带的 ffmpeg（如已安装）。
+
+    :return: 可执行文件路径，找不到时返回 None
+    """
+    global _ffmpeg_exe
+    if ffmpeg_path:
+        return ffmpeg_path if os.path.isfile(ffmpeg_path) else shutil.which(ffmpeg_path)
+    with _probe_lock:
+        if _ffmpeg_exe is None:
+            exe = shutil.which('ffmpeg')
+            if exe is None:
+                try:
+                    import imageio_ffmpeg
+                    exe = imageio_ffmpeg.get_ffmpeg_exe()
+                except Exception:
+                    exe = ''
+            _ffmpeg_exe = exe
+        return _ffmpeg_exe or None
+
+
+def ffmpeg_supports(codec, ffmpeg_path=FFMPEG_PATH):
+    """
+    检查 ffmpeg 是否带有指定的编码器（如 libx264/libx265），结果按可执行文件缓存。
+    """
+    exe = find_ffmpeg(ffmpeg_path)
+    if exe is None:
+        return False
+    with _probe_lock:
+        key = (exe, codec)
+        if key not in _encoder_support:
+            try:
+                output = subprocess.run([exe, '-hide_banner', '-encoders'], capture_output=True,
+                                        text=True, timeout=10).stdout
+                _encoder_support[key] = any(line.split()[1:2] == [codec] for line in output.splitlines())
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning(f"无法检查 ffmpeg 编码器: {e}")
+                _encoder_support[key] = False
+        return _encoder_support[key]
+
+
+def prepare_video_writer(backend=VIDEO_WRITER_BACKEND, codec=FFMPEG_CODEC):
+    """
+    录制器启动时调用：使用 ffmpeg 后端时查找 ffmpeg 并检查编码器，结果缓存，
+    开始录制时 open_video_writer 不再启动探测子进程。
+
+    :return: ffmpeg 后端是否可用，其他后端返回 False
+    """
+    if backend != 'ffmpeg':
+        return False
+    supported = ffmpeg_supports(codec)
+    _prepared[codec] = supported
+    if supported:
+        logger.info(f"录像使用 ffmpeg 编码 ({codec}): {find_ffmpeg()}")
+    else:
+        logger.warning(f"ffmpeg 或编码器 {codec} 不可用，录像使用 cv2.VideoWriter ({VIDEO_CODEC})")
+    return supported
+
+
+class FFmpegVideoWriter:
+    """
+    通过管道把原始 BGR 帧交给 ffmpeg 子进程编码（libx264/libx265），按配置的码率、预设和关键帧间隔输出 MP4。
+    与 cv2.VideoWriter 接口一致（write/release/isOpened），可直接交给 RecordingWriter。
+
+    编码在独立进程中进行，写入线程只负责把帧写入管道；ffmpeg 编码跟不上时管道写入阻塞，
+    由 RecordingWriter 的有界队列吸收积压。
+    """
+
+    # 管道写入可能长时间阻塞，RecordingWriter 写入环形缓冲区视图的副本
+    blocking_write = True
+
+    def __init__(self, filename, fps=VIDEO_FPS, frame_size=VIDEO_SIZE, codec=FFMPEG_CODEC,
+                 bitrate_mbps=VIDEO_BITRATE_MBPS, preset=FFMPEG_PRESET, gop=VIDEO_GOP,
+                 ffmpeg_path=FFMPEG_PATH):
+        """
+        :param filename:     输出文件路径
+        :param fps:          帧率
+        :param frame_size:   帧尺寸 (宽, 高)
+        :param codec:        'libx264' 或 'libx265'
+        :param bitrate_mbps: 目标码率，Mbps
+        :param preset:       编码预设，如 'ultrafast'、'veryfast'、'medium'
+        :param gop:          关键帧间隔，帧
+        :param ffmpeg_path:  ffmpeg 可执行文件路径，None 时自动查找
+        """
+        self.filename = filename
+        self.frame_size = tuple(frame_size)
+        self.frame_bytes = self.frame_size[0] * self.frame_size[1] * 3
+        self.process = None
+        self.broken = False
+        self.frames_written = 0
+        self.stderr = tempfile.TemporaryFile()  # 避免 stderr 管道写满阻塞 ffmpeg
+
+        exe = find_ffmpeg(ffmpeg_path)
+        if exe is None:
+            logger.error("未找到 ffmpeg，无法使用 ffmpeg 写入后端")
+            return
+        bitrate = f"{bitrate_mbps}M"
+        command = [
+            exe, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{self.frame_size[0]}x{self.frame_size[1]}",
+            '-r', str(fps), '-i', '-', '-an',
+            '-c:v', codec, '-preset', preset,
+            '-b:v', bitrate, '-maxrate', bitrate, '-bufsize', f"{bitrate_mbps * 2}M",
+            '-g', str(gop), '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
+        ]
+        if codec == 'libx265':
+            # hvc1 标签便于浏览器和 QuickTime 播放
+            command += ['-tag:v', 'hvc1', '-x265-params', 'log-level=error']
+        command.append(filename)
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                            stderr=self.stderr)
+        except OSError as e:
+            logger.error(f"无法启动 ffmpeg 进程: {e}")
+            self.process = None
+
+    def isOpened(self):
+        return self.process is not None and not self.broken and self.process.poll() is None
+
+    def write(self, frame):
+        """
+        写入一帧 BGR 图像，尺寸与 frame_size 不一致时先缩放。
+        """
+        if self.process is None or self.broken:
+            return
+        if frame.nbytes != self.frame_bytes:
+            frame = cv2.resize(frame, self.frame_size)
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame).data)
+            self.frames_written += 1
+        except (BrokenPipeError, ValueError, OSError) as e:
+            self.broken = True
+            logger.error(f"ffmpeg 进程已退出，录像写入中断: {self.filename}, {e}, {self._read_stderr()}")
+
+    def release(self):
+        """
+        关闭管道并等待 ffmpeg 写完文件。
+        """
+        if self.process is None:
+            self.stderr.close()
+            return
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            returncode = self.process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            returncode = self.process.wait()
+        if returncode != 0:
+            logger.error(f"ffmpeg 编码失败 (返回码 {returncode}): {self.filename}, {self._read_stderr()}")
+        self.process = None
+        self.stderr.close()
+
+    def _read_stderr(self):
+        try:
+            self.stderr.seek(0)
+            return self.stderr.read().decode('utf-8', errors='replace').strip()[-500:]
+        except (OSError, ValueError):
+            return ''
+
+
+def open_video_writer(filename, fps=VIDEO_FPS, frame_size=VIDEO_SIZE, backend=VIDEO_WRITER_BACKEND):
+    """
+    按配置的后端打开视频写入器。ffmpeg 或其编码器不可用、进程启动失败时回退到 cv2.VideoWriter。
+    在录制路径上调用，不做 ffmpeg 探测：录制器启动时未调用 prepare_video_writer 时同样回退。
+
+    :param filename:   输出文件路径
+    :param fps:        帧率
+    :param frame_size: 帧尺寸 (宽, 高)
+    :param backend:    'ffmpeg' 或 'opencv'
+    :return: 具有 write/release/isOpened 方法的写入器，调用方需检查 isOpened()
+    """
+    frame_size = tuple(frame_size)
+    if backend == 'ffmpeg':
+        supported = _prepared.get(FFMPEG_CODEC)
+        if supported:
+            video_writer = FFmpegVideoWriter(filename, fps, frame_size)
+            if video_writer.isOpened():
+                return video_writer
+            video_writer.release()
+            logger.warning(f"ffmpeg 写入器启动失败，回退到 cv2.VideoWriter ({VIDEO_CODEC})")
+        elif supported is None:
+            logger.warning(f"录制器启动时未检查 ffmpeg，使用 cv2.VideoWriter ({VIDEO_CODEC})")
+    elif backend != 'opencv':
+        logger.warning(f"未知的录像写入后端: {backend}，使用 cv2.VideoWriter")
+    return cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*VIDEO_CODEC), fps, frame_size)
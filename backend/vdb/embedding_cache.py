@@ -0,0 +1,140 @@
+# backend/vdb/embedding_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import EmbeddingCacheConfig
+from logger import logger
+
+EMBEDDING_CACHE_PATH = EmbeddingCacheConfig.cache_path
+EMBEDDING_CACHE_MEMORY_ENTRIES = EmbeddingCacheConfig.memory_entries
+
+
+def _as_float32(vector):
+    # 缓存以 float32 保存，新计算的向量也按同一精度返回，保证命中与未命中结果一致
+    return np.asarray(vector, dtype=np.float32).tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    带缓存的嵌入函数，包装任意 langchain Embeddings。
+    以 (模型, 文本哈希) 为键，持久化在 SQLite 中，并保留一个内存 LRU 缓存；
+    未命中的文本合并为一次 embed_documents 调用。
+    """
+
+    def __init__(self, embeddings, model_name, cache_path=EMBEDDING_CACHE_PATH,
+                 memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES):
+        """
+        :param embeddings:     被包装的嵌入函数
+        :param model_name:     嵌入模型名称，模型变化时缓存自动失效
+        :param cache_path:     SQLite 缓存文件路径，None 表示仅内存
+        :param memory_entries: 内存 LRU 缓存条数
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = None
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)')
+            self.conn.commit()
+
+    def _key(self, text):
+        return hashlib.sha256(f'{self.model_name}\0{text}'.encode('utf-8')).hexdigest()
+
+    def _lookup(self, keys):
+        """
+        :return: {键: 向量}，仅包含命中的键
+        """
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+            missing = [key for key in keys if key not in found]
+            if self.conn is not None and missing:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows = self.conn.execute(
+                        f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', chunk).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+        return found
+
+    def _store(self, items):
+        with self.lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self.conn is not None:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)',
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items])
+                self.conn.commit()
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(set(keys))
+
+        # 未命中的文本去重后合并为一次调用
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = [_as_float32(v) for v in self.embeddings.embed_documents(list(missing.values()))]
+            new_items = list(zip(missing.keys(), vectors))
+            self._store(new_items)
+            found.update(new_items)
+
+        with self.lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        logger.debug(f'嵌入缓存: {len(texts)} 个文本，{len(missing)} 个未命中')
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self._key(text)
+        found = self._lookup([key])
+        if key in found:
+            with self.lock:
+                self.hits += 1
+            return found[key]
+
+        vector = _as_float32(self.embeddings.embed_query(text))
+        self._store([(key, vector)])
+        with self.lock:
+            self.misses += 1
+        return vector
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'memory_entries': len(self.memory),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
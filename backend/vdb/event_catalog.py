@@ -0,0 +1,191 @@
+# backend/vdb/event_catalog.py
+
+import json
+import os
+import sqlite3
+import threading
+
+from config import EventCatalogConfig
+from logger import logger
+
+EVENT_CATALOG_PATH = EventCatalogConfig.db_path
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    cursor INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL,
+    camera TEXT,
+    video_path TEXT NOT NULL,
+    start_ts REAL,
+    end_ts REAL,
+    payload TEXT NOT NULL,
+    UNIQUE (video_path, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_event_id ON events (event_id);
+CREATE INDEX IF NOT EXISTS events_camera_time ON events (camera, start_ts, end_ts);
+CREATE INDEX IF NOT EXISTS events_time ON events (start_ts, end_ts);
+CREATE TABLE IF NOT EXISTS videos (
+    video_path TEXT PRIMARY KEY
+);
+'''
+
+
+class EventCatalog:
+    """
+    事件目录：页面事件列表和已处理的视频文件，持久化在 SQLite（WAL 模式）中。
+
+    每个事件加入时分配递增的游标（即 cursor 列，重启后继续递增）并序列化一次 JSON，
+    按事件ID、摄像头、起止时间和视频路径建立索引，查找不随事件总数线性增长。
+    已记录的视频在重启后无需重新加载。
+    """
+
+    def __init__(self, db_path=EVENT_CATALOG_PATH):
+        """
+        :param db_path: SQLite 文件路径，':memory:' 表示仅内存
+        """
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.lock = threading.Lock()
+        # 显式管理事务，写入时先取得写锁再分配游标
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        # 最长事件时长，按时间范围查找时只需扫描开始时间在 [范围开始 - 最长时长, 范围结束) 内的索引项
+        self.max_duration = self.conn.execute(
+            'SELECT COALESCE(MAX(end_ts - start_ts), 0) FROM events').fetchone()[0]
+
+    def add_events(self, events, video_paths=()):
+        """
+        在一个事务中加入事件并记录已处理的视频；同一视频中 event_id 相同的事件只加入一次。
+
+        :param events:      事件字典，需包含 event_id 和 video_path；camera、start_ts、end_ts 写入索引列。
+                            cursor 字段由目录分配
+        :param video_paths: 记为已处理的视频文件，视频中没有事件时也不再重复处理
+        :return: 新加入的事件字典（含 cursor）列表
+        """
+        added = []
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = self.conn.execute('SELECT COALESCE(MAX(cursor), 0) FROM events').fetchone()[0]
+                for event in events:
+                    if self.conn.execute('SELECT 1 FROM events WHERE video_path = ? AND event_id = ?',
+                                         (event['video_path'], event['event_id'])).fetchone():
+                        continue
+                    cursor += 1
+                    event = dict(event, cursor=cursor)
+                    self.conn.execute(
+                        'INSERT INTO events (cursor, event_id, camera, video_path, start_ts, end_ts, payload) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (cursor, event['event_id'], event.get('camera'), event['video_path'],
+                         event.get('start_ts'), event.get('end_ts'),
+                         json.dumps(event, ensure_ascii=False, default=str)))
+                    added.append(event)
+                    if event.get('start_ts') is not None and event.get('end_ts') is not None:
+                        self.max_duration = max(self.max_duration, event['end_ts'] - event['start_ts'])
+                self.conn.executemany('INSERT OR IGNORE INTO videos (video_path) VALUES (?)',
+                                      [(path,) for path in video_paths])
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        if added:
+            logger.debug(f'事件目录新增 {len(added)} 个事件，最新游标 {added[-1]["cursor"]}')
+        return added
+
+    def video_paths(self):
+        """
+        :return: 已处理的视频文件集合
+        """
+        with self.lock:
+            return {row[0] for row in self.conn.execute('SELECT video_path FROM videos')}
+
+    def last_cursor(self):
+        """
+        :return: 最新事件的游标，没有事件时为 0
+        """
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(MAX(cursor), 0) FROM events').fetchone()[0]
+
+    def get(self, event_id):
+        """
+        :return: 事件字典，多个视频中有相同 event_id 时返回最早加入的事件，不存在时返回 None
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT payload FROM events WHERE event_id = ? ORDER BY cursor LIMIT 1',
+                                    (event_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def since(self, cursor=0, limit=None):
+        """
+        游标之后的事件。
+
+        :param cursor: 只返回游标大于此值的事件
+        :param limit:  最多返回的事件数，None 时不限
+        :return: [(游标, 事件 JSON 字符串)]，按游标递增
+        """
+        with self.lock:
+            return self.conn.execute('SELECT cursor, payload FROM events WHERE cursor > ? ORDER BY cursor LIMIT ?',
+                                     (cursor, -1 if limit is None else limit)).fetchall()
+
+    def video_events(self, video_path):
+        """
+        :return: 视频中的事件字典列表，按开始时间排序
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT payload FROM events WHERE video_path = ? ORDER BY start_ts, cursor',
+                                     (video_path,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _range_condition(self, start_ts, end_ts, camera):
+        # 与向量数据库的时间过滤相同：事件在范围结束前开始，且在范围开始后结束
+        condition = 'start_ts >= ? AND start_ts < ? AND end_ts >= ?'
+        params = [start_ts - self.max_duration, end_ts, start_ts]
+        if camera is not None:
+            condition += ' AND camera = ?'
+            params.append(camera)
+        return condition, params
+
+    def events_between(self, start_ts, end_ts, camera=None, limit=None):
+        """
+        与时间范围重叠的事件，按开始时间排序。
+
+        :param start_ts: 范围开始，epoch 秒
+        :param end_ts:   范围结束，epoch 秒
+        :param camera:   只返回该摄像头的事件，None 时不限
+        :param limit:    最多返回的事件数，None 时不限
+        :return: 事件字典列表
+        """
+        condition, params = self._range_condition(start_ts, end_ts, camera)
+        with self.lock:
+            rows = self.conn.execute(f'SELECT payload FROM events WHERE {condition} ORDER BY start_ts LIMIT ?',
+                                     params + [-1 if limit is None else limit]).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count_between(self, start_ts, end_ts, camera=None):
+        """
+        与时间范围重叠的事件数，参数同 events_between。
+        """
+        condition, params = self._range_condition(start_ts, end_ts, camera)
+        with self.lock:
+            return self.conn.execute(f'SELECT COUNT(*) FROM events WHERE {condition}', params).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_default_catalog = None
+_default_catalog_lock = threading.Lock()
+
+
+def get_event_catalog():
+    """
+    获取共享的事件目录。
+    """
+    global _default_catalog
+    with _default_catalog_lock:
+        if _default_catalog is None:
+            _default_catalog = EventCatalog()
+        return _default_catalog
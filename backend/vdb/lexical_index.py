@@ -0,0 +1,158 @@
+# backend/vdb/lexical_index.py
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from langchain_core.documents import Document
+
+from config import RAGConfig
+
+BM25_K1 = RAGConfig.bm25_k1
+BM25_B = RAGConfig.bm25_b
+
+CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+# 虚词、代词、量词等单字，几乎出现在每个事件描述和问句中，不作为检索词
+STOP_CHARS = frozenset('的了吗呢吧啊呀么嘛有是在和与及或就都也还又很把被给让这那哪个些什怎谁我你您他她它们请没不一过着')
+
+
+def tokenize(text):
+    """
+    中文按字切分为单字和相邻双字（n-gram），英文和数字按词切分。
+    停用字不作为单字词，两个字都是停用字的双字词（如“什么”）也不保留。
+    """
+    text = text.lower()
+    tokens = []
+    for run in CJK_PATTERN.findall(text):
+        tokens.extend(char for char in run if char not in STOP_CHARS)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1)
+                      if run[i] not in STOP_CHARS or run[i + 1] not in STOP_CHARS)
+    tokens.extend(WORD_PATTERN.findall(text))
+    return tokens
+
+
+def _content_terms(tokens):
+    """
+    查询中必须全部命中的词：中文单字和英文、数字词，不含双字词。
+    """
+    return {token for token in tokens if len(token) == 1 or not CJK_PATTERN.fullmatch(token)}
+
+
+class BM25Index:
+    """
+    事件描述的内存倒排索引，使用 BM25 打分。
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # 词 -> {文档ID: 词频}
+        self.doc_lengths = {}
+        self.documents = {}  # 文档ID -> Document
+        self.total_length = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, text, metadata=None):
+        with self.lock:
+            if doc_id in self.documents:
+                return
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings[term][doc_id] = tf
+            length = sum(counts.values())
+            self.doc_lengths[doc_id] = length
+            self.total_length += length
+            self.documents[doc_id] = Document(page_content=text, metadata=metadata or {}, id=doc_id)
+
+    def add_many(self, ids, texts, metadatas):
+        with self.lock:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                self.add(doc_id, text, metadata)
+
+    def search(self, query, k=5, time_range=None, match_all=False):
+        """
+        :param query:      查询文本
+        :param k:          返回结果数量
+        :param time_range: 可选 (开始时间, 结束时间)，只返回与该范围有交集的事件
+        :param match_all:  只返回包含查询中全部单字和英文词（停用字除外）的事件
+        :return: [(Document, 分数)]，按分数降序
+        """
+        terms = set(tokenize(query))
+        with self.lock:
+            doc_count = len(self.documents)
+            if not terms or doc_count == 0:
+                return []
+            avg_length = self.total_length / doc_count
+            scores = defaultdict(float)
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if time_range:
+                start_ts, end_ts = time_range[0].timestamp(), time_range[1].timestamp()
+                scores = {doc_id: score for doc_id, score in scores.items()
+                          if _overlaps(self.documents[doc_id].metadata, start_ts, end_ts)}
+            if match_all:
+                required = [self.postings.get(term, {}) for term in _content_terms(terms)]
+                scores = {doc_id: score for doc_id, score in scores.items()
+                          if all(doc_id in posting for posting in required)}
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(self.documents[doc_id], score) for doc_id, score in ranked]
+
+    @classmethod
+    def from_store(cls, store, batch_size=1000):
+        """
+        从向量数据库加载全部事件构建索引。
+        """
+        index = cls()
+        offset = 0
+        while True:
+            page = store.get(include=['documents', 'metadatas'], limit=batch_size, offset=offset)
+            ids = page.get('ids', [])
+            if not ids:
+                break
+            index.add_many(ids, page.get('documents', []), page.get('metadatas', []))
+            offset += len(ids)
+        return index
+
+
+def _overlaps(metadata, start_ts, end_ts):
+    event_start = metadata.get('start_ts')
+    event_end = metadata.get('end_ts')
+    if event_start is None or event_end is None:
+        return False
+    return event_start < end_ts and event_end >= start_ts
+
+
+def reciprocal_rank_fusion(result_lists, k, rrf_k=60, weights=None):
+    """
+    按倒数排名融合多路检索结果。
+
+    :param result_lists: 每路检索的 Document 列表，按相关性降序
+    :param k:            返回结果数量
+    :param rrf_k:        RRF 平滑常数
+    :param weights:      每路检索的权重
+    :return: 融合后的 Document 列表
+    """
+    weights = weights or [1.0] * len(result_lists)
+    scores = defaultdict(float)
+    documents = {}
+    for results, weight in zip(result_lists, weights):
+        for rank, document in enumerate(results):
+            # 向量检索结果不带ID，以描述和时间作为同一事件的标识
+            key = (document.page_content, document.metadata.get('video_name'), document.metadata.get('start_time'))
+            scores[key] += weight / (rrf_k + rank + 1)
+            documents.setdefault(key, document)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [documents[key] for key, _ in ranked]
@@ -0,0 +1,112 @@
+# backend/vdb/rollup_store.py
+
+import json
+import os
+import sqlite3
+import threading
+
+from config import RollupConfig
+
+ROLLUP_DB_PATH = RollupConfig.db_path
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rollups (
+    rollup_id TEXT PRIMARY KEY,
+    level TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    event_count INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rollups_level_time ON rollups (level, start_ts);
+CREATE INDEX IF NOT EXISTS rollups_level_camera_time ON rollups (level, camera, start_ts);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+'''
+
+
+class RollupStore:
+    """
+    时段汇总存储，持久化在 SQLite（WAL 模式）中。
+
+    汇总只按级别、摄像头和时间范围读取，不做语义检索，因此不计算嵌入向量。
+    """
+
+    def __init__(self, db_path=ROLLUP_DB_PATH):
+        """
+        :param db_path: SQLite 文件路径，':memory:' 表示仅内存
+        """
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+
+    def put(self, rollup_id, summary, metadata):
+        """
+        写入或替换一条汇总。
+
+        :param metadata: 汇总元数据，需包含 level、camera、start_ts、end_ts 和 event_count
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO rollups '
+                '(rollup_id, level, camera, start_ts, end_ts, event_count, summary, metadata) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (rollup_id, metadata['level'], metadata['camera'], metadata['start_ts'], metadata['end_ts'],
+                 metadata['event_count'], summary, json.dumps(metadata, ensure_ascii=False)))
+
+    def delete(self, rollup_id):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM rollups WHERE rollup_id = ?', (rollup_id,))
+
+    def between(self, level, start_ts, end_ts, camera=None):
+        """
+        与时间范围有交集的汇总。
+
+        :param level:    汇总级别
+        :param start_ts: 范围开始，epoch 秒
+        :param end_ts:   范围结束，epoch 秒
+        :param camera:   只返回该摄像头的汇总，None 时不限
+        :return: 按开始时间排序的 [(汇总文本, 元数据)]
+        """
+        condition = 'level = ? AND start_ts < ? AND end_ts > ?'
+        params = [level, end_ts, start_ts]
+        if camera is not None:
+            condition += ' AND camera = ?'
+            params.append(str(camera))
+        with self.lock:
+            rows = self.conn.execute(f'SELECT summary, metadata FROM rollups WHERE {condition} ORDER BY start_ts',
+                                     params).fetchall()
+        return [(summary, json.loads(metadata)) for summary, metadata in rows]
+
+    def event_counts(self, level):
+        """
+        :return: {(摄像头, 时段开始 epoch 秒): 汇总记录的事件数}
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT camera, start_ts, event_count FROM rollups WHERE level = ?',
+                                     (level,)).fetchall()
+        return {(camera, start_ts): event_count for camera, start_ts, event_count in rows}
+
+    def get_state(self, key):
+        """
+        :return: 保存的数值状态（如对账水位），不存在时返回 None
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)', (key, value))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
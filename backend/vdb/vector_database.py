@@ -3,25 +3,69 @@
 from langchain_chroma import Chroma
 from langchain_ollama import OllamaEmbeddings
 import hashlib
+import threading
+import time
 from datetime import datetime
 
+from backend.vdb.embedding_cache import CachedEmbeddings
+from backend.vdb.lexical_index import BM25Index, reciprocal_rank_fusion
 from logger import logger
-from config import ChromaDBConfig, LLMConfig, RAGConfig
+from config import ChromaDBConfig, EmbeddingCacheConfig, LLMConfig, RAGConfig
 
 PERSIST_DIR = ChromaDBConfig.persist_dir
 QUERY_MODEL = LLMConfig.query_model
 EMBED_MODEL = LLMConfig.embedding_model
 
 TOP_K = RAGConfig.top_k
+BATCH_SIZE = ChromaDBConfig.batch_size
+SEARCH_MODE = RAGConfig.search_mode
+LEXICAL_FAST_PATH_MAX_CHARS = RAGConfig.lexical_fast_path_max_chars
+LEXICAL_WEIGHT = RAGConfig.lexical_weight
+VECTOR_WEIGHT = RAGConfig.vector_weight
+
+embedding_function = OllamaEmbeddings(model=EMBED_MODEL)
+if EmbeddingCacheConfig.enabled:
+    # 缓存事件和查询的嵌入向量，重复重建索引和重复查询不再调用嵌入模型
+    embedding_function = CachedEmbeddings(embedding_function, EMBED_MODEL)
 
 vector_store = Chroma(
     collection_name='video_events',
-    embedding_function=OllamaEmbeddings(model=EMBED_MODEL),
+    embedding_function=embedding_function,
     persist_directory=PERSIST_DIR,
 )
 
 logger.info(f'成功加载向量数据库 {PERSIST_DIR}')
 
+# 每个向量数据库对应的关键词索引，首次检索时从数据库加载，之后由 vdb_add_events 同步
+_lexical_indexes = {}
+_lexical_indexes_lock = threading.Lock()
+
+# 新事件入库后的回调，例如标记需要重新汇总的时段
+_event_listeners = []
+
+
+def vdb_add_event_listener(callback):
+    """
+    注册新事件入库回调 callback(metadatas, store)，metadatas 为新增事件转换后的元数据（含 start_ts/end_ts）。
+    """
+    if callback not in _event_listeners:
+        _event_listeners.append(callback)
+
+
+def get_lexical_index(store=None):
+    """
+    获取向量数据库对应的关键词索引，不存在时从数据库构建。
+    """
+    store = store or vector_store
+    with _lexical_indexes_lock:
+        index = _lexical_indexes.get(id(store))
+        if index is None:
+            start_time = time.time()
+            index = BM25Index.from_store(store)
+            _lexical_indexes[id(store)] = index
+            logger.info(f'关键词索引构建完成: {len(index)} 个事件，耗时 {time.time() - start_time:.2f} 秒')
+        return index
+
 
 def generate_event_id(text, metadata):
     """
@@ -46,55 +90,227 @@ def generate_event_id(text, metadata):
     return hashlib.md5(unique_str.encode('utf-8')).hexdigest()
 
 
-def vdb_add_events(texts, metadatas):
+def event_id_of(document):
+    """
+    检索结果对应的事件ID，结果不带ID时按入库时的规则重新生成。
+    """
+    return getattr(document, 'id', None) or generate_event_id(document.page_content, document.metadata)
+
+
+def _to_timestamp(value):
+    """
+    将 datetime 或时间字符串转换为 epoch 秒，无法解析时返回 None。
+    """
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+            try:
+                return datetime.strptime(value, fmt).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+def _convert_metadata(meta):
+    """
+    将 metadata 中的 datetime 对象转换为字符串，并附加用于时间过滤的 epoch 秒字段 start_ts/end_ts，
+    以及写入（或补充时间字段）的时间 indexed_ts，供时段汇总增量对账。
+    """
+    meta_converted = {}
+    for key, value in meta.items():
+        if isinstance(value, datetime):
+            meta_converted[key] = value.strftime("%Y-%m-%d %H:%M:%S.%f")
+        else:
+            meta_converted[key] = value
+    for key, ts_key in (('start_time', 'start_ts'), ('end_time', 'end_ts')):
+        if ts_key not in meta_converted:
+            ts = _to_timestamp(meta.get(key))
+            if ts is not None:
+                meta_converted[ts_key] = ts
+    meta_converted.setdefault('indexed_ts', time.time())
+    return meta_converted
+
+
+def vdb_backfill_time_fields(batch_size=BATCH_SIZE, store=None):
+    """
+    为旧版本写入、缺少 start_ts/end_ts 的事件补充时间字段，使其能被时间过滤检索到。
+
+    :return: 补充的事件数
+    """
+    store = store or vector_store
+    updated = 0
+    offset = 0
+    while True:
+        page = store.get(include=['metadatas'], limit=batch_size, offset=offset)
+        ids = page.get('ids', [])
+        if not ids:
+            break
+        update_ids, update_metadatas = [], []
+        for event_id, meta in zip(ids, page.get('metadatas', [])):
+            meta = meta or {}
+            if 'start_ts' in meta and 'end_ts' in meta:
+                continue
+            converted = _convert_metadata(meta)
+            if 'start_ts' in converted and 'end_ts' in converted:
+                update_ids.append(event_id)
+                update_metadatas.append(converted)
+        if update_ids:
+            store._collection.update(ids=update_ids, metadatas=update_metadatas)
+            updated += len(update_ids)
+        offset += len(ids)
+    if updated:
+        logger.info(f'已为 {updated} 个事件补充时间字段')
+    return updated
+
+
+def time_range_filter(time_range):
+    """
+    构造与时间范围有交集的事件过滤条件。
+
+    :param time_range: (开始时间, 结束时间)，datetime 对象
+    """
+    start, end = time_range
+    return {'$and': [
+        {'start_ts': {'$lt': end.timestamp()}},
+        {'end_ts': {'$gte': start.timestamp()}},
+    ]}
+
+
+def _get_existing_ids(ids, batch_size=BATCH_SIZE, store=None):
+    """
+    分批查询数据库中已存在的事件ID，只取ID不取文档和向量。
+    """
+    store = store or vector_store
+    existing_ids = set()
+    for start in range(0, len(ids), batch_size):
+        existing = store.get(ids=ids[start:start + batch_size], include=[])
+        existing_ids.update(existing.get('ids', []))
+    return existing_ids
+
+
+def vdb_add_events(texts, metadatas, batch_size=BATCH_SIZE, store=None):
     """
     批量添加事件到数据库, 避免重复添加。
+
+    :param texts:      事件描述列表
+    :param metadatas:  事件元数据列表
+    :param batch_size: 每批查询和写入的事件数
+    :param store:      向量数据库，默认使用全局 vector_store
+    :return: 新添加的事件数
     """
+    store = store or vector_store
+
     # 生成事件ID列表
     ids = [generate_event_id(text, meta) for text, meta in zip(texts, metadatas)]
 
-    # 检查哪些事件已存在
-    existing_ids = []
-    for event_id in ids:
-        existing = vector_store.get(ids=[event_id])
-        if existing and len(existing['documents']) > 0:
-            existing_ids.append(event_id)
+    # 一次性检查哪些事件已存在
+    existing_ids = _get_existing_ids(ids, batch_size, store)
 
-    # 过滤掉已存在的事件
+    # 过滤掉已存在的事件，以及本次输入中重复的事件
     new_texts = []
     new_metadatas = []
     new_ids = []
     for text, meta, event_id in zip(texts, metadatas, ids):
         if event_id not in existing_ids:
-            # 在这里将 metadata 中的 datetime 对象转换为字符串
-            meta_converted = {}
-            for key, value in meta.items():
-                if isinstance(value, datetime):
-                    meta_converted[key] = value.strftime("%Y-%m-%d %H:%M:%S.%f")
-                else:
-                    meta_converted[key] = value
             new_texts.append(text)
-            new_metadatas.append(meta_converted)
+            new_metadatas.append(_convert_metadata(meta))
             new_ids.append(event_id)
+            existing_ids.add(event_id)
         else:
             logger.debug(f"事件已存在，跳过添加: {event_id}")
 
-    # 添加新的事件
+    # 分批添加新的事件
     if new_texts:
-        vector_store.add_texts(new_texts, new_metadatas, ids=new_ids)
+        for start in range(0, len(new_texts), batch_size):
+            end = start + batch_size
+            store.add_texts(new_texts[start:end], new_metadatas[start:end], ids=new_ids[start:end])
+        # 同步关键词索引（尚未构建时，首次检索会从数据库完整加载）。
+        # 构建期间持有注册表锁，在锁内读取可等待正在进行的构建完成后再补充，避免构建漏读本批事件
+        with _lexical_indexes_lock:
+            index = _lexical_indexes.get(id(store))
+        if index is not None:
+            index.add_many(new_ids, new_texts, new_metadatas)
+        for listener in _event_listeners:
+            try:
+                listener(new_metadatas, store)
+            except Exception as e:
+                logger.error(f'新事件入库回调发生错误: {e}')
         logger.debug(f'成功向数据库添加 {len(new_texts)} 个新事件')
     else:
         logger.debug("没有新的事件需要添加")
+    return len(new_texts)
 
 
-def vdb_search_event(query):
+def vdb_reindex_all(events, batch_size=BATCH_SIZE, store=None):
+    """
+    批量重建索引，适用于启动时将整个存档的事件写入数据库。
+
+    :param events:     可迭代的 (事件描述, 事件元数据) 序列
+    :param batch_size: 每批查询和写入的事件数
+    :param store:      向量数据库，默认使用全局 vector_store
+    :return: (处理的事件数, 新添加的事件数)
+    """
+    start_time = time.time()
+    total = 0
+    added = 0
+    texts, metadatas = [], []
+    for text, meta in events:
+        texts.append(text)
+        metadatas.append(meta)
+        if len(texts) >= batch_size:
+            added += vdb_add_events(texts, metadatas, batch_size, store)
+            total += len(texts)
+            texts, metadatas = [], []
+    if texts:
+        added += vdb_add_events(texts, metadatas, batch_size, store)
+        total += len(texts)
+
+    elapsed = time.time() - start_time
+    rate = total / elapsed if elapsed > 0 else 0
+    logger.info(f'重建索引完成: 处理 {total} 个事件，新增 {added} 个，耗时 {elapsed:.2f} 秒 ({rate:.1f} 事件/秒)')
+    return total, added
+
+
+def vdb_search_event(query, time_range=None, k=TOP_K, store=None, mode=SEARCH_MODE):
     """
     搜索事件
+
+    :param query:      查询文本
+    :param time_range: 可选 (开始时间, 结束时间)，只在与该范围有交集的事件中搜索
+    :param k:          返回结果数量
+    :param mode:       'vector'、'lexical' 或 'hybrid'
     """
-    results = vector_store.similarity_search(query=query, k=TOP_K)
+    store = store or vector_store
+
+    if mode == 'vector':
+        results = _vector_search(query, time_range, k, store)
+    else:
+        index = get_lexical_index(store)
+        lexical_results = [doc for doc, _ in index.search(query, k=k * 2, time_range=time_range)]
+        fast_results = None
+        if mode == 'hybrid' and len(query.strip()) <= LEXICAL_FAST_PATH_MAX_CHARS:
+            # 只有包含查询中全部关键词（停用字除外）的事件才算命中，避免“有狗吗”只因“有”字匹配到无关事件
+            fast_results = [doc for doc, _ in index.search(query, k=k, time_range=time_range, match_all=True)]
+        if mode == 'lexical':
+            results = lexical_results[:k]
+        elif fast_results is not None and len(fast_results) >= k:
+            # 短关键词查询且关键词完全命中的事件充足，直接返回，不调用嵌入模型
+            logger.debug('短查询走关键词检索快速路径')
+            results = fast_results
+        else:
+            vector_results = _vector_search(query, time_range, k * 2, store)
+            results = reciprocal_rank_fusion([lexical_results, vector_results], k,
+                                             weights=[LEXICAL_WEIGHT, VECTOR_WEIGHT])
+
     if results:
         for result in results:
             logger.debug(f'搜索结果: {result.page_content} [{result.metadata}]')
     else:
         logger.info(f'搜索结果为空')
     return results
+
+
+def _vector_search(query, time_range, k, store):
+    search_filter = time_range_filter(time_range) if time_range else None
+    return store.similarity_search(query=query, k=k, filter=search_filter)
@@ -0,0 +1,87 @@
+import os
+import cv2
+from math import floor
+
+from backend.video.motion_detect import (
+    MOTION_ANALYSIS_MODE, MOTION_ANALYSIS_WIDTH, MOTION_ANALYSIS_STRIDE, MOTION_ROI_MASK_PATH,
+    _detect_events_full, detect_motion_events, parse_video_start_time, build_motion_result, save_motion_result
+)
+from backend.video.frame_extract import save_frame
+from backend.source.frame_format import video_stream_info
+from config import VideoConfig
+
+SAVE_EVENT_FRAMES = VideoConfig.save_event_frames
+
+
+def detect_and_extract_frames(
+    video_path,
+    video_start_time,       # 现实世界视频开始时间，例如 "2025-01-01 12:00:00"
+    output_json_dir,        # 输出JSON的文件夹
+    output_dir,             # 提取到的帧保存文件夹
+    motion_threshold=0.02,
+    min_interval_ms=500,
+    max_silence_s=2,
+    image_quality=90,
+    analysis_mode=MOTION_ANALYSIS_MODE,
+    analysis_width=MOTION_ANALYSIS_WIDTH,
+    analysis_stride=MOTION_ANALYSIS_STRIDE,
+    roi_mask=MOTION_ROI_MASK_PATH,
+    save_frames=SAVE_EVENT_FRAMES,
+    on_frame=None,
+    on_event_end=None
+):
+    """
+    运动检测与帧提取合并为一次解码：检测到事件帧时立即保存或交给下游，
+    同时写出与 detect_motion_in_video 相同的JSON，目录结构与 extract_frames_from_video 相同。
+
+    :param video_path:       输入视频文件路径
+    :param video_start_time: 该视频在现实世界的开始时间（字符串或datetime对象）
+    :param output_json_dir:  存放输出JSON的路径
+    :param output_dir:       提取到的帧保存文件夹，帧保存在 output_dir/视频名/event_N/frameXXXX.jpg
+    :param image_quality:    保存图像的质量
+    :param analysis_mode:    'fast' 或 'full'，与 detect_motion_in_video 相同，检测结果也相同
+    :param save_frames:      是否将事件帧保存为JPEG
+    :param on_frame:         可选回调 on_frame(event_index, frame_idx, frame, image_path)，
+                             用于直接交给描述阶段；未保存时 image_path 为 None
+    :param on_event_end:     可选回调 on_event_end(event_index)，事件结束时调用
+    :return: (JSON文件路径, 帧输出目录)，无法打开视频时返回 None
+    """
+    video_start_time_dt = parse_video_start_time(video_start_time)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print("无法打开视频文件:", video_path)
+        return
+
+    # 录像元数据中已记录协商后的帧率和分辨率，无需再探测视频文件
+    stream_info = video_stream_info(cap, video_path)
+    fps = stream_info[0]
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    video_output_dir = os.path.join(output_dir, video_name)
+    os.makedirs(video_output_dir, exist_ok=True)
+
+    def handle_frame(event_index, frame_time, frame):
+        # 与 extract_frames_from_video 使用相同的帧号计算方式，保证文件名一致
+        frame_idx = int(floor(frame_time * fps))
+        image_path = None
+        if save_frames:
+            event_dir = os.path.join(video_output_dir, f"event_{event_index}")
+            os.makedirs(event_dir, exist_ok=True)
+            image_path = save_frame(frame, event_dir, frame_idx, image_quality)
+        if on_frame is not None:
+            on_frame(event_index, frame_idx, frame, image_path)
+
+    if analysis_mode == 'fast':
+        events = detect_motion_events(cap, motion_threshold, min_interval_ms, max_silence_s,
+                                      analysis_width, analysis_stride, roi_mask,
+                                      on_frame=handle_frame, on_event_end=on_event_end, stream_info=stream_info)
+    else:
+        events = _detect_events_full(cap, motion_threshold, min_interval_ms, max_silence_s, stream_info,
+                                     on_frame=handle_frame, on_event_end=on_event_end)
+    cap.release()
+
+    result = build_motion_result(video_start_time_dt, events)
+    output_json_path = save_motion_result(video_path, output_json_dir, result)
+
+    print(f"检测与帧提取完成，结果已保存至: {output_json_path}, {video_output_dir}")
+    return output_json_path, video_output_dir
@@ -3,17 +3,29 @@ import json
 import cv2
 from math import floor
 
+from backend.source.frame_format import video_stream_info
+from config import VideoConfig
+
+EXTRACT_MODE = VideoConfig.extract_mode
+EXTRACT_SEEK_THRESHOLD_FRAMES = VideoConfig.extract_seek_threshold_frames
+
+
 def extract_frames_from_video(
     video_path,
     json_path,
     output_dir,
-    image_quality=90
+    image_quality=90,
+    extract_mode=EXTRACT_MODE,
+    seek_threshold_frames=EXTRACT_SEEK_THRESHOLD_FRAMES
 ):
     """
     :param video_path:    原始视频文件路径
     :param json_path:     对应的JSON文件路径
     :param output_dir:    提取到的帧保存文件夹
     :param image_quality: 保存图像的质量
+    :param extract_mode:  'sequential' 顺序解码一次提取全部帧，'seek' 为每个时间点单独定位
+    :param seek_threshold_frames: sequential 模式下，距离下一目标帧超过此帧数时才进行定位，
+                                  一般设为关键帧间隔
     """
     # 读取JSON
     with open(json_path, 'r', encoding='utf-8') as f:
@@ -28,9 +40,23 @@ def extract_frames_from_video(
 
     # 打开视频
     cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    fps = video_stream_info(cap, video_path)[0]
 
     events = data.get("events", [])
+    if extract_mode == 'sequential':
+        _extract_sequential(cap, fps, events, video_output_dir, image_quality, seek_threshold_frames)
+    else:
+        _extract_seek(cap, fps, events, video_output_dir, image_quality)
+
+    cap.release()
+    print(f"帧提取完成，结果保存在: {video_output_dir}")
+    return video_output_dir
+
+
+def _extract_seek(cap, fps, events, video_output_dir, image_quality):
+    """
+    原始实现：每个时间点单独定位并解码。
+    """
     for idx, event in enumerate(events, start=1):
         # 为每个事件创建独立文件夹
         event_dir = os.path.join(video_output_dir, f"event_{idx}")
@@ -39,18 +65,67 @@ def extract_frames_from_video(
         frame_time_list = event.get("frame_time", [])
         for frame_t in frame_time_list:
             # frame_t 是相对视频开始的秒数，计算对应帧号
-            frame_idx = int(floor(frame_t * fps))  
+            frame_idx = int(floor(frame_t * fps))
             cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
             ret, frame = cap.read()
             if not ret:
                 continue
+            save_frame(frame, event_dir, frame_idx, image_quality)
 
-            # 保存 jpg
-            # 格式 frameXXXX.jpg
-            output_name = f"frame{frame_idx:04d}.jpg"
-            output_path = os.path.join(event_dir, output_name)
-            cv2.imwrite(output_path, frame, [int(cv2.IMWRITE_JPEG_QUALITY), image_quality])
 
-    cap.release()
-    print(f"帧提取完成，结果保存在: {video_output_dir}")
-    return video_output_dir
+def _extract_sequential(cap, fps, events, video_output_dir, image_quality, seek_threshold_frames):
+    """
+    顺序实现：汇总所有事件的目标帧号并排序，从头到尾解码一次。
+    """
+    # 帧号 -> 需要保存到的事件文件夹列表
+    targets = {}
+    for idx, event in enumerate(events, start=1):
+        event_dir = os.path.join(video_output_dir, f"event_{idx}")
+        os.makedirs(event_dir, exist_ok=True)
+        for frame_t in event.get("frame_time", []):
+            frame_idx = int(floor(frame_t * fps))
+            targets.setdefault(frame_idx, []).append(event_dir)
+
+    for frame_idx, frame in iter_frames_sequential(cap, targets.keys(), seek_threshold_frames):
+        for event_dir in targets[frame_idx]:
+            save_frame(frame, event_dir, frame_idx, image_quality)
+
+
+def iter_frames_sequential(cap, frame_indices, seek_threshold_frames=EXTRACT_SEEK_THRESHOLD_FRAMES):
+    """
+    按帧号升序顺序解码，仅对目标帧执行 retrieve。
+
+    :param cap:                   已打开的 cv2.VideoCapture，从当前位置开始读取
+    :param frame_indices:         目标帧号（可无序、可重复）
+    :param seek_threshold_frames: 与下一目标帧的距离超过此值时改为定位，None 表示从不定位
+    :return: 生成器，依次产出 (帧号, 帧)
+    """
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))  # 下一次 grab 将得到的帧号
+    for frame_idx in sorted(set(frame_indices)):
+        if frame_idx < position:
+            continue
+        gap = frame_idx - position
+        if seek_threshold_frames is not None and gap > seek_threshold_frames:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            position = frame_idx
+
+        # 跳过不需要的帧，grab 不做颜色转换和拷贝
+        while position < frame_idx:
+            if not cap.grab():
+                return
+            position += 1
+
+        ret, frame = cap.read()
+        if not ret:
+            return
+        position += 1
+        yield frame_idx, frame
+
+
+def save_frame(frame, event_dir, frame_idx, image_quality):
+    # 保存 jpg
+    # 格式 frameXXXX.jpg
+    output_name = f"frame{frame_idx:04d}.jpg"
+    output_path = os.path.join(event_dir, output_name)
+    cv2.imwrite(output_path, frame, [int(cv2.IMWRITE_JPEG_QUALITY), image_quality])
+    return output_path
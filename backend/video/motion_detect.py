@@ -1,18 +1,161 @@
 import cv2
 import json
+import numpy as np
 import os
 import time
 from datetime import datetime
 
+from backend.source.frame_format import video_stream_info
 from config import VideoConfig
 
+MOTION_ANALYSIS_MODE = VideoConfig.motion_analysis_mode
+MOTION_ANALYSIS_WIDTH = VideoConfig.motion_analysis_width
+MOTION_ANALYSIS_STRIDE = VideoConfig.motion_analysis_stride
+MOTION_ROI_MASK_PATH = VideoConfig.motion_roi_mask_path
+
+
+class MotionAnalyzer:
+    """
+    下采样灰度运动分析器。
+    每帧先缩放到分析尺寸并转为灰度，再进行背景减除和形态学处理；
+    所有中间缓冲区和结构元素在初始化时分配，逐帧复用。
+    """
+
+    def __init__(self, frame_width, frame_height, motion_threshold,
+                 analysis_width=MOTION_ANALYSIS_WIDTH, roi_mask=MOTION_ROI_MASK_PATH):
+        """
+        :param frame_width:     原始帧宽度
+        :param frame_height:    原始帧高度
+        :param motion_threshold: 运动检测阈值(占比)，相对于分析区域的像素总量
+        :param analysis_width:  分析宽度，None 或不小于原始宽度时不缩放
+        :param roi_mask:        感兴趣区域掩码，图片路径或单通道数组，非零像素为分析区域
+        """
+        if not analysis_width or analysis_width >= frame_width:
+            analysis_width = frame_width
+        analysis_height = max(1, int(round(frame_height * analysis_width / frame_width)))
+        self.size = (analysis_width, analysis_height)
+        self.need_resize = self.size != (frame_width, frame_height)
+
+        # 预分配缓冲区
+        self.small = np.empty((analysis_height, analysis_width, 3), dtype=np.uint8)
+        self.gray = np.empty((analysis_height, analysis_width), dtype=np.uint8)
+        self.fg_mask = np.empty((analysis_height, analysis_width), dtype=np.uint8)
+        self.morph = np.empty((analysis_height, analysis_width), dtype=np.uint8)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        self.back_sub = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=True)
+
+        self.roi = self._load_roi_mask(roi_mask)
+        if self.roi is not None:
+            analysis_pixels = cv2.countNonZero(self.roi)
+        else:
+            analysis_pixels = analysis_width * analysis_height
+        self.pixel_threshold = analysis_pixels * motion_threshold
+
+    def _load_roi_mask(self, roi_mask):
+        if roi_mask is None:
+            return None
+        if isinstance(roi_mask, str):
+            mask = cv2.imread(roi_mask, cv2.IMREAD_GRAYSCALE)
+            if mask is None:
+                raise FileNotFoundError(f"无法读取感兴趣区域掩码: {roi_mask}")
+        else:
+            mask = roi_mask
+            if mask.ndim == 3:
+                mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
+        mask = cv2.resize(mask, self.size, interpolation=cv2.INTER_NEAREST)
+        _, mask = cv2.threshold(mask, 0, 255, cv2.THRESH_BINARY)
+        return mask
+
+    def motion_pixels(self, frame):
+        """
+        :param frame: 原始 BGR 帧
+        :return: 分析区域内的前景像素数量
+        """
+        if self.need_resize:
+            cv2.resize(frame, self.size, dst=self.small, interpolation=cv2.INTER_AREA)
+            src = self.small
+        else:
+            src = frame
+        cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=self.gray)
+
+        self.back_sub.apply(self.gray, self.fg_mask)
+        cv2.morphologyEx(self.fg_mask, cv2.MORPH_OPEN, self.kernel, dst=self.morph)
+        cv2.morphologyEx(self.morph, cv2.MORPH_DILATE, self.kernel, dst=self.fg_mask)
+        if self.roi is not None:
+            cv2.bitwise_and(self.fg_mask, self.roi, dst=self.fg_mask)
+
+        return cv2.countNonZero(self.fg_mask)
+
+    def is_motion(self, frame):
+        return self.motion_pixels(frame) > self.pixel_threshold
+
+
+class MotionEventTracker:
+    """
+    运动事件状态机，根据逐帧的运动判定结果划分事件并记录事件帧时间。
+    """
+
+    def __init__(self, min_interval_ms=500, max_silence_s=2):
+        self.min_interval_ms = min_interval_ms
+        self.max_silence_s = max_silence_s
+        self.events = []              # 保存所有事件
+        self.current_event_frames = []# 当前事件包含的帧时间戳列表（视频内相对时间）
+        self.last_motion_time = None  # 上一次检测到运动的时间（视频播放时间）
+        self.last_save_time = 0       # 用于比较与上一次保存的时间是否大于 min_interval_ms
+
+    def update(self, current_time_s, motion):
+        """
+        :param current_time_s: 当前帧相对视频开始位置的时间（秒）
+        :param motion:         当前帧是否检测到运动
+        :return: 当前帧是否被记录为事件帧
+        """
+        saved = False
+        if motion:
+            # 与上一次保存记录的时间间隔(ms)
+            now_ms = current_time_s * 1000
+            if (now_ms - self.last_save_time) >= self.min_interval_ms:
+                # 记录此帧相对时间
+                self.current_event_frames.append(current_time_s)
+                self.last_save_time = now_ms
+                saved = True
+            self.last_motion_time = current_time_s
+        else:
+            # 如果当前没有运动，但需要判断是否超过了max_silence_s
+            if self.last_motion_time is not None:
+                if (current_time_s - self.last_motion_time) > self.max_silence_s:
+                    # 说明上一个事件结束
+                    self.close_event()
+        return saved
+
+    def close_event(self):
+        """
+        结束当前事件。
+        :return: 被结束的事件帧时间列表，没有事件时返回 None
+        """
+        closed = None
+        if self.current_event_frames:
+            closed = self.current_event_frames
+            self.events.append({
+                "frame_time": self.current_event_frames
+            })
+        # 重置当前事件
+        self.current_event_frames = []
+        self.last_motion_time = None
+        return closed
+
+
 def detect_motion_in_video(
     video_path,
-    video_start_time,       # 现实世界视频开始时间，例如 "2025-01-01 12:00:00" 
+    video_start_time,       # 现实世界视频开始时间，例如 "2025-01-01 12:00:00"
     output_json_dir,        # 输出JSON的文件夹
     motion_threshold=0.02,  # 运动检测阈值(相对于帧中像素总量的百分比)
     min_interval_ms=500,    # 最小间隔(ms)
-    max_silence_s=2         # 超时间隔(s)
+    max_silence_s=2,        # 超时间隔(s)
+    analysis_mode=MOTION_ANALYSIS_MODE,      # 'fast' 或 'full'
+    analysis_width=MOTION_ANALYSIS_WIDTH,    # 分析宽度(px)，仅 fast 模式
+    analysis_stride=MOTION_ANALYSIS_STRIDE,  # 分析步长(帧)，仅 fast 模式
+    roi_mask=MOTION_ROI_MASK_PATH            # 感兴趣区域掩码，仅 fast 模式
 ):
     """
     :param video_path:         输入视频文件路径
@@ -21,32 +164,54 @@ def detect_motion_in_video(
     :param motion_threshold:   运动检测阈值(占比)，如0.02代表2%
     :param min_interval_ms:    两次记录事件的最小间隔，单位毫秒
     :param max_silence_s:      若超过此时间没有检测到运动则判定上一个事件结束，单位秒
+    :param analysis_mode:      'fast' 使用下采样灰度分析，'full' 使用全分辨率彩色分析
+    :param analysis_width:     fast 模式下的分析宽度
+    :param analysis_stride:    fast 模式下每隔多少帧分析一帧，被跳过的帧只 grab 不解码
+    :param roi_mask:           fast 模式下的感兴趣区域掩码（路径或数组）
     """
     # 将开始时间转为 datetime 类型，方便后续计算
-    if isinstance(video_start_time, str):
-        video_start_time_dt = datetime.strptime(video_start_time, "%Y-%m-%d %H:%M:%S")
-    else:
-        video_start_time_dt = video_start_time
+    video_start_time_dt = parse_video_start_time(video_start_time)
 
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print("无法打开视频文件:", video_path)
         return
 
+    # 录像元数据中已记录协商后的帧率和分辨率，无需再探测视频文件
+    stream_info = video_stream_info(cap, video_path)
+    if analysis_mode == 'fast':
+        events = detect_motion_events(cap, motion_threshold, min_interval_ms, max_silence_s,
+                                      analysis_width, analysis_stride, roi_mask, stream_info=stream_info)
+    else:
+        events = _detect_events_full(cap, motion_threshold, min_interval_ms, max_silence_s, stream_info)
+
+    cap.release()
+
+    result = build_motion_result(video_start_time_dt, events)
+    output_json_path = save_motion_result(video_path, output_json_dir, result)
+
+    print(f"检测完成，结果已保存至: {output_json_path}")
+    return output_json_path
+
+
+def parse_video_start_time(video_start_time):
+    if isinstance(video_start_time, str):
+        return datetime.strptime(video_start_time, "%Y-%m-%d %H:%M:%S")
+    return video_start_time
+
+
+def _detect_events_full(cap, motion_threshold, min_interval_ms, max_silence_s, stream_info=None,
+                        on_frame=None, on_event_end=None):
+    """
+    原始实现：逐帧全分辨率背景减除。回调参数同 detect_motion_events。
+    """
     # 获取视频信息
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps, width, height = stream_info or video_stream_info(cap)
 
     # 背景分割器 (MOG2/BGSubtractorKNN等都可)
     back_sub = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=True)
 
-    # 事件相关变量
-    events = []              # 保存所有事件
-    current_event_frames = []# 当前事件包含的帧时间戳列表（视频内相对时间）
-    last_motion_time = None  # 上一次检测到运动的时间（视频播放时间）
-    last_save_time = 0       # 用于比较与上一次保存的时间是否大于 min_interval_ms
+    tracker = MotionEventTracker(min_interval_ms, max_silence_s)
 
     # 将像素百分比阈值转换成一个整数值
     total_pixels = width * height
@@ -74,38 +239,75 @@ def detect_motion_in_video(
         motion_pixels = (fg_mask > 0).sum()
 
         # 判断是否超过运动阈值
-        if motion_pixels > pixel_threshold:
-            # 与上一次保存记录的时间间隔(ms)
-            now_ms = current_time_s * 1000
-            if (now_ms - last_save_time) >= min_interval_ms:
-                # 记录此帧相对时间
-                current_event_frames.append(current_time_s)
-                last_save_time = now_ms
-            last_motion_time = current_time_s
-        else:
-            # 如果当前没有运动，但需要判断是否超过了max_silence_s
-            if last_motion_time is not None:
-                if (current_time_s - last_motion_time) > max_silence_s:
-                    # 说明上一个事件结束
-                    if current_event_frames:
-                        events.append({
-                            "frame_time": current_event_frames
-                        })
-                    # 重置当前事件
-                    current_event_frames = []
-                    last_motion_time = None
+        _track_frame(tracker, current_time_s, motion_pixels > pixel_threshold, frame, on_frame, on_event_end)
 
         frame_index += 1
 
     # 视频结束后，若还存在尚未保存的事件，则将其写入
-    if current_event_frames:
-        events.append({
-            "frame_time": current_event_frames
-        })
+    _close_tracker(tracker, on_event_end)
+    return tracker.events
 
-    cap.release()
 
-    # 组装最终JSON数据
+def _track_frame(tracker, current_time_s, motion, frame, on_frame, on_event_end):
+    """
+    更新事件状态，并在事件结束、帧被记录为事件帧时调用回调。
+    """
+    closed_count = len(tracker.events)
+    saved = tracker.update(current_time_s, motion)
+    if on_event_end is not None and len(tracker.events) > closed_count:
+        on_event_end(len(tracker.events))
+    if saved and on_frame is not None:
+        on_frame(len(tracker.events) + 1, current_time_s, frame)
+
+
+def _close_tracker(tracker, on_event_end):
+    if tracker.close_event() is not None and on_event_end is not None:
+        on_event_end(len(tracker.events))
+
+
+def detect_motion_events(cap, motion_threshold, min_interval_ms, max_silence_s,
+                         analysis_width, analysis_stride, roi_mask,
+                         on_frame=None, on_event_end=None, stream_info=None):
+    """
+    快速实现：单次顺序解码，下采样灰度分析，按步长跳帧。
+
+    :param on_frame:     可选回调 on_frame(event_index, frame_time, frame)，帧被记录为事件帧时立即调用，
+                         event_index 从 1 开始，与JSON中事件的顺序一致
+    :param on_event_end: 可选回调 on_event_end(event_index)，事件结束时调用
+    :param stream_info:  可选 (帧率, 宽, 高)，如来自录像元数据，None 时从 cap 读取
+    """
+    fps, width, height = stream_info or video_stream_info(cap)
+    analysis_stride = max(1, int(analysis_stride))
+
+    analyzer = MotionAnalyzer(width, height, motion_threshold, analysis_width, roi_mask)
+    tracker = MotionEventTracker(min_interval_ms, max_silence_s)
+
+    frame_index = 0
+    while True:
+        if frame_index % analysis_stride:
+            # 跳过的帧只 grab，不做颜色转换和拷贝
+            if not cap.grab():
+                break
+            frame_index += 1
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        _track_frame(tracker, frame_index / fps, analyzer.is_motion(frame), frame, on_frame, on_event_end)
+        frame_index += 1
+
+    _close_tracker(tracker, on_event_end)
+    return tracker.events
+
+
+def build_motion_result(video_start_time_dt, events):
+    """
+    组装最终JSON数据。
+    :param video_start_time_dt: 视频开始时间（datetime对象）
+    :param events:              事件列表，每个事件包含 frame_time
+    """
     result = {
         "video_start_time": video_start_time_dt.strftime("%Y-%m-%d %H:%M:%S"),
         "events": []
@@ -122,13 +324,17 @@ def detect_motion_in_video(
             "frame_time": e["frame_time"],       # 保留相对帧时间
             "real_time": real_timestamps         # 可选，转换为真实时间
         })
+    return result
 
-    # 保存到JSON文件
+
+def save_motion_result(video_path, output_json_dir, result):
+    """
+    保存到JSON文件，文件名与视频同名。
+    :return: JSON文件路径
+    """
     video_name = os.path.splitext(os.path.basename(video_path))[0]
     output_json_path = os.path.join(output_json_dir, f"{video_name}.json")
 
     with open(output_json_path, 'w', encoding='utf-8') as f:
         json.dump(result, f, ensure_ascii=False, indent=2)
-
-    print(f"检测完成，结果已保存至: {output_json_path}")
     return output_json_path
@@ -17,19 +17,50 @@ class CameraConfig:
     # 摄像头配置
     camera_id = 0
 
+class SupervisorConfig:
+    # 多路录制：每路视频源运行在独立的录制进程中，录像保存在 video_dir/名称/ 下
+    # 每项为 {'name': 名称, 'source': RTSP/HTTP 地址、摄像头编号或视频文件路径, 'cpus': 可选的 CPU 编号列表}
+    # 为空时在主进程内录制 CameraConfig.camera_id
+    sources = []
+    cpu_affinity = True  # 是否为录制进程绑定 CPU，未指定 cpus 的视频源按顺序轮流分配
+    reserved_cpus = 1  # 自动分配时留给主进程（Flask、检索、描述）的 CPU 数
+    restart_backoff_s = 1  # 录制进程退出后首次重启前的等待时间，秒，之后每次加倍
+    restart_backoff_max_s = 60  # 重启等待时间上限，秒
+    restart_backoff_reset_s = 300  # 录制进程连续运行超过此时间后退出，重启等待时间从头计算
+    heartbeat_interval_s = 5  # 录制进程上报状态的间隔，秒
+    heartbeat_timeout_s = 30  # 超过此时间未收到状态时视为卡死并重启
+    stop_timeout_s = 15  # 停止时等待录制进程退出的时间，超时后强制结束
+
 class VideoRecordingConfig:
     cold_start_wait_s = 10  # 冷启动等待时间，秒
 
     video_motion_detect_interval_ms = 500  # 运动检测间隔，毫秒
     video_dir = 'data'  # 视频保存目录
     video_cache_duration_s = 10  # 视频缓存时长，秒
-    video_fps = 30  # 视频帧率
+    video_fps = 30  # 视频帧率；录像帧率跟随视频源实测帧率，无法测得时使用此值
     video_size = [1920, 1080]  # 视频分辨率
+    video_aspect_mode = 'letterbox'  # 视频源宽高比与录像分辨率不一致时：'letterbox' 等比缩放加黑边，'stretch' 直接拉伸
     video_codec = 'mp4v'  # 视频编码器，尝试 'mp4v', 'X264', 'avc1' 等
-    video_bitrate_mbps = 4  # 视频码率，Mbps
+    video_bitrate_mbps = 4  # 视频码率，Mbps，仅 ffmpeg 写入后端生效
+    video_gop = 60  # 关键帧间隔，帧，仅 ffmpeg 写入后端生效
     video_recording_window_s = 10  # 无运动后继续录制的时间窗口，秒
     min_motion_area = 500  # 运动检测的最小区域，像素面积
 
+    # 预录缓存
+    preroll_mode = 'raw'  # 'raw' 保存原始帧；'jpeg' 逐帧JPEG压缩保存，开始录制时再解码写入，内存约为原始帧的 1/10 以下
+    preroll_jpeg_quality = 80  # 'jpeg' 模式的压缩质量
+    preroll_raw_buffer_s = 2  # 'jpeg' 模式下另外保留的原始帧时长，秒，供实时画面和运动检测使用
+
+    # 录像写入线程
+    writer_queue_size = 240  # 写入队列容量，帧；开始录制时预录帧写入期间新帧在队列中等待，jpeg 预录模式下积压的帧压缩后入队
+    writer_put_timeout_ms = 0  # 队列满时采集线程最多等待的毫秒数，0 表示立即丢弃该帧
+
+    # 录像编码后端
+    video_writer_backend = 'opencv'  # 'opencv' 使用 cv2.VideoWriter（video_codec）；'ffmpeg' 通过管道交给 ffmpeg 进程编码（需自行开启），ffmpeg 不可用时自动回退到 'opencv'
+    ffmpeg_path = None  # ffmpeg 可执行文件路径，None 时从 PATH 查找，其次使用 imageio-ffmpeg 附带的 ffmpeg
+    ffmpeg_codec = 'libx264'  # 'libx264' 或 'libx265'
+    ffmpeg_preset = 'ultrafast'  # 编码预设，越快CPU占用越低；单核上 1080p30 实时编码需要 'ultrafast'，CPU 充足时可用 'superfast'、'veryfast'
+
     # 运动检测灵敏度参数
     motion_bg_history = 300  # 背景建模历史帧数
     motion_bg_varThreshold = 50  # 背景减除的方差阈值
@@ -37,13 +68,34 @@ class VideoRecordingConfig:
     motion_thresh_val = 250  # 阈值化的阈值值
     motion_dilate_iterations = 3  # 膨胀操作的迭代次数
 
+class PreviewConfig:
+    # 实时画面：录制器按 fps 把缩小后的画面编码为JPEG，写入共享内存，所有浏览器共用同一份编码结果
+    fps = 5  # 实时画面帧率
+    width = 640  # 实时画面宽度，高度按视频源宽高比计算
+    jpeg_quality = 70  # JPEG编码质量
+    buffer_kb = 512  # 每路共享内存中JPEG数据的容量，KB，超出的画面被丢弃
+    idle_timeout_s = 5  # 超过此时间没有浏览器观看时停止编码
+
 class VideoConfig:
     motion_threshold = 0.05
     min_interval_ms = 500
     max_silence_s = 2
     image_quality = 90
 
+    # 离线运动分析参数，分析宽度、步长和掩码仅在 fast 模式下生效
+    motion_analysis_mode = 'full'  # 'full' 为原始全分辨率分析；'fast' 为下采样灰度分析，速度更快但检测结果与 'full' 不同，需自行开启
+    motion_analysis_width = 480  # 下采样后的分析宽度，像素，高度按比例计算
+    motion_analysis_stride = 1  # 分析步长，每隔多少帧分析一帧
+    motion_roi_mask_path = None  # 感兴趣区域掩码图片路径（非零像素为分析区域），None 表示全画面
+
+    # 帧提取参数
+    extract_mode = 'sequential'  # 'sequential' 为顺序解码一次提取，'seek' 为逐帧定位
+    extract_seek_threshold_frames = 250  # 与下一目标帧距离超过此帧数时才定位，约等于关键帧间隔
+    save_event_frames = True  # 合并检测提取时是否将事件帧保存为JPEG，关闭后帧仅在内存中交给描述阶段
+
 class LLMConfig:
+    # 模型服务地址，None 时使用 OLLAMA_HOST 环境变量或默认地址
+    ollama_host = None
     # 文本模型
     long_text_model = 'qwen2.5:7b'
     long_text_prompt = ('请基于这些从同一段监控视频中抽取的帧画面的文字描述，'
@@ -59,6 +111,12 @@ class LLMConfig:
     # visual_model = 'llava:7b'
     visual_prompt = ('describe this surveillance image in the third person, '
                      'focus on objects, animals, humans, ')
+    visual_max_in_flight = 4  # 同时进行的视觉模型请求数
+    visual_timeout_s = 120  # 单个视觉模型请求超时，秒
+    visual_max_retries = 2  # 请求失败后的重试次数
+    visual_batch_size = 1  # 每个请求包含的图片数，仅支持多图输入的模型（如 llava）可大于 1
+    visual_input_max_side = 378  # 图片发送前缩放到的最长边，与视觉模型输入尺寸一致（moondream 为 378，llava 为 336）
+    visual_image_quality = 85  # 图片缩放后的JPEG编码质量
     # 嵌入模型
     embedding_model = 'qwen2.5:7b'
     # 提问模型
@@ -73,6 +131,25 @@ class LLMConfig:
                     '如果查询仅限于几天内，则使用昨天、前天、XX号这样的词。'
                     '如果查询跨越了月份，则使用具体日期。'
                     '注意总字数不要超过100字。尽可能简短容易理解。"')
+    # 时段汇总模型
+    rollup_model = 'qwen2.5:7b'
+    rollup_prompt = ('请基于这些按时间顺序排列的监控事件描述，'
+                     '用几句话概括这段时间内发生的主要事情，保留出现的人、动物、车辆和关键动作，'
+                     '不要包含任何背景信息、格式，'
+                     '不要包含画面、图片、镜头、视频等词语，'
+                     '只输出连续一段话即可。')
+
+class VisualCacheConfig:
+    # 视觉模型描述缓存
+    enabled = True
+    cache_path = 'data/cache/visual_descriptions.json'  # 缓存持久化文件
+    max_entries = 10000  # 最大缓存条数，超出后按最近最少使用淘汰
+    hash_size = 32  # 差值哈希的网格边长，哈希为 hash_size² 位；网格过粗时人形大小的目标进入 1080p 画面时哈希几乎不变
+    # 感知哈希汉明距离不超过此值视为近似重复画面（噪声、重新编码），0 表示仅精确匹配；
+    # 仅在 hash_size 不小于 32 时生效，此时噪声和重新编码约改变 0-6 位，1080p 画面中 100x200 的目标改变 7 位以上，
+    # 50x100 的小目标偶尔低于阈值，见 test/llm/visual_cache_benchmark.py
+    hamming_threshold = 5
+    save_every = 20  # 每新增多少条写盘一次
 
 class LogConfig:
     log_dir = "logs"
@@ -83,12 +160,74 @@ class LogConfig:
 class RAGConfig:
     # 搜索结果数量
     top_k = 5
+    # 检索模式：'vector' 仅向量检索（默认，与原实现相同），'lexical' 仅关键词检索，'hybrid' 两者融合（需自行开启）
+    search_mode = 'vector'
+    # 查询不超过此字数且关键词检索结果足够时，跳过嵌入模型直接返回关键词结果
+    lexical_fast_path_max_chars = 4
+    # 融合时关键词检索与向量检索的权重
+    lexical_weight = 1.0
+    vector_weight = 1.0
+    # BM25 参数
+    bm25_k1 = 1.2
+    bm25_b = 0.75
 
 class DaemonConfig:
     scan_interval_s = 1
 
+class LiveEventConfig:
+    # 录制器实时事件配置
+    enabled = False  # 是否由录制器直接发布事件（需自行开启），启用后录制器生成的视频不再做事后重扫
+    queue_size = 64  # 事件队列容量，满时丢弃新事件
+    keyframe_interval_s = 2  # 事件期间关键帧采样间隔，秒
+    max_keyframes = 8  # 每个事件最多采样的关键帧数
+    thumbnail_dir = 'data/live'  # 实时事件缩略图保存目录（位于 video_dir 下以便前端访问）
+    image_quality = 90  # 缩略图JPEG编码质量
+    save_thumbnail = True  # 是否保存事件缩略图，关键帧本身直接以内存数组交给视觉模型
+
+class EventFeedConfig:
+    # 事件列表：事件按加入顺序编号并只序列化一次，浏览器通过 /events/stream 或 /events?since= 只获取新增事件
+    page_limit = 200  # /events?since= 未指定 limit 时每页的事件数，事件流每次最多发送的事件数
+    max_page_limit = 1000  # limit 参数上限
+    keepalive_s = 15  # 事件流没有新事件时发送注释行的间隔，秒，同时用于发现已断开的连接
+    retry_ms = 3000  # 事件流断开后浏览器重连前的等待时间，毫秒
+
+class EventCatalogConfig:
+    # 事件目录：页面事件列表和已处理的视频持久化在 SQLite 中，按事件ID、摄像头、起止时间和视频路径建立索引，重启后无需重新加载视频
+    db_path = 'data/database/events.sqlite3'
+
+class IngestConfig:
+    # 存量视频并行入库配置
+    cpu_workers = max(1, (os.cpu_count() or 2) - 1)  # 运动检测与帧提取的进程数
+    describe_workers = 2  # 同时进行描述生成的视频数（受模型服务能力限制）
+
 class ChromaDBConfig:
     persist_dir = 'data/database'
+    batch_size = 256  # 批量查询和写入的每批事件数
+
+class RollupConfig:
+    # 按摄像头的每小时/每日事件汇总
+    enabled = False  # 默认关闭：汇总需要额外调用 LLM，按需开启
+    db_path = 'data/database/rollups.sqlite3'  # 汇总只按时间范围读取，存放在 SQLite 中，不计算嵌入向量
+    default_camera = 'default'  # 事件元数据中没有 camera 字段时归属的摄像头
+    refresh_interval_s = 60  # 后台检查待更新时段的间隔，秒
+    settle_s = 120  # 时段最后一次收到新事件后等待多久再重新汇总，避免频繁重算
+    max_events_per_summary = 40  # 每次汇总最多输入的事件描述数，超出时均匀抽样
+    route_min_span_h = 6  # 查询时间范围不短于此小时数且为概括性问题时使用汇总回答
+    day_route_min_span_h = 48  # 查询时间范围不短于此小时数时使用每日汇总，否则使用每小时汇总
+    max_rollups = 31  # 每次查询最多使用的汇总条数
+
+class AnswerCacheConfig:
+    # 查询回答缓存
+    enabled = False  # 默认关闭：相同问题与检索结果复用回答，按需开启
+    max_entries = 256  # 最大缓存条数，超出后按最近最少使用淘汰
+    ttl_s = 3600  # 缓存有效期，秒
+    stream_chunk_chars = 8  # 流式返回缓存回答时每段的字数
+
+class EmbeddingCacheConfig:
+    # 嵌入向量缓存
+    enabled = True
+    cache_path = 'data/cache/embeddings.sqlite3'  # 持久化缓存文件
+    memory_entries = 1024  # 内存 LRU 缓存条数，用于高频查询
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+# frontend/app_asgi.py
+
+import threading
+from contextlib import asynccontextmanager
+
+import uvicorn
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from backend.live.event_feed import parse_cursor
+from backend.rag.search_vdb_for_llm import rag_query_async
+from frontend import app_flask
+from logger import logger
+
+# 其余 Flask 路由（页面、事件列表、视频文件）使用的线程数
+WSGI_WORKERS = 16
+
+
+async def video_feed(request):
+    """实时视频流路由，与 Flask 版本相同：camera 参数指定视频源名称，默认第一路"""
+    camera = request.query_params.get('camera')
+    channels = app_flask.preview_channels
+    channel = channels.get(camera) if camera else next(iter(channels.values()), None)
+    if channel is None:
+        return JSONResponse({'error': f'未知的视频源: {camera}'}, status_code=404)
+    return StreamingResponse(generate_video_frames(channel),
+                             media_type='multipart/x-mixed-replace; boundary=frame')
+
+
+async def generate_video_frames(channel):
+    """每个新画面发送一次，浏览器断开时生成器被取消并注销连接"""
+    async for frame in channel.aframes():
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+
+
+async def events_stream(request):
+    """事件列表的 Server-Sent Events 流，与 Flask 版本相同；连接在事件循环中等待新事件"""
+    try:
+        cursor = parse_cursor(request.headers.get('last-event-id') or request.query_params.get('since'))
+    except ValueError as e:
+        return JSONResponse({'error': f'参数错误: {e}'}, status_code=400)
+    return StreamingResponse(app_flask.event_feed.astream(cursor), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def generate_response(request):
+    """
+    接收用户查询并流式返回回答，与 Flask 版本相同；检索在线程池中进行，模型输出由异步客户端读取。
+    """
+    form = await request.form()
+    user_query = form.get('query')
+    if not user_query:
+        return JSONResponse({'error': '查询内容不能为空'}, status_code=400)
+
+    logger.info(f'接收到用户查询: {user_query}, 流式传输: True')
+
+    async def generate():
+        try:
+            text_response, _ = await rag_query_async(user_query, with_video_list=True)
+            async for part in text_response:
+                yield part
+        except Exception as e:
+            logger.error(f"流式响应时发生错误: {e}")
+            yield f"Error: {e}"
+    return StreamingResponse(generate(), media_type='text/plain')
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # 与 Flask 模式相同，在后台线程中启动录制和加载视频数据
+    init_thread = threading.Thread(target=app_flask.initialize_recorder_and_data, daemon=True)
+    init_thread.start()
+    yield
+
+
+# 长连接路由由事件循环处理，其余路由交给 Flask 应用
+app = Starlette(
+    routes=[
+        Route('/video_feed', video_feed),
+        Route('/events/stream', events_stream),
+        Route('/generate_response', generate_response, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(app_flask.app, workers=WSGI_WORKERS)),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -6,8 +6,15 @@ import time
 from datetime import datetime
 from flask import Flask, Response, render_template, request, jsonify, send_file, send_from_directory
 from backend.source.camera.recording import start_camera_recording, VideoRecordingConfig
+from backend.source.supervisor import SUPERVISOR_SOURCES, camera_video_dirs, normalize_sources, start_recorder_supervisor
+from backend.source.preview_bus import PreviewChannel
 from backend.rag.search_vdb_for_llm import rag_query
-from backend.data.dataloader import VideoDataLoader
+from backend.rag.rollup import ROLLUP_ENABLED, start_rollup_updater
+from backend.vdb.vector_database import vdb_backfill_time_fields
+from backend.vdb.event_catalog import get_event_catalog
+from backend.ingest.ingest import ingest_videos
+from backend.live.live_events import LIVE_EVENT_ENABLED, is_live_video, start_live_event_describer
+from backend.live.event_feed import EventFeed, parse_cursor, parse_limit
 from logger import logger
 from config import GlobalConfig
 
@@ -15,136 +22,152 @@ app = Flask(__name__)
 
 # 全局变量
 recorder = None
-video_objects = []
-events = []
-events_lock = threading.Lock()
+live_describer = None
+rollup_updater = None
+preview_channels = {}  # 视频源名称 -> PreviewChannel，所有浏览器共用
+event_feed = EventFeed(get_event_catalog())  # 全局事件列表，保存在事件目录中
 
 def initialize_recorder_and_data():
-    global recorder, video_objects, events
+    global recorder, live_describer, rollup_updater, preview_channels
 
-    # 启动摄像头录制
-    recorder = start_camera_recording()
-    if recorder is None:
-        logger.error("无法启动摄像头录制。")
-        exit(1)
+    # 启动实时事件描述线程，录制器结束录制后立即生成描述
+    if LIVE_EVENT_ENABLED:
+        live_describer = start_live_event_describer(on_described=add_live_event)
+
+    # 启动时段汇总线程，只重新汇总收到新事件的小时和日期
+    if ROLLUP_ENABLED:
+        rollup_updater = start_rollup_updater()
+
+    # 启动录制：配置了多路视频源时每路一个录制进程，否则在本进程内录制摄像头
+    if SUPERVISOR_SOURCES:
+        recorder = start_recorder_supervisor()
+        logger.info(f"多路录制已启动，共 {len(SUPERVISOR_SOURCES)} 路视频源")
+    else:
+        recorder = start_camera_recording()
+        if recorder is None:
+            logger.error("无法启动摄像头录制。")
+            exit(1)
+        else:
+            logger.info("摄像头录制已启动，并在后台运行")
+
+    if SUPERVISOR_SOURCES:
+        preview_channels = {name: PreviewChannel(preview) for name, preview in recorder.previews.items()}
     else:
-        logger.info("摄像头录制已启动，并在后台运行")
+        preview_channels = {'camera': PreviewChannel(recorder.preview)}
 
     # 初始化视频数据
-    data_dir = GlobalConfig.data_dir
     try:
-        video_files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith('.mp4')]
+        video_files = list_video_files()
         logger.info(f'已发现 {len(video_files)} 个视频文件')
         logger.debug(f'已发现视频文件 {video_files}')
     except Exception as e:
         logger.error(f'无法找到视频文件! 错误: {e}')
         raise FileNotFoundError
 
-    for video_file in video_files:
-        # 加载视频数据
-        video_obj = VideoDataLoader(video_file, auto_process=False, reprocess=False)
-        if not video_obj.detected:
-            # 视频未检测过运动
-            logger.info(f'正在检测视频 {video_obj.video_name} 的运动')
-            video_obj._detect_motion()
-            logger.info(f'视频 {video_obj.video_name} 运动检测完毕')
-        if not video_obj.extracted:
-            # 视频未提取过帧
-            logger.info(f'正在提取视频 {video_obj.video_name} 的帧')
-            video_obj._extract_frames()
-            logger.info(f'视频 {video_obj.video_name} 提取帧完毕')
-        if not video_obj.described:
-            # 视频未生成过描述
-            logger.info(f'正在生成视频 {video_obj.video_name} 的描述')
-            video_obj._generate_descriptions()
-            logger.info(f'视频 {video_obj.video_name} 生成描述完毕')
-
-        video_obj.add_event_to_database()
-        video_objects.append(video_obj)
-
-    # 构建全局事件列表
-    for vo in video_objects:
-        for event in vo.events:
-            # 确保 event.start_time 和 event.end_time 是 datetime 对象
-            if isinstance(event.start_time, datetime) and isinstance(event.end_time, datetime):
-                formatted_start = event.start_time.strftime('%Y年%m月%d日 %H时%M分%S秒')
-                formatted_end = event.end_time.strftime('%Y年%m月%d日 %H时%M分%S秒')
-            else:
-                # 如果时间字段是字符串，尝试解析为 datetime 对象
-                try:
-                    start_dt = datetime.strptime(event.start_time, '%Y-%m-%d %H:%M:%S.%f')
-                    end_dt = datetime.strptime(event.end_time, '%Y-%m-%d %H:%M:%S.%f')
-                    formatted_start = start_dt.strftime('%Y年%m月%d日 %H时%M分%S秒')
-                    formatted_end = end_dt.strftime('%Y年%m月%d日 %H时%M分%S秒')
-                except ValueError:
-                    logger.error(f"时间格式错误: {event.start_time}, {event.end_time}")
-                    formatted_start = str(event.start_time)
-                    formatted_end = str(event.end_time)
-
-            events.append({
-                'video_name': vo.video_name,
-                'thumbnail_path': event.thumbnail_path,
-                'description': event.description,
-                'start_time': formatted_start,
-                'end_time': formatted_end,
-                'video_path': vo.video_path,
-                'event_id': event.event_id  # 确保 event_id 存在
-            })
+    # 事件目录中已记录的视频无需重新加载，其余视频并行处理（运动检测、帧提取、描述生成），已完成的阶段会被跳过
+    processed_files = event_feed.catalog.video_paths()
+    video_files = [f for f in video_files if not is_live_video(f) and f not in processed_files]
+    logger.info(f'事件目录中已有 {len(processed_files)} 个视频，待处理 {len(video_files)} 个')
+    for vo in ingest_videos(video_files):
+        event_feed.extend(video_events(vo), video_paths=[vo.video_path])
+    # 旧数据补充时间字段，以支持按时间范围检索
+    vdb_backfill_time_fields()
 
     # 启动后台线程扫描新视频
     scan_thread = threading.Thread(target=scan_new_videos, daemon=True)
     scan_thread.start()
 
+def add_live_event(live_event, description, thumbnail_path):
+    """
+    实时事件描述完成后加入全局事件列表。
+    """
+    # 录像同时记为已处理，重启后不再作为存量视频重新处理
+    event_feed.append(event_record(live_event.video_name, live_event.video_path, live_event.camera, live_event,
+                                   description=description, thumbnail_path=thumbnail_path),
+                      video_paths=[live_event.video_path])
+
+def parse_event_time(value):
+    """
+    :param value: datetime 或 '%Y-%m-%d %H:%M:%S.%f' 格式的字符串
+    :return: datetime，无法解析时返回 None
+    """
+    if isinstance(value, datetime):
+        return value
+    # 如果时间字段是字符串，尝试解析为 datetime 对象
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f')
+    except (TypeError, ValueError):
+        logger.error(f"时间格式错误: {value}")
+        return None
+
+def event_record(video_name, video_path, camera, event, description=None, thumbnail_path=None):
+    """
+    事件转换为事件列表条目：页面显示的字段，以及事件目录索引的摄像头和 epoch 秒起止时间。
+
+    :param event:          带 event_id、start_time、end_time 的事件对象
+    :param description:    事件描述，None 时使用 event.description
+    :param thumbnail_path: 缩略图路径，None 时使用 event.thumbnail_path
+    """
+    record = {
+        'video_name': video_name,
+        'thumbnail_path': thumbnail_path if thumbnail_path is not None else event.thumbnail_path,
+        'description': description if description is not None else event.description,
+        'video_path': video_path,
+        'event_id': event.event_id,  # 确保 event_id 存在
+        'camera': camera,
+    }
+    for key, value in (('start', event.start_time), ('end', event.end_time)):
+        parsed = parse_event_time(value)
+        record[f'{key}_time'] = parsed.strftime('%Y年%m月%d日 %H时%M分%S秒') if parsed else str(value)
+        record[f'{key}_ts'] = parsed.timestamp() if parsed else None
+    return record
+
+def video_events(video_obj):
+    """
+    视频中的事件转换为事件列表条目。
+    """
+    camera = video_camera(video_obj.video_path)
+    return [event_record(video_obj.video_name, video_obj.video_path, camera, event) for event in video_obj.events]
+
+def video_camera(video_path):
+    """
+    视频所在录像目录对应的视频源名称，不属于任何视频源时返回 None。
+    """
+    video_dir = os.path.abspath(os.path.dirname(video_path))
+    for spec in normalize_sources():
+        if os.path.abspath(spec['video_dir']) == video_dir:
+            return spec['name']
+    return None
+
+def list_video_files():
+    """
+    列出 data_dir 和各路视频源录像目录中的视频文件。
+    """
+    video_dirs = [GlobalConfig.data_dir] + (camera_video_dirs() if SUPERVISOR_SOURCES else [])
+    return [os.path.join(video_dir, f) for video_dir in video_dirs if os.path.isdir(video_dir)
+            for f in os.listdir(video_dir) if f.endswith('.mp4')]
+
 def scan_new_videos():
     """
     后台线程函数，每秒扫描一次 data_dir 是否有新视频文件。
     """
-    global events, video_objects, recorder
-    data_dir = GlobalConfig.data_dir
-    processed_files = set([vo.video_path for vo in video_objects])
+    global recorder
+    processed_files = event_feed.catalog.video_paths()
 
     while not recorder.stop_event.is_set():
         try:
-            current_files = set([os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith('.mp4')])
+            current_files = set(list_video_files())
             new_files = current_files - processed_files
+            # 录制器已通过实时事件处理的视频无需重扫
+            new_files = set(f for f in new_files if not is_live_video(f))
 
             if new_files:
                 logger.info(f'发现 {len(new_files)} 个新视频文件')
-                for video_file in sorted(new_files):  # 按文件名排序，旧的先处理
-                    logger.info(f'处理新视频文件: {video_file}')
-                    video_obj = VideoDataLoader(video_file, auto_process=True, reprocess=False)
-                    video_objects.append(video_obj)
-
-                    # 添加事件到全局列表
-                    with events_lock:
-                        for event in video_obj.events:
-                            # 确保 event.start_time 和 event.end_time 是 datetime 对象
-                            if isinstance(event.start_time, datetime) and isinstance(event.end_time, datetime):
-                                formatted_start = event.start_time.strftime('%Y年%m月%d日 %H时%M分%S秒')
-                                formatted_end = event.end_time.strftime('%Y年%m月%d日 %H时%M分%S秒')
-                            else:
-                                # 如果时间字段是字符串，尝试解析为 datetime 对象
-                                try:
-                                    start_dt = datetime.strptime(event.start_time, '%Y-%m-%d %H:%M:%S.%f')
-                                    end_dt = datetime.strptime(event.end_time, '%Y-%m-%d %H:%M:%S.%f')
-                                    formatted_start = start_dt.strftime('%Y年%m月%d日 %H时%M分%S秒')
-                                    formatted_end = end_dt.strftime('%Y年%m月%d日 %H时%M分%S秒')
-                                except ValueError:
-                                    logger.error(f"时间格式错误: {event.start_time}, {event.end_time}")
-                                    formatted_start = str(event.start_time)
-                                    formatted_end = str(event.end_time)
-
-                            events.append({
-                                'video_name': video_obj.video_name,
-                                'thumbnail_path': event.thumbnail_path,
-                                'description': event.description,
-                                'start_time': formatted_start,
-                                'end_time': formatted_end,
-                                'video_path': video_obj.video_path,
-                                'event_id': event.event_id  # 确保 event_id 存在
-                            })
-
-                    processed_files.add(video_file)
+                # 与存量视频相同的入库流程，运动检测和帧提取只解码一次；按文件名排序，旧的先处理
+                for video_obj in ingest_videos(sorted(new_files)):
+                    # 添加事件到全局列表，视频记为已处理
+                    event_feed.extend(video_events(video_obj), video_paths=[video_obj.video_path])
+                    processed_files.add(video_obj.video_path)
 
         except Exception as e:
             logger.error(f'扫描新视频文件时发生错误: {e}')
@@ -166,25 +189,57 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    """实时视频流路由"""
-    return Response(generate_video_frames(),
+    """实时视频流路由，camera 参数指定视频源名称，默认第一路"""
+    camera = request.args.get('camera')
+    channel = preview_channels.get(camera) if camera else next(iter(preview_channels.values()), None)
+    if channel is None:
+        return jsonify({'error': f'未知的视频源: {camera}'}), 404
+    return Response(generate_video_frames(channel),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
-def generate_video_frames():
-    """生成实时视频帧的生成器"""
-    while True:
-        frame = recorder.get_jpeg_frame()
-        if frame:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        else:
-            time.sleep(0.1)
+def generate_video_frames(channel):
+    """生成实时视频帧的生成器，每个新画面发送一次，JPEG 由录制器统一编码"""
+    for frame in channel.frames():
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+
+@app.route('/cameras')
+def get_cameras():
+    """多路录制时各录制进程的运行状态、帧率和写入统计"""
+    if not SUPERVISOR_SOURCES or recorder is None:
+        return jsonify({'cameras': {}, 'total_fps': 0, 'running': 0, 'total': 0})
+    return jsonify(recorder.stats())
 
 @app.route('/events')
 def get_events():
-    """获取事件列表的API路由"""
-    with events_lock:
-        return jsonify(events)
+    """
+    获取事件列表的API路由。不带参数时返回全部事件；
+    since 参数为已收到的最后一个游标，只返回更新的事件，每页最多 limit 个，
+    响应头 X-Events-Cursor 为本页最后一个事件的游标，用作下一次请求的 since。
+    """
+    try:
+        if 'since' in request.args or 'limit' in request.args:
+            cursor = parse_cursor(request.args.get('since'))
+            limit = parse_limit(request.args.get('limit'))
+        else:
+            cursor, limit = 0, None
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {e}'}), 400
+    body, cursor = event_feed.since(cursor, limit)
+    return Response(body, mimetype='application/json', headers={'X-Events-Cursor': str(cursor)})
+
+@app.route('/events/stream')
+def events_stream():
+    """
+    事件列表的 Server-Sent Events 流：先发送游标之后的事件，再推送新事件。
+    游标取自 Last-Event-ID 请求头（浏览器断线重连时自动携带）或 since 参数，默认从头发送。
+    """
+    try:
+        cursor = parse_cursor(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {e}'}), 400
+    return Response(event_feed.stream(cursor), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/generate_response', methods=['POST'])
 def generate_response():
@@ -203,7 +258,8 @@ def generate_response():
     logger.debug(f'流式传输已启用，将逐步返回结果')
     def generate():
         try:
-            for part in rag_query(user_query=user_query, with_video_list=True, stream=True):
+            text_response, _ = rag_query(user_query=user_query, with_video_list=True, stream=True)
+            for part in text_response:
                 yield part
         except Exception as e:
             logger.error(f"流式响应时发生错误: {e}")
@@ -216,7 +272,7 @@ def play_video(event_id):
     播放指定事件的视频，从事件开始时间播放。
     """
     # 查找事件
-    event = next((e for e in events if e['event_id'] == event_id), None)
+    event = event_feed.get(event_id)
     if not event:
         return "事件未找到", 404
 
@@ -0,0 +1,61 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.llm.visual import VisualExplainer
+
+# 本地模拟 Ollama 服务：每个请求固定延迟，支持多图请求
+REQUEST_DELAY_S = 0.2
+IMAGE_COUNT = 32
+IMAGE = b'\xff\xd8\xff\xe0fake-jpeg'
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        message = body['messages'][-1]
+        images = message.get('images') or []
+        time.sleep(REQUEST_DELAY_S)
+        if len(images) > 1:
+            content = '\n'.join(f'Image {i + 1}: a person walking' for i in range(len(images)))
+        else:
+            content = 'a person walking'
+        payload = json.dumps({
+            'model': body['model'],
+            'created_at': '2025-01-01T00:00:00Z',
+            'message': {'role': 'assistant', 'content': content},
+            'done': True,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOllamaHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+host = f'http://127.0.0.1:{server.server_address[1]}'
+print(f'模拟模型服务: {host}, 每请求延迟 {REQUEST_DELAY_S} s, 图片数 {IMAGE_COUNT}')
+
+cases = [
+    ('串行', dict(max_in_flight=1, batch_size=1)),
+    ('并发 4', dict(max_in_flight=4, batch_size=1)),
+    ('并发 8', dict(max_in_flight=8, batch_size=1)),
+    ('并发 4 + 每请求 4 图', dict(max_in_flight=4, batch_size=4)),
+]
+
+for name, kwargs in cases:
+    explainer = VisualExplainer(host=host, cache=None, **kwargs)
+    start = time.perf_counter()
+    responses = explainer.explain_many([IMAGE] * IMAGE_COUNT, show_progress=False)
+    elapsed = time.perf_counter() - start
+    explainer.close()
+    assert len(responses) == IMAGE_COUNT
+    print(f'{name:<20} {elapsed:6.2f} s  {IMAGE_COUNT / elapsed:6.1f} 图片/秒')
+
+server.shutdown()
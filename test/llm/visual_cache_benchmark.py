@@ -0,0 +1,66 @@
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+from backend.llm.visual_cache import VisualDescriptionCache, perceptual_hash
+
+# 视觉描述缓存的近似重复查找：同一画面加入传感器噪声并重新编码后应命中缓存，
+# 画面中出现人形大小的目标后应未命中；另统计缓存已有 10000 条时的查找耗时
+# 用法: PYTHONPATH=. python test/llm/visual_cache_benchmark.py
+IMAGE_DIR = os.path.join(os.path.dirname(__file__), 'images')
+FRAME_SIZE = (1920, 1080)
+VARIANTS = 10
+CACHE_ENTRIES = 10000
+NAMESPACE = 'benchmark'
+
+rng = np.random.default_rng(0)
+
+
+def noisy(image, amplitude=3, quality=80):
+    noise = rng.integers(-amplitude, amplitude + 1, image.shape, dtype=np.int16)
+    frame = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return cv2.imdecode(cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])[1], cv2.IMREAD_COLOR)
+
+
+def with_object(image, width, height):
+    frame = noisy(image)
+    x = int(rng.integers(0, FRAME_SIZE[0] - width))
+    y = int(rng.integers(0, FRAME_SIZE[1] - height))
+    # 与所在区域反差明显的目标，避免深色目标落在深色区域中不可见
+    color = 255 if frame[y:y + height, x:x + width].mean() < 128 else 0
+    cv2.rectangle(frame, (x, y), (x + width, y + height), (color, color, color), -1)
+    return frame
+
+
+cache = VisualDescriptionCache(cache_path=None, max_entries=CACHE_ENTRIES * 2)
+random.seed(0)
+for _ in range(CACHE_ENTRIES):
+    cache.put(NAMESPACE, random.getrandbits(cache.hash_size ** 2), 'unrelated')
+
+images = {}
+for name in sorted(os.listdir(IMAGE_DIR)):
+    image = cv2.resize(cv2.imread(os.path.join(IMAGE_DIR, name)), FRAME_SIZE)
+    images[name] = image
+    cache.put(NAMESPACE, perceptual_hash(image), name)
+
+print(f'hash_size {cache.hash_size}, 汉明距离阈值 {cache.hamming_threshold}, 缓存 {len(cache.entries)} 条')
+cases = (
+    ('噪声并重新编码', lambda image: noisy(image), True),
+    ('出现 50x100 的目标', lambda image: with_object(image, 50, 100), False),
+    ('出现 100x200 的目标', lambda image: with_object(image, 100, 200), False),
+)
+for label, make, expect_hit in cases:
+    hits = 0
+    lookup_s = 0.0
+    for name, image in images.items():
+        for _ in range(VARIANTS):
+            phash = perceptual_hash(make(image))
+            start = time.perf_counter()
+            hits += cache.get(NAMESPACE, phash) == name
+            lookup_s += time.perf_counter() - start
+    total = len(images) * VARIANTS
+    print(f'{label:<16} 命中 {hits}/{total} (期望{"命中" if expect_hit else "未命中"}), '
+          f'查找 {lookup_s / total * 1e6:6.1f} us')
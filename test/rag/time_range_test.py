@@ -0,0 +1,49 @@
+import sys
+from datetime import datetime
+
+from backend.rag.time_range import parse_time_range
+
+# 时间范围解析的边界情况：晚上/夜里12点、没有时段的钟点、只有时段没有日期等
+# 用法: PYTHONPATH=. python test/rag/time_range_test.py
+NOW = datetime(2025, 3, 12, 15, 30)  # 星期三下午
+
+
+def at(day, hour, minute=0):
+    return datetime(2025, 3, day, hour, minute)
+
+
+CASES = [
+    # (查询, 当前时间, 期望的 (开始, 结束))
+    ('昨天晚上12点有人吗', NOW, (at(12, 0), at(12, 1))),
+    ('今天夜里12点', datetime(2025, 3, 12, 23, 0), (at(13, 0), at(13, 1))),
+    ('晚上12点门口有人吗', datetime(2025, 3, 12, 23, 0), (at(12, 0), at(12, 1))),
+    ('凌晨12点', NOW, (at(12, 0), at(12, 1))),
+    ('中午12点', NOW, (at(12, 12), at(12, 13))),
+    ('今天三点', NOW, (at(12, 15), NOW)),
+    ('今天三点', datetime(2025, 3, 12, 10, 0), (at(12, 3), at(12, 4))),
+    ('3点有人来过吗', NOW, (at(12, 15), NOW)),
+    ('3点有人来过吗', datetime(2025, 3, 12, 2, 0), (at(11, 15), at(11, 16))),
+    ('10点左右', NOW, (at(12, 10), at(12, 11))),
+    ('昨天三点', NOW, (at(11, 15), at(11, 16))),
+    ('今天凌晨三点', NOW, (at(12, 3), at(12, 4))),
+    ('下午3点', NOW, (at(12, 15), NOW)),
+    ('昨天15点', NOW, (at(11, 15), at(11, 16))),
+    ('昨晚11点', NOW, (at(11, 23), at(12, 0))),
+    ('晚上有人吗', NOW, (at(11, 18), at(12, 0))),
+    ('昨天下午', NOW, (at(11, 12), at(11, 18))),
+    ('今天上午', NOW, (at(12, 6), at(12, 12))),
+    ('今天下午', NOW, (at(12, 12), NOW)),
+    ('最近一小时', NOW, (at(12, 14, 30), NOW)),
+    ('有一点奇怪', NOW, None),
+]
+
+failed = 0
+for query, now, expected in CASES:
+    result = parse_time_range(query, now=now)
+    ok = result == expected
+    failed += not ok
+    print(f'{"OK  " if ok else "FAIL"} {query:<12} 当前 {now:%m-%d %H:%M} -> '
+          f'{result and tuple(f"{dt:%m-%d %H:%M}" for dt in result)}'
+          + ('' if ok else f', 期望 {expected and tuple(f"{dt:%m-%d %H:%M}" for dt in expected)}'))
+print(f'{len(CASES) - failed}/{len(CASES)} 通过')
+sys.exit(1 if failed else 0)
@@ -0,0 +1,75 @@
+import os
+import random
+import tempfile
+import time
+
+from backend.vdb.event_catalog import EventCatalog
+
+# 事件查找的耗时：原实现在全局事件列表中线性查找（/play_video 按 event_id、按时间范围统计），
+# 事件目录在 SQLite 中按索引查找；另统计重启时打开事件目录并读取已处理视频列表的耗时
+# 用法: PYTHONPATH=. python test/vdb/event_catalog_benchmark.py
+SCENARIOS = (10000, 100000)
+EVENTS_PER_VIDEO = 5
+LOOKUPS = 2000
+START_TS = 1735689600  # 2025-01-01
+
+
+def make_events(count):
+    events = []
+    for i in range(count):
+        start_ts = START_TS + i * 60
+        video = i // EVENTS_PER_VIDEO
+        events.append({
+            'video_name': f'camera_{video:06d}',
+            'thumbnail_path': f'/data/cache/thumbnails/camera_{video:06d}_{i}.jpg',
+            'description': '一名穿深色外套的男子在门口停留约十秒后离开',
+            'start_time': '2025年01月01日 08时00分00秒',
+            'end_time': '2025年01月01日 08时00分30秒',
+            'video_path': f'data/camera_{video:06d}.mp4',
+            'event_id': START_TS * 1000 + i,
+            'camera': f'camera{i % 4}',
+            'start_ts': start_ts,
+            'end_ts': start_ts + 30,
+        })
+    return events
+
+
+def per_call_us(func, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+for count in SCENARIOS:
+    events = make_events(count)
+    db_path = os.path.join(tempfile.mkdtemp(prefix='event_catalog_bench_'), 'events.sqlite3')
+    catalog = EventCatalog(db_path)
+    start = time.perf_counter()
+    for offset in range(0, count, EVENTS_PER_VIDEO):
+        batch = events[offset:offset + EVENTS_PER_VIDEO]
+        catalog.add_events(batch, video_paths=[batch[0]['video_path']])
+    insert_s = time.perf_counter() - start
+    catalog.close()
+
+    start = time.perf_counter()
+    catalog = EventCatalog(db_path)
+    video_paths = catalog.video_paths()
+    open_s = time.perf_counter() - start
+
+    rng = random.Random(0)
+    ids = [(events[rng.randrange(count)]['event_id'],) for _ in range(LOOKUPS)]
+    ranges = []
+    for _ in range(LOOKUPS // 10):
+        start_ts = START_TS + rng.randrange(count) * 60
+        ranges.append((start_ts, start_ts + 86400))
+
+    list_get = per_call_us(lambda event_id: next((e for e in events if e['event_id'] == event_id), None), ids)
+    catalog_get = per_call_us(catalog.get, ids)
+    list_count = per_call_us(lambda s, e: sum(1 for x in events if x['start_ts'] < e and x['end_ts'] >= s), ranges)
+    catalog_count = per_call_us(catalog.count_between, ranges)
+    catalog.close()
+
+    print(f'{count} 个事件 ({len(video_paths)} 个视频): 逐视频写入 {insert_s:.2f} 秒, 重启打开 {open_s * 1000:.1f} ms')
+    print(f'  按 event_id 查找  列表 {list_get:9.1f} us, 事件目录 {catalog_get:7.1f} us')
+    print(f'  统计一天内事件数  列表 {list_count:9.1f} us, 事件目录 {catalog_count:7.1f} us')
@@ -0,0 +1,66 @@
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_ollama import OllamaEmbeddings
+
+from backend.vdb.vector_database import vdb_add_events, vdb_search_event, get_lexical_index
+from config import LLMConfig
+
+# 合成事件语料：每个事件随机组合主体、动作和地点
+EVENT_COUNT = 20000
+TOP_K = 5
+SUBJECTS = ['快递员', '一只猫', '一条狗', '小孩', '老人', '一辆汽车', '外卖员', '邻居', '保安', '自行车']
+ACTIONS = ['经过', '停留了一会儿', '放下了包裹', '来回走动', '按了门铃', '离开了', '在门口等待', '跑过']
+PLACES = ['门口', '院子里', '走廊', '车库前', '楼梯口', '窗户外']
+QUERIES = {'快递': '快递员', '猫': '一只猫', '狗': '一条狗', '有狗吗': '一条狗', '外卖': '外卖员', '保安': '保安',
+           '汽车': '一辆汽车'}
+
+random.seed(0)
+base_time = datetime(2025, 1, 1)
+texts, metadatas = [], []
+for i in range(EVENT_COUNT):
+    start = base_time + timedelta(minutes=7 * i)
+    texts.append(f'{random.choice(SUBJECTS)}{random.choice(ACTIONS)}，位置在{random.choice(PLACES)}。')
+    metadatas.append({'video_name': f'video_{i}', 'start_time': start, 'end_time': start + timedelta(minutes=2)})
+
+
+def measure(store, mode, label):
+    hits, latencies = 0, []
+    for query, keyword in QUERIES.items():
+        start = time.perf_counter()
+        results = vdb_search_event(query, k=TOP_K, store=store, mode=mode)
+        latencies.append(time.perf_counter() - start)
+        hits += sum(keyword in doc.page_content for doc in results)
+    precision = hits / (TOP_K * len(QUERIES))
+    print(f'{label:<24} 前{TOP_K}命中率 {precision:6.1%}  平均延迟 {1000 * sum(latencies) / len(latencies):8.2f} ms')
+
+
+persist_dir = tempfile.mkdtemp(prefix='hybrid_bench_')
+try:
+    embeddings = OllamaEmbeddings(model=LLMConfig.embedding_model)
+    embeddings.embed_query('测试')
+    use_real_embeddings = True
+    corpus_size = 2000  # 真实嵌入模型较慢，使用较小语料
+except Exception as e:
+    print(f'无法连接嵌入模型，向量检索使用确定性假嵌入（命中率无参考意义，仅测量延迟）: {e}')
+    embeddings = DeterministicFakeEmbedding(size=256)
+    use_real_embeddings = False
+    corpus_size = EVENT_COUNT
+
+store = Chroma(collection_name='video_events', embedding_function=embeddings, persist_directory=persist_dir)
+vdb_add_events(texts[:corpus_size], metadatas[:corpus_size], store=store)
+
+start = time.perf_counter()
+get_lexical_index(store)
+print(f'语料 {corpus_size} 个事件，关键词索引构建 {time.perf_counter() - start:.2f} s')
+
+measure(store, 'lexical', '关键词 (BM25)')
+measure(store, 'vector', '向量')
+measure(store, 'hybrid', '融合（短查询走快速路径）')
+
+shutil.rmtree(persist_dir, ignore_errors=True)
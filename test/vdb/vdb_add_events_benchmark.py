@@ -0,0 +1,53 @@
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend.vdb.vector_database import vdb_add_events, vdb_reindex_all
+
+# 使用临时目录和确定性假嵌入，只测量数据库查重与写入的吞吐
+EVENT_COUNT = 5000
+
+persist_dir = tempfile.mkdtemp(prefix='vdb_bench_')
+store = Chroma(
+    collection_name='video_events',
+    embedding_function=DeterministicFakeEmbedding(size=256),
+    persist_directory=persist_dir,
+)
+
+base_time = datetime(2025, 1, 1)
+events = []
+for i in range(EVENT_COUNT):
+    start = base_time + timedelta(minutes=i)
+    events.append((f'事件 {i}: 有人经过门口', {
+        'video_name': f'video_{i // 10}',
+        'start_time': start,
+        'end_time': start + timedelta(seconds=30),
+    }))
+
+print(f'临时数据库: {persist_dir}, 事件数 {EVENT_COUNT}')
+
+# 首次写入
+start = time.perf_counter()
+total, added = vdb_reindex_all(events, store=store)
+elapsed = time.perf_counter() - start
+print(f'批量首次写入     {elapsed:6.2f} s  {total / elapsed:8.1f} 事件/秒  新增 {added}')
+
+# 重复重建索引（全部已存在）
+start = time.perf_counter()
+total, added = vdb_reindex_all(events, store=store)
+elapsed = time.perf_counter() - start
+print(f'批量重复重建     {elapsed:6.2f} s  {total / elapsed:8.1f} 事件/秒  新增 {added}')
+
+# 逐个事件调用（每次一次ID查询），对应原先每个事件一次往返的做法
+sample = events[:1000]
+start = time.perf_counter()
+for text, meta in sample:
+    vdb_add_events([text], [meta], store=store)
+elapsed = time.perf_counter() - start
+print(f'逐个事件重复检查 {elapsed:6.2f} s  {len(sample) / elapsed:8.1f} 事件/秒')
+
+shutil.rmtree(persist_dir, ignore_errors=True)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from backend.source.frame_buffer import FrameRingBuffer
+from backend.source.frame_scheduler import FrameScheduler
+
+# 比较原摄像头主循环（1 ms 轮询 + 墙钟计时）与帧时钟调度（阻塞采集 + 按序号分发）的空闲 CPU 占用和逐帧处理情况
+WIDTH, HEIGHT, FPS = 640, 480, 30
+MOTION_INTERVAL_S = 0.5
+DURATION_S = 10
+
+
+class FakeCapture:
+    """
+    以固定帧率自由出帧的视频源：read() 返回自上次读取后的最新帧，没有新帧时阻塞到下一帧产生，
+    与摄像头驱动和 RTSP 解码的行为一致。读取方与视频源的时钟相位不同。
+    """
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.source = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+        self.start_time = time.perf_counter() - 0.5 / FPS
+        self.last_index = -1
+
+    def read(self, image=None):
+        index = self.last_index + 1
+        delay = self.start_time + index / FPS - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.last_index = max(index, int((time.perf_counter() - self.start_time) * FPS))
+        if image is None:
+            return True, self.source.copy()
+        np.copyto(image, self.source)
+        return True, image
+
+
+def detect_motion(frame):
+    cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def run_polling(stop_event, counters):
+    """
+    原实现：单线程循环，到时间才读取一帧，每轮 sleep 1 ms。
+    """
+    capture = FakeCapture()
+    frame_buffer = FrameRingBuffer(FPS * 2)
+    frame_interval = 1.0 / FPS
+    next_frame_time = next_motion_time = time.time()
+    while not stop_event.is_set():
+        current_time = time.time()
+        if current_time >= next_frame_time:
+            slot = frame_buffer.acquire()
+            _, frame = capture.read(slot) if slot is not None else capture.read()
+            frame_buffer.commit(frame, current_time)
+            counters['frames'] += 1
+            next_frame_time += frame_interval
+        if current_time >= next_motion_time:
+            detect_motion(frame_buffer.latest()[1])
+            counters['motion'] += 1
+            next_motion_time += MOTION_INTERVAL_S
+        counters['loops'] += 1
+        time.sleep(0.001)
+
+
+def run_scheduled(stop_event, counters):
+    """
+    帧时钟调度：采集线程阻塞读取，调度线程阻塞等待新帧并按序号分发。
+    """
+    capture = FakeCapture()
+    frame_buffer = FrameRingBuffer(FPS * 2)
+
+    def capture_loop():
+        while not stop_event.is_set():
+            slot = frame_buffer.acquire()
+            _, frame = capture.read(slot) if slot is not None else capture.read()
+            frame_buffer.commit(frame)
+
+    def on_frame(seq, frame, timestamp):
+        counters['frames'] += 1
+        if seq != counters['last_seq'] + 1 and counters['last_seq'] >= 0:
+            counters['gaps'] += 1
+        counters['last_seq'] = seq
+
+    def on_motion(seq, frame, timestamp):
+        detect_motion(frame)
+        counters['motion'] += 1
+
+    scheduler = FrameScheduler(frame_buffer, 'benchmark')
+    scheduler.add_consumer(on_frame)
+    scheduler.add_consumer(on_motion, MOTION_INTERVAL_S)
+    capture_thread = threading.Thread(target=capture_loop, daemon=True)
+    capture_thread.start()
+    scheduler.run(stop_event)
+    capture_thread.join()
+    counters['missed'] = scheduler.stats()['frames_missed']
+
+
+print(f'{WIDTH}x{HEIGHT}@{FPS}fps, 运动检测间隔 {MOTION_INTERVAL_S} 秒, 每项运行 {DURATION_S} 秒')
+for name, target in (('1 ms 轮询', run_polling), ('帧时钟调度', run_scheduled)):
+    counters = {'frames': 0, 'motion': 0, 'loops': 0, 'gaps': 0, 'missed': 0, 'last_seq': -1}
+    stop_event = threading.Event()
+    thread = threading.Thread(target=target, args=(stop_event, counters))
+    cpu_start = time.process_time()
+    thread.start()
+    time.sleep(DURATION_S)
+    stop_event.set()
+    thread.join()
+    cpu = time.process_time() - cpu_start
+    print(f'{name:<8} CPU {100 * cpu / DURATION_S:5.1f}% 单核, 处理 {counters["frames"]} 帧, '
+          f'运动检测 {counters["motion"]} 次, 循环 {counters["loops"] or "-"} 次, '
+          f'序号不连续 {counters["gaps"]} 次, 被覆盖 {counters["missed"]} 帧')
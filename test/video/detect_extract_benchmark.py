@@ -0,0 +1,63 @@
+import filecmp
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backend.video.detect_extract import detect_and_extract_frames
+from backend.video.frame_extract import extract_frames_from_video
+from backend.video.motion_detect import detect_motion_in_video
+
+# 分开执行运动检测和帧提取（解码两次）与合并为一次解码的耗时，并检查两者输出的JSON和帧文件一致
+# 用法: PYTHONPATH=. python test/video/detect_extract_benchmark.py
+WIDTH, HEIGHT, FPS, DURATION_S = 1920, 1080, 30, 20
+
+work_dir = tempfile.mkdtemp(prefix='detect_extract_bench_')
+video_path = os.path.join(work_dir, 'synthetic.mp4')
+
+writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
+rng = np.random.default_rng(0)
+background = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+frame_total = FPS * DURATION_S
+for i in range(frame_total):
+    frame = background.copy()
+    # 每 5 秒中前 2 秒有运动
+    if (i // FPS) % 5 < 2:
+        x = (i * 20) % (WIDTH - 400)
+        cv2.rectangle(frame, (x, 300), (x + 400, 700), (0, 0, 255), -1)
+    writer.write(frame)
+writer.release()
+
+print(f'合成视频: {video_path} ({WIDTH}x{HEIGHT}, {frame_total} 帧)')
+
+
+def same_tree(left, right):
+    cmp = filecmp.dircmp(left, right)
+    if cmp.left_only or cmp.right_only or filecmp.cmpfiles(left, right, cmp.common_files, shallow=False)[1:] != ([], []):
+        return False
+    return all(same_tree(os.path.join(left, d), os.path.join(right, d)) for d in cmp.common_dirs)
+
+
+for mode in ('full', 'fast'):
+    two_pass_dir = os.path.join(work_dir, mode, 'two_pass')
+    fused_dir = os.path.join(work_dir, mode, 'fused')
+    os.makedirs(two_pass_dir)
+    os.makedirs(fused_dir)
+
+    start = time.perf_counter()
+    json_path = detect_motion_in_video(video_path, '2025-01-01 12:00:00', two_pass_dir, analysis_mode=mode)
+    frames_dir = extract_frames_from_video(video_path, json_path, os.path.join(two_pass_dir, 'frames'))
+    two_pass_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fused_json_path, fused_frames_dir = detect_and_extract_frames(
+        video_path, '2025-01-01 12:00:00', fused_dir, os.path.join(fused_dir, 'frames'), analysis_mode=mode)
+    fused_s = time.perf_counter() - start
+
+    with open(json_path, 'r', encoding='utf-8') as f, open(fused_json_path, 'r', encoding='utf-8') as g:
+        same_json = json.load(f) == json.load(g)
+    print(f'{mode:<5} 分开执行 {two_pass_s:6.2f} s, 合并 {fused_s:6.2f} s, '
+          f'JSON 一致 {same_json}, 帧文件一致 {same_tree(frames_dir, fused_frames_dir)}')
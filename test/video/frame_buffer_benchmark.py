@@ -0,0 +1,90 @@
+import multiprocessing
+import resource
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from backend.source.frame_buffer import FrameRingBuffer
+
+# 模拟 1080p30 采集、10 秒预录缓存，每 15 帧做一次运动检测取帧，每 3 帧取一次实时画面
+WIDTH, HEIGHT, FPS, CACHE_S = 1920, 1080, 30, 10
+FRAMES = FPS * 30
+MOTION_EVERY, PREVIEW_EVERY = 15, 3
+
+
+class FakeCapture:
+    """
+    以复制预生成帧代替解码，read(image) 与 cv2.VideoCapture 一样在传入数组时写入该数组。
+    """
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.source = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    def read(self, image=None):
+        if image is None:
+            return True, self.source.copy()
+        np.copyto(image, self.source)
+        return True, image
+
+
+def run_deque():
+    """
+    原实现：每帧复制到 current_frame 和 deque，运动检测和实时画面再各复制一次。
+    """
+    capture = FakeCapture()
+    frame_buffer = deque(maxlen=CACHE_S * FPS)
+    current_frame = None
+    for i in range(FRAMES):
+        _, frame = capture.read()
+        current_frame = frame.copy()
+        frame_buffer.append(frame.copy())
+        if i % MOTION_EVERY == 0:
+            latest_frame = frame_buffer[-1].copy()
+            cv2.cvtColor(latest_frame, cv2.COLOR_BGR2GRAY)
+        if i % PREVIEW_EVERY == 0:
+            preview = current_frame.copy()
+            cv2.cvtColor(preview, cv2.COLOR_BGR2GRAY)
+
+
+def run_ring():
+    """
+    环形缓冲区：直接解码到槽位，运动检测和实时画面使用只读视图。
+    """
+    capture = FakeCapture()
+    frame_buffer = FrameRingBuffer(CACHE_S * FPS)
+    for i in range(FRAMES):
+        slot = frame_buffer.acquire()
+        _, frame = capture.read(slot) if slot is not None else capture.read()
+        frame_buffer.commit(frame)
+        if i % MOTION_EVERY == 0:
+            cv2.cvtColor(frame_buffer.latest()[1], cv2.COLOR_BGR2GRAY)
+        if i % PREVIEW_EVERY == 0:
+            cv2.cvtColor(frame_buffer.latest()[1], cv2.COLOR_BGR2GRAY)
+
+
+def measure(name, queue):
+    target = {'deque': run_deque, 'ring': run_ring}[name]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    target()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    # Linux 上 ru_maxrss 单位为 KB
+    queue.put((cpu, wall, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+if __name__ == '__main__':
+    context = multiprocessing.get_context('spawn')
+    frame_mb = WIDTH * HEIGHT * 3 / 1024 / 1024
+    print(f'{WIDTH}x{HEIGHT}, {FRAMES} 帧, 缓存 {CACHE_S * FPS} 帧 (约 {frame_mb * CACHE_S * FPS:.0f} MB)')
+    for name in ('deque', 'ring'):
+        queue = context.Queue()
+        process = context.Process(target=measure, args=(name, queue))
+        process.start()
+        cpu, wall, max_rss_mb = queue.get()
+        process.join()
+        print(f'{name:<6} CPU {1000 * cpu / FRAMES:6.2f} ms/帧  耗时 {1000 * wall / FRAMES:6.2f} ms/帧  '
+              f'峰值内存 {max_rss_mb:7.0f} MB')
@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backend.video.frame_extract import extract_frames_from_video
+
+# 生成合成长视频，并构造密集的事件帧时间
+WIDTH, HEIGHT, FPS, DURATION_S = 640, 360, 30, 180
+
+work_dir = tempfile.mkdtemp(prefix='extract_bench_')
+video_path = os.path.join(work_dir, 'synthetic.mp4')
+json_path = os.path.join(work_dir, 'synthetic.json')
+
+writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
+rng = np.random.default_rng(0)
+background = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+for i in range(FPS * DURATION_S):
+    frame = background.copy()
+    cv2.putText(frame, str(i), (50, 200), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 5)
+    writer.write(frame)
+writer.release()
+
+# 每 20 秒一个 10 秒的事件，每 0.5 秒一帧
+events = []
+for start in range(0, DURATION_S, 20):
+    frame_time = [start + k * 0.5 for k in range(20)]
+    events.append({"frame_time": frame_time, "real_time": []})
+with open(json_path, 'w', encoding='utf-8') as f:
+    json.dump({"video_start_time": "2025-01-01 12:00:00", "events": events}, f)
+
+frame_total = sum(len(e["frame_time"]) for e in events)
+print(f'合成视频: {video_path} ({WIDTH}x{HEIGHT}, {DURATION_S} 秒), 目标帧 {frame_total}')
+
+for mode in ('seek', 'sequential'):
+    output_dir = os.path.join(work_dir, mode)
+    start = time.perf_counter()
+    extract_frames_from_video(video_path, json_path, output_dir, extract_mode=mode)
+    elapsed = time.perf_counter() - start
+    saved = sum(len(files) for _, _, files in os.walk(output_dir))
+    print(f'{mode:<12} {elapsed:6.2f} s  {frame_total / elapsed:8.1f} 帧/秒  保存 {saved} 帧')
@@ -0,0 +1,30 @@
+import time
+
+import cv2
+import numpy as np
+
+from backend.source.frame_format import negotiate_format
+
+# 比较不同视频源分辨率下录像写入线程每帧的格式转换耗时（原实现对每帧无条件缩放）
+OUTPUT_SIZE = (1920, 1080)
+SOURCES = [(1920, 1080), (1280, 720), (640, 480), (2560, 1440)]
+FRAMES = 200
+
+rng = np.random.default_rng(0)
+for width, height in SOURCES:
+    frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    frame.flags.writeable = False
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        cv2.resize(frame, OUTPUT_SIZE)
+    always_ms = 1000 * (time.perf_counter() - start) / FRAMES
+
+    frame_format = negotiate_format((width, height), 30, OUTPUT_SIZE)
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        frame_format.convert(frame)
+    negotiated_ms = 1000 * (time.perf_counter() - start) / FRAMES
+
+    print(f'{width}x{height} -> {OUTPUT_SIZE[0]}x{OUTPUT_SIZE[1]}: 无条件缩放 {always_ms:6.2f} ms/帧, '
+          f'协商后 ({frame_format.conversion:<9}) {negotiated_ms:6.2f} ms/帧')
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backend.video.motion_detect import detect_motion_in_video
+
+# 生成合成视频：静止背景 + 间歇移动的方块
+WIDTH, HEIGHT, FPS, DURATION_S = 1920, 1080, 30, 20
+
+work_dir = tempfile.mkdtemp(prefix='motion_bench_')
+video_path = os.path.join(work_dir, 'synthetic.mp4')
+
+writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
+rng = np.random.default_rng(0)
+background = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+frame_total = FPS * DURATION_S
+for i in range(frame_total):
+    frame = background.copy()
+    # 每 5 秒中前 2 秒有运动
+    if (i // FPS) % 5 < 2:
+        x = (i * 20) % (WIDTH - 400)
+        cv2.rectangle(frame, (x, 300), (x + 400, 700), (0, 0, 255), -1)
+    writer.write(frame)
+writer.release()
+
+print(f'合成视频: {video_path} ({WIDTH}x{HEIGHT}, {frame_total} 帧)')
+
+cases = [
+    ('full', dict(analysis_mode='full')),
+    ('fast w=480', dict(analysis_mode='fast', analysis_width=480, analysis_stride=1)),
+    ('fast w=480 stride=2', dict(analysis_mode='fast', analysis_width=480, analysis_stride=2)),
+    ('fast w=320 stride=3', dict(analysis_mode='fast', analysis_width=320, analysis_stride=3)),
+]
+
+for name, kwargs in cases:
+    start = time.perf_counter()
+    json_path = detect_motion_in_video(video_path, '2025-01-01 12:00:00', work_dir, **kwargs)
+    elapsed = time.perf_counter() - start
+    with open(json_path, 'r', encoding='utf-8') as f:
+        event_count = len(json.load(f)['events'])
+    print(f'{name:<24} {frame_total / elapsed:8.1f} fps  {elapsed:6.2f} s  事件数 {event_count}')
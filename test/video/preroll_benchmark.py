@@ -0,0 +1,55 @@
+import time
+
+import cv2
+import numpy as np
+
+from backend.source.frame_buffer import CompressedFrameBuffer
+
+# 比较原始帧与逐帧JPEG压缩的预录缓存内存占用，以及编码/解码耗时
+FPS = 30
+SAMPLE_FRAMES = 60
+RESOLUTIONS = [(1920, 1080), (1280, 720)]
+QUALITIES = [70, 80, 90]
+
+
+def make_frames(width, height, count):
+    """
+    合成近似监控画面的帧：渐变背景、静止物体、移动目标和传感器噪声。
+    """
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 120, height, dtype=np.float32)[:, None]
+    background = np.dstack([(x * 0.6 + y) % 256, (x * 0.3 + y * 1.5) % 256, (255 - x * 0.5 + y * 0) % 256]).astype(np.uint8)
+    for _ in range(30):
+        x0, y0 = int(rng.integers(0, width - 200)), int(rng.integers(0, height - 200))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(background, (x0, y0), (x0 + int(rng.integers(40, 200)), y0 + int(rng.integers(40, 200))), color, -1)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        cv2.circle(frame, (100 + i * 15 % (width - 200), height // 2), height // 10, (40, 40, 200), -1)
+        noise = rng.normal(0, 3, frame.shape).astype(np.int16)
+        frames.append(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+for width, height in RESOLUTIONS:
+    frames = make_frames(width, height, SAMPLE_FRAMES)
+    raw_per_s = width * height * 3 * FPS
+    print(f'\n{width}x{height}@{FPS}fps 原始帧: {raw_per_s / 1024 / 1024:7.1f} MB/秒, '
+          f'30秒 {raw_per_s * 30 / 1024 / 1024:7.0f} MB, 60秒 {raw_per_s * 60 / 1024 / 1024:7.0f} MB')
+    for quality in QUALITIES:
+        buffer = CompressedFrameBuffer(SAMPLE_FRAMES, quality)
+        start = time.perf_counter()
+        for seq, frame in enumerate(frames):
+            buffer.add(seq, frame)
+        encode_ms = 1000 * (time.perf_counter() - start) / SAMPLE_FRAMES
+
+        start = time.perf_counter()
+        decoded = sum(1 for _ in buffer.iter_frames())
+        decode_ms = 1000 * (time.perf_counter() - start) / decoded
+
+        per_s = buffer.nbytes() / SAMPLE_FRAMES * FPS
+        print(f'  JPEG q={quality}: {per_s / 1024 / 1024:6.2f} MB/秒 (压缩比 {raw_per_s / per_s:5.1f}x), '
+              f'30秒 {per_s * 30 / 1024 / 1024:6.0f} MB, 60秒 {per_s * 60 / 1024 / 1024:6.0f} MB, '
+              f'编码 {encode_ms:5.1f} ms/帧, 解码 {decode_ms:5.1f} ms/帧')
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from backend.source.frame_buffer import FrameRingBuffer
+from backend.source.frame_scheduler import FrameScheduler
+from backend.source.preview_bus import PREVIEW_FPS, PreviewBuffer, PreviewChannel
+
+# 模拟 30fps 采集，比较 N 个浏览器观看实时画面时的 CPU 占用：
+# 原实现每个连接在循环中各自对最新帧做 cvtColor 和全分辨率 imencode；
+# 实时画面总线由调度线程按 PREVIEW_FPS 编码一次缩小画面，所有连接共用
+WIDTH, HEIGHT, FPS = 1280, 720, 30
+DURATION_S = 8
+CLIENTS = (1, 4, 16)
+
+rng = np.random.default_rng(0)
+background = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+
+def capture(frame_buffer, stop_event):
+    i = 0
+    next_time = time.perf_counter()
+    while not stop_event.is_set():
+        next_time += 1 / FPS
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        slot = frame_buffer.acquire()
+        if slot is None:
+            slot = np.empty_like(background)
+        np.copyto(slot, background)
+        x = (i * 10) % (WIDTH - 200)
+        cv2.rectangle(slot, (x, 200), (x + 200, 400), (255, 255, 255), -1)
+        frame_buffer.commit(slot)
+        i += 1
+
+
+def old_client(frame_buffer, stop_event, counter, index):
+    # 原 get_jpeg_frame + generate_video_frames
+    while not stop_event.is_set():
+        latest = frame_buffer.latest()
+        if latest is None:
+            time.sleep(0.1)
+            continue
+        rgb_frame = cv2.cvtColor(latest[1], cv2.COLOR_BGR2RGB)
+        ret, jpeg = cv2.imencode('.jpg', rgb_frame)
+        data = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n'
+        counter[index] += 1
+
+
+def bus_client(channel, stop_event, counter, index):
+    frames = channel.frames()
+    for jpeg in frames:
+        data = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+        counter[index] += 1
+        if stop_event.is_set():
+            break
+    frames.close()
+
+
+def run(mode, clients):
+    stop_event = threading.Event()
+    threads = [threading.Thread(target=capture, args=(frame_buffer, stop_event))]
+    counter = [0] * clients
+    preview = None
+    if mode == 'bus':
+        preview = PreviewBuffer.create()
+        scheduler = FrameScheduler(frame_buffer, 'preview-bench')
+        scheduler.add_consumer(lambda seq, frame, ts: preview.publish(frame, ts), 1.0 / PREVIEW_FPS, name='preview')
+        channel = PreviewChannel(preview)
+        threads.append(threading.Thread(target=scheduler.run, args=(stop_event,)))
+        # 没有新画面时生成器不返回，客户端线程不等待结束
+        threads += [threading.Thread(target=bus_client, args=(channel, stop_event, counter, i), daemon=True)
+                    for i in range(clients)]
+    else:
+        threads += [threading.Thread(target=old_client, args=(frame_buffer, stop_event, counter, i))
+                    for i in range(clients)]
+
+    threads[0].start()
+    time.sleep(1)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(DURATION_S)
+    stop_event.set()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    for thread in threads:
+        if not thread.daemon:
+            thread.join()
+    if preview is not None:
+        preview.close()
+    return 100 * cpu / wall, sum(counter) / clients / wall
+
+
+# 各轮共用同一个帧缓冲区：首次写入新分配的内存时内核清零页面的系统时间很高，先预热一轮，不计入结果
+frame_buffer = FrameRingBuffer(FPS * 2)
+run('old', 1)
+print(f'{WIDTH}x{HEIGHT}@{FPS}fps, 实时画面 {PREVIEW_FPS}fps, 每项 {DURATION_S} 秒 (CPU 含采集)')
+for clients in CLIENTS:
+    for mode, name in (('old', '每连接编码'), ('bus', '实时画面总线')):
+        cpu, fps = run(mode, clients)
+        print(f'{clients:>2} 个连接 {name:<8} CPU {cpu:6.1f}%, 每个连接 {fps:6.1f} 帧/秒')
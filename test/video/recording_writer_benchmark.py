@@ -0,0 +1,96 @@
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backend.source.frame_buffer import FrameRingBuffer
+from backend.source.recording_writer import RecordingWriter
+
+# 模拟 30fps 采集：先填满预录缓存，然后触发录制并继续采集，比较采集线程的最大帧间隔
+WIDTH, HEIGHT, FPS = 1280, 720, 30
+PREROLL_FRAMES = FPS * 10
+RECORD_FRAMES = FPS * 10
+
+work_dir = tempfile.mkdtemp(prefix='writer_bench_')
+rng = np.random.default_rng(0)
+source = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+
+def open_writer(name):
+    return cv2.VideoWriter(os.path.join(work_dir, name), cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
+
+
+def capture(frame_buffer, count, on_frame):
+    """
+    以固定帧率采集，返回采集线程的帧间隔列表（毫秒）。
+    """
+    gaps = []
+    next_time = last_time = time.perf_counter()
+    for _ in range(count):
+        next_time += 1 / FPS
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        slot = frame_buffer.acquire()
+        if slot is not None:
+            np.copyto(slot, source)
+            seq = frame_buffer.commit(slot)
+        else:
+            seq = frame_buffer.commit(source)
+        on_frame(seq)
+        now = time.perf_counter()
+        gaps.append(1000 * (now - last_time))
+        last_time = now
+    return gaps
+
+
+def run_inline():
+    frame_buffer = FrameRingBuffer(PREROLL_FRAMES)
+    capture(frame_buffer, PREROLL_FRAMES, lambda seq: None)
+    writer = open_writer('inline.mp4')
+    state = {'started': False}
+
+    def on_frame(seq):
+        if not state['started']:
+            # 原实现：在采集线程中写入全部预录帧
+            for _, frame in frame_buffer.snapshot():
+                writer.write(cv2.resize(frame, (WIDTH, HEIGHT)))
+            state['started'] = True
+        writer.write(cv2.resize(frame_buffer.get(seq), (WIDTH, HEIGHT)))
+
+    gaps = capture(frame_buffer, RECORD_FRAMES, on_frame)
+    writer.release()
+    return gaps, None
+
+
+def run_threaded():
+    frame_buffer = FrameRingBuffer(PREROLL_FRAMES)
+    capture(frame_buffer, PREROLL_FRAMES, lambda seq: None)
+    recording_writer = RecordingWriter((WIDTH, HEIGHT), frame_buffer)
+    recording_writer.start()
+    state = {'started': False}
+
+    def on_frame(seq):
+        if not state['started']:
+            recording_writer.open(open_writer('threaded.mp4'), frame_buffer.snapshot())
+            state['started'] = True
+        recording_writer.write(seq, frame_buffer.get(seq))
+
+    gaps = capture(frame_buffer, RECORD_FRAMES, on_frame)
+    recording_writer.close()
+    recording_writer.stop()
+    return gaps, recording_writer.stats()
+
+
+print(f'{WIDTH}x{HEIGHT}@{FPS}fps, 预录 {PREROLL_FRAMES} 帧, 录制 {RECORD_FRAMES} 帧')
+for name, run in (('采集线程内写入', run_inline), ('独立写入线程', run_threaded)):
+    gaps, stats = run()
+    gaps = np.array(gaps)
+    late = int(np.sum(gaps > 2000 / FPS))
+    print(f'{name:<10} 帧间隔 平均 {gaps.mean():6.1f} ms, p99 {np.percentile(gaps, 99):7.1f} ms, '
+          f'最大 {gaps.max():7.1f} ms, 超过两帧间隔 {late} 次')
+    if stats:
+        print(f'           写入 {stats["frames_written"]} 帧 (预录 {stats["preroll_frames"]}), '
+              f'丢弃 {stats["frames_dropped"]}, 覆盖 {stats["frames_stale"]}, 最大队列深度 {stats["max_queue_depth"]}')
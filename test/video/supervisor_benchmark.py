@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backend.source.supervisor import RecorderSupervisor
+
+# 以 N 个循环播放的视频文件模拟 N 路摄像头，每路一个录制进程，统计稳定后的各路帧率和总帧率
+# 用法: PYTHONPATH=. python test/video/supervisor_benchmark.py [路数]
+WIDTH, HEIGHT, FPS = 1280, 720, 15
+SOURCE_FRAMES = FPS * 4
+WARMUP_S = 20  # 包含冷启动等待
+MEASURE_S = 20
+
+
+def make_source(path):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    for i in range(SOURCE_FRAMES):
+        frame = background.copy()
+        x = (i * 20) % (WIDTH - 200)
+        cv2.rectangle(frame, (x, 200), (x + 200, 400), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+if __name__ == '__main__':
+    cameras = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    work_dir = tempfile.mkdtemp(prefix='supervisor_bench_')
+    source = os.path.join(work_dir, 'source.mp4')
+    make_source(source)
+
+    sources = [{'source': source, 'video_dir': os.path.join(work_dir, f'camera{i}')} for i in range(cameras)]
+    supervisor = RecorderSupervisor(sources)
+    supervisor.start()
+    time.sleep(WARMUP_S)
+    frames_before = {name: camera['frames'] for name, camera in supervisor.stats()['cameras'].items()}
+    time.sleep(MEASURE_S)
+    stats = supervisor.stats()
+    supervisor.stop()
+
+    print(f'{cameras} 路 {WIDTH}x{HEIGHT}@{FPS}fps, CPU 核数 {os.cpu_count()}')
+    total = 0
+    for name, camera in stats['cameras'].items():
+        fps = (camera['frames'] - frames_before.get(name, 0)) / MEASURE_S
+        total += fps
+        print(f'{name:<10} {camera["state"]:<9} CPU {camera["cpus"]}, 帧率 {fps:5.1f}, '
+              f'丢帧 {camera["frames_missed"]}, 重启 {camera["restarts"]}')
+    print(f'总帧率 {total:.1f} / {cameras * FPS}')
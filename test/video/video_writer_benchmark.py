@@ -0,0 +1,92 @@
+import os
+import resource
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backend.source.video_writers import FFmpegVideoWriter, ffmpeg_supports, find_ffmpeg
+
+# 比较 cv2.VideoWriter 与 ffmpeg 管道写入的 CPU 占用（含 ffmpeg 子进程）和每分钟录像体积
+# 分辨率和帧率可用环境变量设置，如 BENCH_SIZE=1920x1080x30
+WIDTH, HEIGHT, FPS = [int(v) for v in os.environ.get('BENCH_SIZE', '1280x720x30').split('x')]
+FRAMES = FPS * 10
+GOP = 60
+# (后端, 编码器, 预设, 码率 Mbps)
+CASES = [
+    ('opencv', 'mp4v', None, None),
+    ('ffmpeg', 'libx264', 'ultrafast', 4),
+    ('ffmpeg', 'libx264', 'superfast', 4),
+    ('ffmpeg', 'libx264', 'veryfast', 4),
+    ('ffmpeg', 'libx264', 'superfast', 1),
+    ('ffmpeg', 'libx265', 'ultrafast', 1),
+]
+
+
+def make_frames(count):
+    """
+    合成近似监控画面的帧：渐变背景、静止物体、移动目标和传感器噪声。
+
+    :return: (带噪声的帧, 无噪声的帧)，后者作为画质比较的参考
+    """
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, WIDTH, dtype=np.float32)
+    y = np.linspace(0, 120, HEIGHT, dtype=np.float32)[:, None]
+    background = np.dstack([(x * 0.6 + y) % 256, (x * 0.3 + y * 1.5) % 256, (255 - x * 0.5 + y * 0) % 256]).astype(np.uint8)
+    for _ in range(30):
+        x0, y0 = int(rng.integers(0, WIDTH - 200)), int(rng.integers(0, HEIGHT - 200))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(background, (x0, y0), (x0 + int(rng.integers(40, 200)), y0 + int(rng.integers(40, 200))), color, -1)
+    frames, references = [], []
+    for i in range(count):
+        frame = background.copy()
+        cv2.circle(frame, (100 + i * 15 % (WIDTH - 200), HEIGHT // 2), HEIGHT // 10, (40, 40, 200), -1)
+        noise = rng.normal(0, 3, frame.shape).astype(np.int16)
+        frames.append(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+        references.append(frame)
+    return frames, references
+
+
+def mean_psnr(filename, references):
+    """
+    解码录像，计算与无噪声参考帧的平均 PSNR（dB），用于比较同等体积下的画质。
+    """
+    capture = cv2.VideoCapture(filename)
+    values = []
+    while True:
+        ret, decoded = capture.read()
+        if not ret:
+            break
+        values.append(cv2.PSNR(references[len(values) % len(references)], decoded))
+    capture.release()
+    return float(np.mean(values)) if values else 0.0
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+work_dir = tempfile.mkdtemp(prefix='video_writer_bench_')
+frames, references = make_frames(FPS * 2)
+print(f'{WIDTH}x{HEIGHT}@{FPS}fps, {FRAMES} 帧, GOP {GOP}, ffmpeg: {find_ffmpeg()}')
+for backend, codec, preset, bitrate_mbps in CASES:
+    name = f'{codec} {preset} {bitrate_mbps}M' if preset else codec
+    filename = os.path.join(work_dir, f'{backend}_{codec}_{preset}_{bitrate_mbps}.mp4')
+    if backend == 'ffmpeg':
+        if not ffmpeg_supports(codec):
+            print(f'{name:<24} 未找到 ffmpeg 或编码器，跳过')
+            continue
+        writer = FFmpegVideoWriter(filename, FPS, (WIDTH, HEIGHT), codec, bitrate_mbps, preset, GOP)
+    else:
+        writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*codec), FPS, (WIDTH, HEIGHT))
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    for i in range(FRAMES):
+        writer.write(frames[i % len(frames)])
+    writer.release()
+    cpu, wall = cpu_seconds() - cpu_start, time.perf_counter() - wall_start
+    size = os.path.getsize(filename)
+    print(f'{name:<24} CPU {1000 * cpu / FRAMES:6.2f} ms/帧  耗时 {1000 * wall / FRAMES:6.2f} ms/帧  '
+          f'{size / (FRAMES / FPS) * 60 / 1024 / 1024:6.1f} MB/分钟  PSNR {mean_psnr(filename, references):5.1f} dB')
@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+
+from backend.live.event_feed import EventFeed
+from backend.vdb.event_catalog import EventCatalog
+
+# 事件列表的服务端开销：存量 N 个事件、每秒新增 1 个事件、C 个浏览器同时打开页面，比较
+#   全量轮询：原页面每秒请求一次 /events，服务器每次序列化全部事件
+#   增量轮询：每秒请求一次 /events?since=<游标>，只拼接新增事件已序列化的 JSON
+#   事件流：  /events/stream，每个新事件只发送一次
+# 用法: PYTHONPATH=. python test/web/event_feed_benchmark.py
+DURATION_S = 10
+CLIENTS = 50
+SCENARIOS = (1000, 10000)
+
+
+def make_event(i):
+    return {
+        'video_name': f'camera_{i:06d}.mp4',
+        'thumbnail_path': f'/data/cache/thumbnails/camera_{i:06d}_0.jpg',
+        'description': '一名穿深色外套的男子在门口停留约十秒后离开，' * 3,
+        'start_time': '2025年01月01日 08时00分00秒',
+        'end_time': '2025年01月01日 08时00分30秒',
+        'video_path': f'data/camera_{i:06d}.mp4',
+        'event_id': i,
+    }
+
+
+def run(mode, existing):
+    feed = EventFeed(EventCatalog(':memory:'))
+    events = [make_event(i) for i in range(existing)]
+    feed.extend(events)
+    stop_event = threading.Event()
+    received = [0] * CLIENTS
+    sent_bytes = [0] * CLIENTS
+
+    def full_poll(index):
+        while not stop_event.is_set():
+            body = json.dumps(list(events), ensure_ascii=False)
+            sent_bytes[index] += len(body)
+            received[index] = len(json.loads(body))
+            stop_event.wait(1)
+
+    def since_poll(index):
+        cursor = 0
+        while not stop_event.is_set():
+            body, cursor = feed.since(cursor, None)
+            sent_bytes[index] += len(body)
+            received[index] += len(json.loads(body))
+            stop_event.wait(1)
+
+    def stream(index):
+        for chunk in feed.stream(0):
+            sent_bytes[index] += len(chunk)
+            received[index] += chunk.count(b'\nid: ') + chunk.startswith(b'id: ')
+            if stop_event.is_set():
+                break
+
+    target = {'full': full_poll, 'since': since_poll, 'stream': stream}[mode]
+    threads = [threading.Thread(target=target, args=(i,), daemon=True) for i in range(CLIENTS)]
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for i in range(DURATION_S):
+        time.sleep(1)
+        event = make_event(existing + i)
+        events.append(event)
+        feed.append(event)
+    stop_event.set()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return 100 * cpu / wall, sum(sent_bytes) / wall / 1024 / 1024, min(received)
+
+
+print(f'{CLIENTS} 个浏览器，每秒新增 1 个事件，每项 {DURATION_S} 秒')
+for existing in SCENARIOS:
+    for mode, name in (('full', '全量轮询'), ('since', '增量轮询'), ('stream', '事件流')):
+        cpu, mb_per_s, received = run(mode, existing)
+        print(f'存量 {existing:>6} 个事件 {name:<6} CPU {cpu:6.1f}%, 发送 {mb_per_s:7.2f} MB/秒, '
+              f'每个浏览器收到 {received} 个事件')
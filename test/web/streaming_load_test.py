@@ -0,0 +1,219 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import numpy as np
+
+from backend.source.preview_bus import PREVIEW_FPS, PreviewBuffer, PreviewChannel
+
+# 长连接路由的压力测试：同时打开 N 个实时画面连接和 M 个并发查询，比较两种服务方式
+#   flask: app.run(threaded=True)，每个连接占用一个线程，查询使用同步 ollama 客户端，画面使用 PreviewChannel.frames()
+#   asgi:  uvicorn + Starlette（frontend/app_asgi.py 的方式），查询使用 AsyncClient，画面使用 PreviewChannel.aframes()
+# 模型服务为本地模拟的 Ollama，按固定间隔流式返回 token；检索（向量数据库）不在测试范围内。
+# 用法: PYTHONPATH=. python test/web/streaming_load_test.py
+MODEL_PORT = 18434
+SERVER_PORT = 18500
+TOKENS = 40
+TOKEN_DELAY_S = 0.025  # 每个回答约 1 秒
+DURATION_S = 15
+SCENARIOS = ((10, 5), (50, 20), (200, 50))  # (实时画面连接数, 并发查询数)
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i in range(TOKENS + 1):
+            done = i == TOKENS
+            line = json.dumps({
+                'model': body['model'],
+                'created_at': '2025-01-01T00:00:00Z',
+                'message': {'role': 'assistant', 'content': '' if done else '字'},
+                'done': done,
+            }).encode() + b'\n'
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+            self.wfile.flush()
+            if not done:
+                time.sleep(TOKEN_DELAY_S)
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_model():
+    ThreadingHTTPServer.daemon_threads = True
+    ThreadingHTTPServer.request_queue_size = 1024
+    ThreadingHTTPServer(('127.0.0.1', MODEL_PORT), FakeOllamaHandler).serve_forever()
+
+
+def publish_preview(preview):
+    # 模拟录制器按 PREVIEW_FPS 发布实时画面
+    frame = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    while True:
+        preview.publish(frame, time.time())
+        time.sleep(1.0 / PREVIEW_FPS)
+
+
+def serve(mode, preview_name):
+    # ollama 客户端在导入时读取 OLLAMA_HOST
+    os.environ['OLLAMA_HOST'] = f'http://127.0.0.1:{MODEL_PORT}'
+    from backend.llm.text import (text_generate_response_from_query_rag,
+                                  text_generate_response_from_query_rag_async)
+
+    # 共享内存由主进程创建和删除，与多路录制时相同
+    preview = PreviewBuffer.attach(preview_name)
+    channel = PreviewChannel(preview)
+    threading.Thread(target=publish_preview, args=(preview,), daemon=True).start()
+    rag_result = '搜索结果摘要：一名快递员在门口放下包裹'
+
+    if mode == 'flask':
+        import logging
+        from flask import Flask, Response, request
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        app = Flask(__name__)
+
+        @app.route('/video_feed')
+        def video_feed():
+            def generate():
+                for frame in channel.frames():
+                    yield b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n'
+            return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+        @app.route('/generate_response', methods=['POST'])
+        def generate_response():
+            user_query = request.form.get('query')
+            return Response(text_generate_response_from_query_rag(user_query, rag_result, '', stream=True),
+                            mimetype='text/plain')
+
+        app.run(host='127.0.0.1', port=SERVER_PORT, threaded=True)
+    else:
+        import uvicorn
+        from starlette.applications import Starlette
+        from starlette.responses import StreamingResponse
+        from starlette.routing import Route
+
+        async def video_feed(request):
+            async def generate():
+                async for frame in channel.aframes():
+                    yield b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n'
+            return StreamingResponse(generate(), media_type='multipart/x-mixed-replace; boundary=frame')
+
+        async def generate_response(request):
+            user_query = (await request.form()).get('query')
+            return StreamingResponse(text_generate_response_from_query_rag_async(user_query, rag_result, ''),
+                                     media_type='text/plain')
+
+        app = Starlette(routes=[Route('/video_feed', video_feed),
+                                Route('/generate_response', generate_response, methods=['POST'])])
+        uvicorn.run(app, host='127.0.0.1', port=SERVER_PORT, log_level='error', backlog=1024)
+
+
+def process_stats(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu_s = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    with open(f'/proc/{pid}/status') as f:
+        status = dict(line.split(':', 1) for line in f)
+    return cpu_s, int(status['Threads']), int(status['VmRSS'].split()[0]) // 1024
+
+
+async def viewer(session, deadline, counts, errors):
+    try:
+        async with session.get(f'http://127.0.0.1:{SERVER_PORT}/video_feed') as response:
+            while time.time() < deadline:
+                chunk = await asyncio.wait_for(response.content.readany(), timeout=5)
+                counts.append(chunk.count(b'--frame'))
+    except Exception:
+        errors.append(1)
+
+
+async def querier(session, deadline, latencies, errors):
+    while time.time() < deadline:
+        start = time.time()
+        try:
+            async with session.post(f'http://127.0.0.1:{SERVER_PORT}/generate_response',
+                                    data={'query': '今天有人来过吗'}) as response:
+                text = await asyncio.wait_for(response.text(), timeout=30)
+            if text.count('字') == TOKENS:
+                latencies.append(time.time() - start)
+            else:
+                errors.append(1)
+        except Exception:
+            errors.append(1)
+
+
+async def run_load(pid, viewers, queries):
+    counts, latencies, errors = [], [], []
+    samples = []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None)) as session:
+        deadline = time.time() + DURATION_S
+        tasks = [asyncio.create_task(viewer(session, deadline, counts, errors)) for _ in range(viewers)]
+        tasks += [asyncio.create_task(querier(session, deadline, latencies, errors)) for _ in range(queries)]
+        cpu_start, _, _ = process_stats(pid)
+        wall_start = time.time()
+        while time.time() < deadline:
+            await asyncio.sleep(1)
+            samples.append(process_stats(pid))
+        cpu = samples[-1][0] - cpu_start
+        wall = time.time() - wall_start
+        await asyncio.gather(*tasks)
+    return {
+        'cpu': 100 * cpu / wall,
+        'threads': max(sample[1] for sample in samples),
+        'rss': max(sample[2] for sample in samples),
+        'viewer_fps': sum(counts) / viewers / wall if viewers else 0,
+        'qps': len(latencies) / wall,
+        'latency': np.percentile(latencies, 95) if latencies else float('nan'),
+        'errors': len(errors),
+    }
+
+
+def wait_port(port, timeout=30):
+    import socket
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'端口 {port} 未就绪')
+
+
+if __name__ == '__main__':
+    context = multiprocessing.get_context('spawn')
+    model_server = context.Process(target=serve_model, daemon=True)
+    model_server.start()
+    wait_port(MODEL_PORT)
+
+    print(f'CPU 核数 {os.cpu_count()}, 每个回答 {TOKENS} 个 token × {TOKEN_DELAY_S * 1000:.0f} ms, 每项 {DURATION_S} 秒')
+    print('模式   画面连接 并发查询  服务CPU  线程数  内存MB  画面帧率/连接  查询/秒  p95延迟  错误')
+    modes = sys.argv[1:] or ['flask', 'asgi']
+    for viewers, queries in SCENARIOS:
+        for mode in modes:
+            preview = PreviewBuffer.create()
+            server = context.Process(target=serve, args=(mode, preview.name), daemon=True)
+            server.start()
+            wait_port(SERVER_PORT)
+            time.sleep(1)
+            result = asyncio.run(run_load(server.pid, viewers, queries))
+            server.kill()
+            server.join()
+            preview.close()
+            print(f'{mode:<6} {viewers:>7} {queries:>8} {result["cpu"]:7.1f}% {result["threads"]:>7} '
+                  f'{result["rss"]:>7} {result["viewer_fps"]:>13.1f} {result["qps"]:>8.1f} '
+                  f'{result["latency"]:>7.2f}s {result["errors"]:>5}')
+    model_server.kill()
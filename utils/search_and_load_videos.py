@@ -1,6 +1,7 @@
 import os
 
-from backend.data.dataloader import VideoDataLoader
+from backend.ingest.ingest import ingest_videos
+from backend.vdb.vector_database import vdb_backfill_time_fields
 from config import GlobalConfig
 from logger import logger
 
@@ -15,11 +16,7 @@ def get_video_object_list():
         logger.error(f'无法找到视频文件! 错误: {e}')
         raise FileNotFoundError
 
-    video_objects = []
-
-    for video_file in video_files:
-        video_obj = VideoDataLoader(video_file, auto_process=True, reprocess=False)
-        video_obj.add_event_to_database()
-        video_objects.append(video_obj)
+    video_objects = ingest_videos(video_files)
+    vdb_backfill_time_fields()
 
     return video_objects
\ No newline at end of file